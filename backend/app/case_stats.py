@@ -0,0 +1,221 @@
+import bisect
+
+import numpy as np
+
+
+# vitals and exposure figures summarised per agent and filterable by range
+NUMERIC_COLUMNS = [
+    "exposure_estimate", "time_since_exposure_min", "age", "weight_kg",
+    "heart_rate", "respiratory", "systolic_bp", "oxygen", "gcs",
+]
+# integer-coded columns counted per category and filterable by value
+CATEGORICAL_COLUMNS = ["severity", "exposure_route", "human_system", "exposure_unit"]
+
+PERCENTILES = [0, 25, 50, 75, 100]
+
+
+def _round(value):
+    return round(float(value), 3)
+
+
+class CaseStats:
+    """Per-agent statistics over the dataset, with range and category filters.
+
+    Every indexed column keeps one int32 row order sorted by (agent, value),
+    so each agent's rows form one sorted run. A range filter is two binary
+    searches inside that run and a category filter is a precomputed slice;
+    the most selective filter picks the candidate rows and only those are
+    checked against the other filters. Unfiltered summaries are computed
+    once at build time. A query costs O(log n) plus the rows it matches,
+    never a scan of the whole dataset.
+    """
+
+    def __init__(self, df, agent_order, agent_offsets, categories):
+        n = len(df)
+        index_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+
+        self.keys = list(agent_offsets)
+        self.ids = {key: i for i, key in enumerate(self.keys)}
+        self.bounds = [agent_offsets[key] for key in self.keys]
+        self.names = [str(df["agent"].iat[agent_order[start]]) if end > start else key
+                      for key, (start, end) in zip(self.keys, self.bounds)]
+
+        # which agent run each row belongs to
+        segment = np.zeros(n, dtype=np.int32)
+        for i, (start, end) in enumerate(self.bounds):
+            segment[agent_order[start:end]] = i
+
+        self.numeric = [c for c in NUMERIC_COLUMNS if c in df.columns]
+        self.categorical = [c for c in CATEGORICAL_COLUMNS if c in df.columns and c in categories]
+        self.categories = {c: [str(name) for name in categories[c]] for c in self.categorical}
+        self._category_ids = {c: {name.lower(): i for i, name in enumerate(names)}
+                              for c, names in self.categories.items()}
+
+        self.values = {c: df[c].to_numpy(dtype=np.float64) for c in self.numeric}
+        self.codes = {}
+        for c in self.categorical:
+            code_dtype = np.int8 if len(self.categories[c]) <= np.iinfo(np.int8).max else np.int32
+            self.codes[c] = df[c].to_numpy().astype(code_dtype)
+
+        self.order = {}
+        for c in self.numeric:
+            self.order[c] = np.lexsort((self.values[c], segment)).astype(index_dtype)
+        # start of each code's slice inside each agent run: (agents, codes + 1)
+        self.code_starts = {}
+        for c in self.categorical:
+            self.order[c] = np.lexsort((self.codes[c], segment)).astype(index_dtype)
+            sorted_codes = self.codes[c][self.order[c]]
+            edges = np.arange(len(self.categories[c]) + 1)
+            self.code_starts[c] = np.array([
+                start + np.searchsorted(sorted_codes[start:end], edges)
+                for start, end in self.bounds
+            ], dtype=np.int64).reshape(len(self.bounds), len(edges))
+
+        self.summaries = [self._summarize(agent_order[start:end], self.numeric, self.categorical)
+                          for start, end in self.bounds]
+
+    def __len__(self):
+        return len(self.bounds)
+
+    @property
+    def nbytes(self):
+        arrays = [*self.values.values(), *self.codes.values(), *self.order.values(), *self.code_starts.values()]
+        return sum(a.nbytes for a in arrays)
+
+    def agent_ids(self, names):
+        """Run ids for agent names (case/space-insensitive); KeyError names the unknown one"""
+        ids = []
+        for name in names:
+            key = name.strip().lower()
+            if key not in self.ids:
+                raise KeyError(name)
+            if self.ids[key] not in ids:
+                ids.append(self.ids[key])
+        return ids
+
+    def parse_range(self, text):
+        """"column:min:max" (either bound may be empty) -> (column, low, high)"""
+        column, _, bounds = text.partition(":")
+        column = column.strip()
+        if column not in self.values:
+            raise ValueError(f"Unknown range column '{column}', expected one of: {', '.join(self.numeric)}")
+        low, _, high = bounds.partition(":")
+        try:
+            low = float(low) if low.strip() else None
+            high = float(high) if high.strip() else None
+        except ValueError:
+            raise ValueError(f"Range bounds must be numbers: '{text}'") from None
+        if low is None and high is None:
+            raise ValueError(f"Range needs a lower or upper bound: '{text}'")
+        return column, low, high
+
+    def parse_ranges(self, texts):
+        """column -> (low, high) for a list of range strings; repeats on a column intersect"""
+        ranges = {}
+        for text in texts:
+            column, low, high = self.parse_range(text)
+            old_low, old_high = ranges.get(column, (None, None))
+            if old_low is not None:
+                low = old_low if low is None else max(low, old_low)
+            if old_high is not None:
+                high = old_high if high is None else min(high, old_high)
+            ranges[column] = (low, high)
+        return ranges
+
+    def category_codes(self, column, names):
+        """Codes of comma-separated category names (case-insensitive)"""
+        ids = self._category_ids[column]
+        codes = set()
+        for name in names.split(","):
+            if not name.strip():
+                continue
+            code = ids.get(name.strip().lower())
+            if code is None:
+                raise ValueError(f"Unknown {column} '{name.strip()}', expected one of: "
+                                 f"{', '.join(self.categories[column])}")
+            codes.add(code)
+        if not codes:
+            raise ValueError(f"No {column} values given")
+        return tuple(sorted(codes))
+
+    def query(self, agent_ids=None, ranges=None, equals=None, numeric=None, categorical=None):
+        """Summaries per agent of the rows passing every filter.
+
+        ``ranges`` maps numeric columns to inclusive (low, high) bounds, either
+        of them None; ``equals`` maps categorical columns to allowed codes.
+        ``numeric``/``categorical`` limit the columns summarised.
+        """
+        agent_ids = range(len(self.bounds)) if agent_ids is None else agent_ids
+        numeric = self.numeric if numeric is None else numeric
+        categorical = self.categorical if categorical is None else categorical
+        ranges = ranges or {}
+        equals = equals or {}
+
+        results = []
+        for i in agent_ids:
+            if ranges or equals:
+                summary = self._summarize(self._filter(i, ranges, equals), numeric, categorical)
+            else:
+                summary = self._project(self.summaries[i], numeric, categorical)
+            results.append({"agent": self.names[i], **summary})
+        return results
+
+    def _filter(self, i, ranges, equals):
+        """Rows of agent run ``i`` passing every filter"""
+        start, end = self.bounds[i]
+        candidates = []
+        for column, (low, high) in ranges.items():
+            order, key = self.order[column], self.values[column].__getitem__
+            a = start if low is None else bisect.bisect_left(order, low, start, end, key=key)
+            b = end if high is None else bisect.bisect_right(order, high, a, end, key=key)
+            candidates.append((b - a, column, [(a, b)]))
+        for column, codes in equals.items():
+            starts = self.code_starts[column][i]
+            slices = [(int(starts[code]), int(starts[code + 1])) for code in codes]
+            candidates.append((sum(b - a for a, b in slices), column, slices))
+
+        # the smallest slice drives; the others are checked on its rows only
+        size, driver, slices = min(candidates, key=lambda c: c[0])
+        if size == 0:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.concatenate([self.order[driver][a:b] for a, b in slices])
+
+        keep = np.ones(len(rows), dtype=bool)
+        for column, (low, high) in ranges.items():
+            if column != driver:
+                values = self.values[column][rows]
+                if low is not None:
+                    keep &= values >= low
+                if high is not None:
+                    keep &= values <= high
+        for column, codes in equals.items():
+            if column != driver:
+                keep &= np.isin(self.codes[column][rows], codes)
+        return rows[keep]
+
+    def _summarize(self, rows, numeric, categorical):
+        summary = {"count": int(len(rows)), "numeric": {}, "categorical": {}}
+        if not len(rows):
+            return summary
+        for column in numeric:
+            values = self.values[column][rows]
+            low, p25, median, p75, high = np.percentile(values, PERCENTILES)
+            summary["numeric"][column] = {
+                "mean": _round(values.mean()),
+                "std": _round(values.std(ddof=1)) if len(values) > 1 else 0.0,
+                "min": _round(low), "p25": _round(p25), "median": _round(median),
+                "p75": _round(p75), "max": _round(high),
+            }
+        for column in categorical:
+            names = self.categories[column]
+            counts = np.bincount(self.codes[column][rows], minlength=len(names))
+            summary["categorical"][column] = {names[code]: int(n) for code, n in enumerate(counts) if n}
+        return summary
+
+    @staticmethod
+    def _project(summary, numeric, categorical):
+        return {
+            "count": summary["count"],
+            "numeric": {c: summary["numeric"][c] for c in numeric if c in summary["numeric"]},
+            "categorical": {c: summary["categorical"][c] for c in categorical if c in summary["categorical"]},
+        }
@@ -0,0 +1,320 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from app.dataset_cache import file_hash
+from app.shared_store import FlatForest
+
+
+COMPILED_VERSION = 1
+
+PRE_FIELDS = ("num_pos", "num_out", "num_fill", "num_mean", "num_scale", "cat_pos", "cat_out",
+              "cat_fill", "cat_ptr", "cat_values", "pass_pos", "pass_out")
+TREE_FIELDS = ("feature", "threshold", "left", "right", "leaf_id", "leaf_value", "roots")
+
+
+class CompileError(Exception):
+    """The fitted pipeline uses a step or option the compiled engine does not cover"""
+
+
+def compiled_path(artifact_path):
+    """Where the compiled export of an artifact lives: x.joblib -> x.compiled.npz"""
+    return f"{os.path.splitext(artifact_path)[0]}.compiled.npz"
+
+
+def _steps(transformer):
+    return dict(transformer.steps) if hasattr(transformer, "steps") else {"only": transformer}
+
+
+class CompiledPreprocessor:
+    """The artifact's fitted ColumnTransformer as plain arrays.
+
+    Numeric columns: median fill, then ``(x - mean) / scale`` in float64 exactly
+    as SimpleImputer + StandardScaler do. Categorical columns: most-frequent
+    fill, then a value -> one-hot slot map (unknown values set no slot, like
+    ``handle_unknown="ignore"``). Passthrough columns are copied. The output is
+    the float32 matrix the forest compares against.
+    """
+
+    def __init__(self, columns, n_out, num_pos, num_out, num_fill, num_mean, num_scale,
+                 cat_pos, cat_out, cat_fill, cat_ptr, cat_values, pass_pos, pass_out):
+        self.columns = [str(c) for c in columns]
+        self.n_out = int(n_out)
+        self.num_pos, self.num_out = num_pos, num_out
+        self.num_fill, self.num_mean, self.num_scale = num_fill, num_mean, num_scale
+        self.cat_pos, self.cat_out, self.cat_fill = cat_pos, cat_out, cat_fill
+        self.cat_ptr, self.cat_values = cat_ptr, cat_values
+        self.pass_pos, self.pass_out = pass_pos, pass_out
+        # one value -> slot dict per categorical column, built once
+        self.cat_maps = [{v: int(cat_out[j]) + k for k, v in enumerate(cat_values[cat_ptr[j]:cat_ptr[j + 1]])}
+                         for j in range(len(cat_pos))]
+
+    @classmethod
+    def from_sklearn(cls, pre, columns):
+        """Compile a fitted ColumnTransformer whose input rows are laid out as ``columns``"""
+        names = list(pre.feature_names_in_)
+        position = {c: i for i, c in enumerate(columns)}
+        missing = [c for c in names if c not in position]
+        if missing:
+            raise CompileError(f"input rows have no column for {missing[:5]}")
+        num, cat, passthrough = [], [], []
+        with warnings.catch_warnings():
+            # integer remainder columns are fine here, they index feature_names_in_
+            warnings.simplefilter("ignore", FutureWarning)
+            transformers = [(name, transformer, list(cols)) for name, transformer, cols in pre.transformers_]
+
+        for name, transformer, cols in transformers:
+            if transformer == "drop" or name not in pre.output_indices_:
+                continue
+            cols = [names[c] if isinstance(c, (int, np.integer)) else c for c in cols]
+            out = pre.output_indices_[name].start
+            steps = _steps(transformer)
+            imputer = steps.get("imputer")
+            scaler = next((s for s in steps.values() if type(s).__name__ == "StandardScaler"), None)
+            ohe = next((s for s in steps.values() if type(s).__name__ == "OneHotEncoder"), None)
+
+            if ohe is not None:
+                if ohe.drop_idx_ is not None or getattr(ohe, "_infrequent_enabled", False):
+                    raise CompileError(f"cannot compile {name!r}: OneHotEncoder drops or groups categories")
+                fills = imputer.statistics_ if imputer is not None else [None] * len(cols)
+                for col, cats, fill in zip(cols, ohe.categories_, fills):
+                    cat.append((position[col], out, fill, [str(c) for c in cats]))
+                    out += len(cats)
+            elif transformer == "passthrough" or type(transformer).__name__ == "FunctionTransformer":
+                if getattr(transformer, "func", None) is not None:
+                    raise CompileError(f"cannot compile FunctionTransformer with a func in {name!r}")
+                passthrough += [(position[col], out + k) for k, col in enumerate(cols)]
+            elif set(steps) <= {"imputer", "scaler"} and (imputer is not None or scaler is not None):
+                for k, col in enumerate(cols):
+                    mean = scaler.mean_[k] if scaler is not None and scaler.with_mean else 0.0
+                    scale = scaler.scale_[k] if scaler is not None and scaler.with_std else 1.0
+                    fill = imputer.statistics_[k] if imputer is not None else np.nan
+                    num.append((position[col], out + k, fill, mean, scale))
+            else:
+                raise CompileError(f"cannot compile transformer {name!r}: {transformer!r}")
+
+        cat_ptr = np.zeros(len(cat) + 1, dtype=np.int32)
+        np.cumsum([len(c[3]) for c in cat], out=cat_ptr[1:])
+        return cls(
+            columns, max(s.stop for s in pre.output_indices_.values()),
+            num_pos=np.array([n[0] for n in num], dtype=np.int32),
+            num_out=np.array([n[1] for n in num], dtype=np.int32),
+            num_fill=np.array([n[2] for n in num], dtype=np.float64),
+            num_mean=np.array([n[3] for n in num], dtype=np.float64),
+            num_scale=np.array([n[4] for n in num], dtype=np.float64),
+            cat_pos=np.array([c[0] for c in cat], dtype=np.int32),
+            cat_out=np.array([c[1] for c in cat], dtype=np.int32),
+            cat_fill=np.array([str(c[2]) for c in cat], dtype=str),
+            cat_ptr=cat_ptr,
+            cat_values=np.array([v for c in cat for v in c[3]], dtype=str),
+            pass_pos=np.array([p[0] for p in passthrough], dtype=np.int32),
+            pass_out=np.array([p[1] for p in passthrough], dtype=np.int32),
+        )
+
+    def transform(self, rows):
+        """(n, n_out) float32 from rows in ``columns`` order (object array or DataFrame)"""
+        if isinstance(rows, pd.DataFrame):
+            rows = rows[self.columns].to_numpy(dtype=object)
+        rows = np.atleast_2d(rows)
+        out = np.zeros((rows.shape[0], self.n_out), dtype=np.float32)
+
+        num = rows[:, self.num_pos].astype(np.float64)
+        num = np.where(np.isnan(num), self.num_fill, num)
+        out[:, self.num_out] = (num - self.num_mean) / self.num_scale
+
+        for j, slots in enumerate(self.cat_maps):
+            fill = self.cat_fill[j]
+            # look each distinct value up once; factorize sets NaN and None aside (-1)
+            codes, uniques = pd.factorize(rows[:, self.cat_pos[j]])
+            lookup = np.array([slots.get(value, -1) for value in uniques] + [-1], dtype=np.int64)
+            slot = lookup[codes]
+            for i in np.flatnonzero(codes < 0):
+                # SimpleImputer only counts NaN as missing in an object column, not None
+                value = rows[i, self.cat_pos[j]]
+                slot[i] = slots.get(fill if value != value else value, -1)
+            hit = np.flatnonzero(slot >= 0)
+            out[hit, slot[hit]] = 1.0
+
+        out[:, self.pass_out] = rows[:, self.pass_pos].astype(np.float64)
+        return out
+
+
+class CompiledForest:
+    """A forest as contiguous node arrays sized for serving.
+
+    float32 thresholds (rounded down, so ``x <= t`` picks the same branch for
+    every float32 input as sklearn's float64 threshold), int32 features and
+    children, and float64 class probabilities stored for leaves only. Leaves
+    point back at themselves, so traversal is a fixed ``depth`` steps of
+    gathers over every (row, tree) pair with no per-step leaf check.
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_id, leaf_value, roots, depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_id = leaf_id
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes_ = np.asarray(classes, dtype=object)
+        # [left, right] per node, so a step is one gather at 2 * node + went_right
+        self.children = np.stack([left, right], axis=1).reshape(-1)
+
+    @classmethod
+    def from_flat(cls, flat):
+        is_leaf = np.asarray(flat.left) == -1
+        nodes = np.arange(len(is_leaf), dtype=np.int32)
+
+        threshold = np.asarray(flat.threshold, dtype=np.float64)
+        rounded = threshold.astype(np.float32)
+        over = rounded.astype(np.float64) > threshold
+        rounded[over] = np.nextafter(rounded[over], np.float32(-np.inf))
+
+        leaf_id = np.full(len(is_leaf), -1, dtype=np.int32)
+        leaf_id[is_leaf] = np.arange(is_leaf.sum(), dtype=np.int32)
+
+        # longest root-to-leaf path, level by level
+        depth, frontier = 0, np.asarray(flat.roots)
+        while True:
+            frontier = frontier[~is_leaf[frontier]]
+            if not len(frontier):
+                break
+            frontier = np.concatenate([flat.left[frontier], flat.right[frontier]])
+            depth += 1
+
+        return cls(
+            np.where(is_leaf, 0, flat.feature).astype(np.int32),
+            np.where(is_leaf, np.float32(0), rounded).astype(np.float32),
+            np.where(is_leaf, nodes, flat.left).astype(np.int32),
+            np.where(is_leaf, nodes, flat.right).astype(np.int32),
+            leaf_id,
+            np.ascontiguousarray(np.asarray(flat.value)[is_leaf], dtype=np.float64),
+            np.asarray(flat.roots, dtype=np.int32),
+            depth,
+            flat.classes_,
+        )
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        return cls.from_flat(forest if isinstance(forest, FlatForest) else FlatForest.from_sklearn(forest))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in TREE_FIELDS)
+
+    def apply(self, X):
+        """Leaf node id per (row, tree)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, n_features = X.shape
+        flat_x = X.reshape(-1)
+        index_dtype = np.int32 if n * n_features < np.iinfo(np.int32).max else np.int64
+        base = (np.arange(n, dtype=index_dtype) * n_features)[:, np.newaxis]
+        # every step reuses the same contiguous buffers, so a batch allocates nothing per level
+        node = np.empty((n, len(self.roots)), dtype=np.int32)
+        node[:] = self.roots
+        index = np.empty(node.shape, dtype=index_dtype)
+        x = np.empty(node.shape, dtype=np.float32)
+        threshold = np.empty(node.shape, dtype=np.float32)
+        went_right = np.empty(node.shape, dtype=bool)
+        for _ in range(self.depth):
+            np.take(self.feature, node, out=index)
+            np.add(index, base, out=index)
+            np.take(flat_x, index, out=x)
+            np.take(self.threshold, node, out=threshold)
+            np.greater(x, threshold, out=went_right)
+            np.multiply(node, 2, out=node)
+            np.add(node, went_right, out=node)
+            np.take(self.children, node, out=node)
+        return node
+
+    def predict_proba(self, X):
+        # summing over the tree axis (not the contiguous one) adds trees in order,
+        # the same float64 accumulation sklearn does
+        proba = self.leaf_value[self.leaf_id[self.apply(X)]].sum(axis=1)
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class CompiledPipeline:
+    """Drop-in for the artifact pipeline on encoded rows: no DataFrame, no sklearn dispatch.
+
+    Saved as one .npz next to the artifact (no pickles), tagged with the
+    artifact's content hash so a stale export is never used.
+    """
+
+    def __init__(self, pre, forest):
+        self.pre = pre
+        self.forest = forest
+        self.classes_ = forest.classes_
+        self.named_steps = {"pre": pre, "rf": forest}
+
+    @classmethod
+    def from_pipeline(cls, pipeline, columns):
+        """Compile the artifact Pipeline (or a SharedPipeline) for rows laid out as ``columns``"""
+        return cls(CompiledPreprocessor.from_sklearn(pipeline.named_steps["pre"], columns),
+                   CompiledForest.from_sklearn(pipeline.named_steps["rf"]))
+
+    @property
+    def nbytes(self):
+        return self.forest.nbytes + sum(getattr(self.pre, name).nbytes for name in PRE_FIELDS)
+
+    def transform(self, rows):
+        return self.pre.transform(rows)
+
+    def predict_proba(self, rows):
+        return self.forest.predict_proba(self.pre.transform(rows))
+
+    def predict(self, rows):
+        return self.forest.predict(self.pre.transform(rows))
+
+    def save(self, path, source_hash=""):
+        arrays = {f"pre_{name}": getattr(self.pre, name) for name in PRE_FIELDS}
+        arrays.update({f"rf_{name}": getattr(self.forest, name) for name in TREE_FIELDS})
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f, version=np.int64(COMPILED_VERSION), source_hash=np.array(source_hash),
+                columns=np.array(self.pre.columns, dtype=str), n_out=np.int64(self.pre.n_out),
+                depth=np.int64(self.forest.depth),
+                classes=np.array([str(c) for c in self.classes_], dtype=str), **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, expected_hash=None):
+        """Open a saved export; None if it is missing, unreadable or not for ``expected_hash``"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != COMPILED_VERSION:
+                    return None
+                if expected_hash is not None and str(data["source_hash"]) != expected_hash:
+                    return None
+                pre = CompiledPreprocessor(data["columns"].tolist(), int(data["n_out"]),
+                                           **{name: data[f"pre_{name}"] for name in PRE_FIELDS})
+                forest = CompiledForest(**{name: data[f"rf_{name}"] for name in TREE_FIELDS},
+                                        depth=int(data["depth"]), classes=data["classes"].tolist())
+                return cls(pre, forest)
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def export_compiled(artifact_path, pipeline, columns):
+    """Compile ``pipeline`` and save it as the artifact's compiled export"""
+    path = compiled_path(artifact_path)
+    CompiledPipeline.from_pipeline(pipeline, columns).save(path, source_hash=file_hash(artifact_path))
+    return path
+
+
+def load_compiled(artifact_path, pipeline, columns):
+    """The artifact's CompiledPipeline: its export when current, else compiled in memory"""
+    if os.path.exists(compiled_path(artifact_path)):
+        compiled = CompiledPipeline.load(compiled_path(artifact_path), file_hash(artifact_path))
+        if compiled is not None and compiled.pre.columns == [str(c) for c in columns]:
+            return compiled
+    return CompiledPipeline.from_pipeline(pipeline, columns)
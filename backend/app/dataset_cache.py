@@ -0,0 +1,139 @@
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+CACHE_VERSION = 1
+
+
+_hash_memo = {}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """sha256 of a file's bytes, streamed so large CSVs are not held in memory.
+
+    Remembered per (path, size, mtime), since several loaders key off the
+    same dataset file during startup.
+    """
+    st = os.stat(path)
+    key = (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+    if key in _hash_memo:
+        return _hash_memo[key]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    _hash_memo[key] = h.hexdigest()
+    return _hash_memo[key]
+
+
+def cache_path_for(csv_path, cache_dir):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    digest = file_hash(csv_path)[:16]
+    return os.path.join(cache_dir, f"{stem}.{digest}.v{CACHE_VERSION}.npz")
+
+
+def save_frame(df, path):
+    """Write a parsed CSV frame as one array per column (no pickled objects).
+
+    String columns are dictionary-encoded: int32 codes plus the distinct
+    values, with code -1 marking missing cells.
+    """
+    arrays = {"__columns__": np.array(df.columns.astype(str), dtype=str)}
+    for i, col in enumerate(df.columns):
+        values = df[col]
+        if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+            arrays[f"c{i}"] = codes.astype(np.int32)
+            arrays[f"u{i}"] = np.asarray(uniques, dtype=str)
+        else:
+            arrays[f"c{i}"] = values.to_numpy()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+    # drop entries for older versions of the same CSV
+    stem = os.path.basename(path).split(".", 1)[0]
+    for stale in glob.glob(os.path.join(os.path.dirname(path), f"{stem}.*.npz")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_frame(path, categorical=False):
+    """Frame saved by save_frame; ``categorical`` keeps string columns as categoricals"""
+    with np.load(path, allow_pickle=False) as data:
+        columns = data["__columns__"].tolist()
+        out = {}
+        for i, col in enumerate(columns):
+            values = data[f"c{i}"]
+            if f"u{i}" in data and categorical:
+                # code -1 is already missing in a Categorical, no object array needed
+                values = pd.Categorical.from_codes(values, categories=data[f"u{i}"].astype(object))
+            elif f"u{i}" in data:
+                # trailing NaN so code -1 lands on it
+                uniques = np.append(data[f"u{i}"].astype(object), np.nan)
+                values = uniques[values]
+            out[col] = values
+    return pd.DataFrame(out, columns=columns)
+
+
+def read_csv_categorical(csv_path, chunk_rows=200_000):
+    """pd.read_csv with string columns as categoricals, never holding a whole object column.
+
+    Read in chunks: each chunk's strings become a categorical before the
+    next chunk is read, and the chunks' categories are merged at the end.
+    """
+    chunks = []
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        for col in chunk.columns:
+            if chunk[col].dtype == object:
+                chunk[col] = chunk[col].astype("category")
+        chunks.append(chunk)
+    if not chunks:
+        return pd.read_csv(csv_path)
+
+    columns = {}
+    for col in chunks[0].columns:
+        parts = [chunk[col] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[col] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def read_csv_cached(csv_path, cache_dir=None, categorical=False):
+    """pd.read_csv with a binary per-column cache keyed by the CSV's content hash.
+
+    The cache is an .npz of numpy arrays (save_frame), not parquet.
+    ``categorical`` loads string columns as categoricals (read_csv_categorical)
+    and builds warm loads' categoricals straight from the cached codes.
+    """
+    read = read_csv_categorical if categorical else pd.read_csv
+    if not cache_dir:
+        return read(csv_path)
+
+    path = cache_path_for(csv_path, cache_dir)
+    if os.path.exists(path):
+        try:
+            return load_frame(path, categorical=categorical)
+        except (OSError, ValueError, KeyError):
+            pass  # unreadable cache entry, rebuild below
+
+    df = read(csv_path)
+    try:
+        save_frame(df, path)
+    except OSError:
+        pass  # read-only deploys still work, just without the cache
+    return df
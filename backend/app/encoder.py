@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+from app.symptom_store import gather_rows
+
+
+NUMERIC_FEATURES = ["age", "weight_kg", "heart_rate", "respiratory", "systolic_bp", "oxygen", "gcs",
+                    "exposure_estimate", "time_since_exposure_min"]
+
+
+class FeatureEncoder:
+    """Turns PredictInput-shaped dicts into rows in the artifact's feature order.
+
+    Everything that depends only on the artifact (column positions, defaults,
+    symptom lookups) is worked out once here, so encoding a request only
+    touches the fields the caller actually supplied.
+    """
+
+    def __init__(self, feature_columns, mlb_classes, numeric_features=NUMERIC_FEATURES):
+        self.columns = list(feature_columns)
+        self.col_index = {col: i for i, col in enumerate(self.columns)}
+
+        numeric = set(numeric_features)
+        self.symptom_positions = [i for i, c in enumerate(self.columns) if c.startswith("sym_")]
+        self.numeric_positions = [i for i, c in enumerate(self.columns)
+                                  if not c.startswith("sym_") and c in numeric]
+        self.categorical_positions = [i for i, c in enumerate(self.columns)
+                                      if not c.startswith("sym_") and c not in numeric]
+
+        # prebuilt row with the same defaults as the original template dict
+        self.template = np.empty(len(self.columns), dtype=object)
+        self.template[self.symptom_positions] = 0
+        self.template[self.numeric_positions] = 0
+        self.template[self.categorical_positions] = "unknown"
+
+        # symptom name -> column index, only for classes the model was trained on
+        self.symptom_index = {}
+        for sym in mlb_classes:
+            idx = self.col_index.get(f"sym_{sym}")
+            if idx is not None:
+                self.symptom_index[sym] = idx
+
+        # plain (non-symptom) input fields -> column index
+        self.field_index = {self.columns[i]: i
+                            for i in self.numeric_positions + self.categorical_positions}
+
+        self._num_cols = [self.columns[i] for i in self.numeric_positions]
+        self._cat_cols = [self.columns[i] for i in self.categorical_positions]
+        self._sym_cols = [self.columns[i] for i in self.symptom_positions]
+        self._block_order = self._num_cols + self._cat_cols + self._sym_cols
+        self._needs_reorder = self._block_order != self.columns
+
+    def encode_row(self, data: dict, out=None) -> np.ndarray:
+        """Fill ``out`` (or a fresh row) from a dict of user-supplied values"""
+        if out is None:
+            out = self.template.copy()
+        else:
+            np.copyto(out, self.template)
+
+        for key, value in data.items():
+            if key == "symptoms":
+                if value:
+                    for sym in value.split(","):
+                        idx = self.symptom_index.get(sym.strip())
+                        if idx is not None:
+                            out[idx] = 1
+            elif value is not None:
+                idx = self.field_index.get(key)
+                if idx is not None:
+                    out[idx] = value
+        return out
+
+    def update_row(self, row: np.ndarray, changes: dict) -> np.ndarray:
+        """Patch an encoded row in place with only the fields in ``changes``.
+
+        A None value puts the field back to its default, and new symptoms
+        replace the old ones.
+        """
+        for key, value in changes.items():
+            if key == "symptoms":
+                row[self.symptom_positions] = 0
+                if value:
+                    for sym in value.split(","):
+                        idx = self.symptom_index.get(sym.strip())
+                        if idx is not None:
+                            row[idx] = 1
+            else:
+                idx = self.field_index.get(key)
+                if idx is not None:
+                    row[idx] = value if value is not None else self.template[idx]
+        return row
+
+    def key(self, data: dict) -> tuple:
+        """Hashable identity of what the model sees for ``data``.
+
+        Inputs that encode to the same row share a key: symptom order,
+        duplicates and names the model does not know make no difference,
+        nor do fields that are not features.
+        """
+        fields = tuple(
+            value if (value := data.get(col)) is not None else self.template[i]
+            for col, i in self.field_index.items()
+        )
+        symptoms = data.get("symptoms")
+        positions = ()
+        if symptoms:
+            positions = tuple(sorted({self.symptom_index[s] for s in map(str.strip, symptoms.split(","))
+                                      if s in self.symptom_index}))
+        return fields, positions
+
+    def encode_batch(self, records) -> np.ndarray:
+        """Encode a list of dicts into one (n_records, n_features) object matrix"""
+        rows = np.empty((len(records), len(self.columns)), dtype=object)
+        for i, data in enumerate(records):
+            self.encode_row(data, out=rows[i])
+        return rows
+
+    def encode_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        """encode_batch for a DataFrame of inputs, column by column instead of row by row.
+
+        Missing cells (None/NaN) count as omitted fields, as in the API.
+        """
+        rows = np.empty((len(frame), len(self.columns)), dtype=object)
+        rows[:] = self.template
+        for col, i in self.field_index.items():
+            if col in frame.columns:
+                values = frame[col].to_numpy(dtype=object)
+                given = pd.notna(values)
+                rows[given, i] = values[given]
+
+        if "symptoms" in frame.columns and len(frame):
+            # each distinct symptom string is parsed once, then scattered to its rows
+            codes, uniques = pd.factorize(frame["symptoms"].to_numpy(dtype=object))
+            parsed = [sorted({self.symptom_index[s] for s in map(str.strip, str(cell).split(","))
+                              if s in self.symptom_index}) for cell in uniques]
+            indptr = np.zeros(len(parsed) + 1, dtype=np.int64)
+            np.cumsum([len(p) for p in parsed], out=indptr[1:])
+            indices = np.fromiter((i for p in parsed for i in p), dtype=np.int64, count=int(indptr[-1]))
+            given = np.flatnonzero(codes >= 0)
+            row_ptr, positions = gather_rows(indptr, indices, codes[given])
+            rows[np.repeat(given, np.diff(row_ptr)), positions] = 1
+        return rows
+
+    def to_frame(self, rows: np.ndarray) -> pd.DataFrame:
+        """Wrap encoded rows in a DataFrame with numeric/categorical/symptom dtypes"""
+        rows = np.atleast_2d(rows)
+        frame = pd.concat([
+            pd.DataFrame(rows[:, self.numeric_positions].astype(float), columns=self._num_cols),
+            pd.DataFrame(rows[:, self.categorical_positions], columns=self._cat_cols),
+            pd.DataFrame(rows[:, self.symptom_positions].astype(np.int64), columns=self._sym_cols),
+        ], axis=1, copy=False)
+        if self._needs_reorder:
+            frame = frame[self.columns]
+        return frame
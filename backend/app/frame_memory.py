@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+
+# object columns with at most this share of distinct values become categorical
+MAX_CATEGORY_RATIO = 0.5
+
+
+def _float32_lossless(values):
+    """True when every value survives float64 -> float32 -> float64 unchanged (NaN included)"""
+    narrowed = values.astype(np.float32).astype(np.float64)
+    return bool(np.all((narrowed == values) | (np.isnan(narrowed) & np.isnan(values))))
+
+
+def compact_frame(df, max_category_ratio=MAX_CATEGORY_RATIO):
+    """The same data in smaller dtypes, only where nothing changes.
+
+    Integers take the smallest integer type that holds them, floats become
+    float32 when every value is exactly representable, and repetitive
+    object columns become categoricals (each distinct string stored once).
+    Values read back, and their JSON, are identical to the original frame's.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        kind = values.dtype.kind
+        if kind in "iu":
+            values = pd.to_numeric(values, downcast="integer" if kind == "i" else "unsigned")
+        elif kind == "f" and values.dtype.itemsize > 4 and _float32_lossless(values.to_numpy()):
+            values = values.astype(np.float32)
+        elif kind == "O" and len(values) and values.nunique(dropna=False) <= max_category_ratio * len(values):
+            values = values.astype("category")
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def column_memory(df):
+    """Per-column dtype and bytes (strings counted in full), largest first"""
+    usage = df.memory_usage(deep=True, index=False)
+    report = [{"column": str(col), "dtype": str(df[col].dtype), "bytes": int(usage[col])} for col in df.columns]
+    return sorted(report, key=lambda c: -c["bytes"])
+
+
+def array_bytes(obj):
+    """Bytes of the numpy arrays an object holds directly or in lists/dicts of its attributes"""
+    if obj is None:
+        return 0
+    total = 0
+    for value in vars(obj).values():
+        items = value.values() if isinstance(value, dict) else value if isinstance(value, (list, tuple)) else [value]
+        total += sum(item.nbytes for item in items if isinstance(item, np.ndarray))
+    return total
@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # br is only offered when brotli is installed
+    brotli = None
+
+
+# bodies smaller than this are sent as they are, compressing them gains nothing
+MIN_COMPRESS_BYTES = 512
+
+
+def dumps(content) -> bytes:
+    """JSON bytes, with orjson when it is installed (numpy scalars and arrays included)"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    # the same settings as starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _accepts(accept_encoding, coding):
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _matching_etag(if_none_match, etags, selected):
+    """The ETag of ours the client already holds (the selected one for "*"), else None"""
+    if if_none_match.strip() == "*":
+        return selected
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag in etags:
+            return tag
+    return None
+
+
+class CachedBody:
+    """One encoded JSON response body with its strong ETag and compressed variants.
+
+    Each variant is compressed the first time a client accepts it and kept,
+    so compression costs once per body, not once per request.
+    """
+
+    def __init__(self, body, media_type="application/json", headers=None):
+        self.body = body
+        self.media_type = media_type
+        self.headers = dict(headers or {})
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def compressed(self, coding):
+        """Body compressed with ``coding``, computed on first use"""
+        return self._variant(coding)[0]
+
+    def _variant(self, coding):
+        """(body, etag) for a content coding; each representation has its own strong ETag"""
+        if coding is None:
+            return self.body, self.etag
+        with self._lock:
+            if coding not in self._encoded:
+                if coding == "br":
+                    body = brotli.compress(self.body, quality=5)
+                else:
+                    body = gzip.compress(self.body, compresslevel=6, mtime=0)
+                self._encoded[coding] = (body, f'{self.etag[:-1]}-{coding}"')
+            return self._encoded[coding]
+
+    def _negotiate(self, accept_encoding):
+        if len(self.body) < MIN_COMPRESS_BYTES or not accept_encoding:
+            return None
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            return "br"
+        if _accepts(accept_encoding, "gzip"):
+            return "gzip"
+        return None
+
+    def respond(self, request, cache_control):
+        """200 with the negotiated encoding, or 304 when the client already has it"""
+        coding = self._negotiate(request.headers.get("accept-encoding", ""))
+        body, etag = self._variant(coding)
+        headers = {**self.headers, "ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            known = {self.etag} | {tag for _, tag in self._encoded.values()}
+            held = _matching_etag(if_none_match, known, etag)
+            if held is not None:
+                # same bytes, maybe in another encoding: tell the client which copy is still good
+                return Response(status_code=304, headers={**headers, "ETag": held})
+
+        if coding is not None:
+            headers["Content-Encoding"] = coding
+        return Response(body, media_type=self.media_type, headers=headers)
+
+
+class ResponseCache:
+    """Encoded response bodies by key, least recently used dropped past ``max_bytes``.
+
+    ``max_bytes`` counts the uncompressed bodies. There is one cache per
+    model version, so nothing in it ever needs invalidating: a reload
+    brings a new, empty cache along with the new data.
+    """
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, build):
+        """The cached body for ``key``, calling ``build()`` -> CachedBody on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # built outside the lock; two racing misses build the same bytes, the first one stays
+        entry = build()
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = entry
+            self.nbytes += len(entry.body)
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, dropped = self._entries.popitem(last=False)
+                self.nbytes -= len(dropped.body)
+        return entry
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.nbytes, "hits": self.hits, "misses": self.misses}
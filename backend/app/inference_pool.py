@@ -0,0 +1,106 @@
+import asyncio
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class PoolSaturated(Exception):
+    """Raised when the admission queue is full; callers should answer 503"""
+
+
+def _timed_call(fn, args):
+    # time.monotonic is system-wide, so this also works from a worker process
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic()
+
+
+class InferencePool:
+    """Runs CPU-bound inference off the event loop with bounded admission.
+
+    ``kind`` is "thread", "process" or "inline" (run on the caller, the old
+    behaviour, kept for comparison). At most ``workers + max_queue`` calls
+    are admitted at once; beyond that ``run`` raises PoolSaturated right
+    away instead of letting latency grow. Only call ``run`` from the event
+    loop thread; the counters rely on that instead of a lock.
+    """
+
+    def __init__(self, kind="thread", workers=4, max_queue=64, initializer=None):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.capacity = workers + max_queue
+
+        if kind == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cwa-infer")
+        elif kind == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                                initializer=initializer)
+        elif kind == "inline":
+            self.executor = None
+        else:
+            raise ValueError(f"Unknown inference pool kind '{kind}'")
+
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise PoolSaturated()
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.submitted += 1
+        enqueued = time.monotonic()
+        try:
+            if self.executor is None:
+                result, started, finished = _timed_call(fn, args)
+            else:
+                loop = asyncio.get_running_loop()
+                result, started, finished = await loop.run_in_executor(self.executor, _timed_call, fn, args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        wait = max(0.0, started - enqueued)
+        self.completed += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+        self.run_seconds_total += finished - started
+        return result
+
+    @property
+    def queue_depth(self):
+        return max(0, self.in_flight - self.workers)
+
+    def stats(self):
+        done = max(self.completed, 1)
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_in_flight": self.max_in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_avg": round(self.wait_seconds_total / done * 1000, 3),
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            "run_ms_avg": round(self.run_seconds_total / done * 1000, 3),
+        }
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,20 +1,283 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Optional, List, Any, Dict, Literal
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from app.model import CwaModel
+from app.encoder import FeatureEncoder
+from app.shared_store import load_shared_artifact, share_model_arrays
+from app.compiled import CompileError, load_compiled
+from app.registry import ModelRegistry, ModelVersion
+from app.http_cache import CachedBody, ResponseCache, dumps
+from app.frame_memory import array_bytes, column_memory
+from app.prediction_cache import PredictionCache, parse_quantize, quantize
+from app.inference_pool import InferencePool, PoolSaturated
+from app.microbatch import MicroBatcher
+from app.monitor import MonitorSessions
+from app.routing import MODELS, ModelRouter, ModelStats, check_routes, parse_routes
+from app.metrics import (REGISTRY, FALLBACKS, ServerTimingMiddleware, StageClock, add_laps, mark,
+                         observe_laps, record_stage, stage)
+from app.profiler import SamplingProfiler
+import asyncio
+import functools
+import logging
 import joblib
-import re
+import os
+import secrets
+import threading
+import time
+import numpy as np
 import pandas as pd
 
 
-artifact = joblib.load("model_artifact.joblib")
-model = artifact["pipeline"]
-mlb_classes = artifact["mlb_classes"]
-expected_features = artifact["feature_columns"]
-
-app = FastAPI(title="CWA Agent Prediction API")
+ARTIFACT_PATH = os.environ.get("CWA_ARTIFACT_PATH", "model_artifact.joblib")
+MODEL_PATH = os.environ.get("CWA_MODEL_PATH", "models_cwa.pkl")
+DATASET_PATH = os.environ.get("CWA_DATASET_PATH", "cwa_dataset_augmented.csv")
+CACHE_DIR = os.environ.get("CWA_CACHE_DIR", ".cache")
+# When set, forest node arrays, dataset columns and the dataset's index arrays
+# are memory-mapped from this directory and shared by every worker on the box
+SHARED_DIR = os.environ.get("CWA_SHARED_DIR")
+# Where predictions run: "thread", "process" or "inline" (on the event loop)
+INFERENCE_POOL = os.environ.get("CWA_INFERENCE_POOL", "thread")
+INFERENCE_WORKERS = int(os.environ.get("CWA_INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+# Calls waiting for a free worker before requests get 503. A call to the pool is
+# a whole micro-batch, so each batcher also turns away single requests once a
+# full batch per worker is being scored and this many more are waiting
+INFERENCE_QUEUE = int(os.environ.get("CWA_INFERENCE_QUEUE", 64))
+# /predict_agent micro-batching; a max batch of 1 turns it off
+MICROBATCH_MAX = int(os.environ.get("CWA_MICROBATCH_MAX", 32))
+MICROBATCH_WAIT_MS = float(os.environ.get("CWA_MICROBATCH_WAIT_MS", 5))
+# What scores requests: "compiled" (flat-array preprocessing + forest, same
+# outputs as the artifact pipeline) or "sklearn" (the artifact pipeline itself)
+ENGINE = os.environ.get("CWA_ENGINE", "compiled")
+# Share of /predict_agent traffic per model ("compiled", "sklearn", "neighbors"), e.g.
+# "compiled=90,neighbors=10"; empty sends all of it to the CWA_ENGINE model
+MODEL_ROUTES = parse_routes(os.environ.get("CWA_MODEL_ROUTES", ""))
+# Smaller dtypes for the in-memory dataset (same values); 0 keeps the plain pandas dtypes
+COMPACT_DATASET = os.environ.get("CWA_COMPACT_DATASET", "1") == "1"
+# Enables /debug/profile, which samples stacks for flame graphs
+PROFILING = os.environ.get("CWA_PROFILING", "0") == "1"
+# Seconds between checks of the model files for changes; 0 turns hot reload by file change off
+RELOAD_POLL = float(os.environ.get("CWA_RELOAD_POLL", 5))
+# Catalog and detail responses only change with a reload; clients may reuse them
+# this long and then revalidate with If-None-Match
+CACHE_CONTROL = f"public, max-age={int(os.environ.get('CWA_CACHE_MAX_AGE', 60))}"
+# Encoded catalog/detail responses kept per model version
+RESPONSE_CACHE_MB = int(os.environ.get("CWA_RESPONSE_CACHE_MB", 64))
+# Enables POST /admin/reload for callers sending this value as X-Admin-Token
+ADMIN_TOKEN = os.environ.get("CWA_ADMIN_TOKEN")
+
+# predict_agent result cache: entries (0 turns it off), time-to-live in seconds (0
+# keeps entries until evicted or the model reloads), and optional rounding of
+# vitals before keying, e.g. "heart_rate=5,oxygen=1,systolic_bp=5"
+PREDICT_CACHE_SIZE = int(os.environ.get("CWA_PREDICT_CACHE_SIZE", 4096))
+PREDICT_CACHE_TTL = float(os.environ.get("CWA_PREDICT_CACHE_TTL", 300))
+PREDICT_QUANTIZE = parse_quantize(os.environ.get("CWA_PREDICT_QUANTIZE", ""))
+# /monitor sessions: live sessions per process, seconds before an idle one is dropped,
+# the score change worth pushing, and seconds between keep-alives on the event stream
+MONITOR_SESSIONS = int(os.environ.get("CWA_MONITOR_SESSIONS", 1000))
+MONITOR_IDLE = float(os.environ.get("CWA_MONITOR_IDLE", 600))
+MONITOR_MIN_CHANGE = float(os.environ.get("CWA_MONITOR_MIN_CHANGE", 0.05))
+MONITOR_KEEPALIVE = float(os.environ.get("CWA_MONITOR_KEEPALIVE", 15))
+
+logger = logging.getLogger(__name__)
+
+inference_pool = None
+# one micro-batcher per model, as a batch is scored by a single model
+batchers = {}
+row_batcher = None
+router = ModelRouter(MODEL_ROUTES)
+model_stats = ModelStats()
+# Monitored patients of this process; clients must stick to one worker
+monitors = MonitorSessions(MONITOR_SESSIONS, MONITOR_IDLE)
+
+startup = {"ready": False, "error": None}
+_loaded = threading.Event()
+
+
+def model_files():
+    return [ARTIFACT_PATH, MODEL_PATH, DATASET_PATH]
+
+
+def build_version(version):
+    """Load the artifact and CwaModel concurrently, compile and warm them up"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        if SHARED_DIR:
+            artifact_future = pool.submit(load_shared_artifact, ARTIFACT_PATH, SHARED_DIR)
+        else:
+            artifact_future = pool.submit(joblib.load, ARTIFACT_PATH)
+        model_future = pool.submit(CwaModel, model_path=MODEL_PATH, dataset_path=DATASET_PATH,
+                                   cache_dir=CACHE_DIR, compact=COMPACT_DATASET)
+        artifact = artifact_future.result()
+        model = model_future.result()
+
+    if SHARED_DIR:
+        share_model_arrays(model, SHARED_DIR)
+
+    pipeline = artifact["pipeline"]
+    encoder = FeatureEncoder(artifact["feature_columns"], artifact["mlb_classes"])
+    compiled = None
+    if ENGINE == "compiled":
+        try:
+            compiled = load_compiled(ARTIFACT_PATH, pipeline, artifact["feature_columns"])
+        except CompileError:
+            logger.exception("Artifact pipeline cannot be compiled, serving it with sklearn")
+    loaded = ModelVersion(version, artifact, model, pipeline, compiled, encoder,
+                          load_seconds=round(time.perf_counter() - started, 3),
+                          responses=ResponseCache(RESPONSE_CACHE_MB << 20),
+                          predictions=PredictionCache(PREDICT_CACHE_SIZE, PREDICT_CACHE_TTL))
+
+    warm_start = time.perf_counter()
+    warm_up(loaded)
+    precompute_responses(loaded)
+    loaded.warmup_seconds = round(time.perf_counter() - warm_start, 3)
+    return loaded
+
+
+def warm_up(loaded):
+    """Run one prediction through each path so first requests don't pay lazy init"""
+    encoder = loaded.encoder
+    loaded.pipeline.predict_proba(encoder.to_frame(encoder.template))
+    if loaded.compiled is not None:
+        loaded.compiled.predict_proba(encoder.template)
+    loaded.model.predict({})
+
+
+def _mark_ready(loaded):
+    # a reload that succeeds after a failed startup also makes the server ready
+    startup.update(ready=True, error=None)
+
+
+def _agents_body(model):
+    return CachedBody(dumps(model.agents))
+
+
+def _symptoms_body(model):
+    return CachedBody(dumps(model.symptom_catalog.vocab))
+
+
+def _system_symptoms(model, system):
+    """Dataset symptoms for a lower-cased system, else the curated list, else None"""
+    system_symptoms = model.symptom_catalog.system_symptoms if model.symptom_catalog is not None else {}
+    if system in system_symptoms:
+        return system_symptoms[system]
+    # fall back to the curated list for systems the dataset does not cover
+    return SYSTEM_SYMPTOMS.get(system)
+
+
+def precompute_responses(loaded):
+    """Encode the parameterless catalog responses (and their gzip form) before the version serves"""
+    model, responses = loaded.model, loaded.responses
+    bodies = [responses.get(("agents",), lambda: _agents_body(model))]
+    if model.symptom_catalog is not None:
+        bodies.append(responses.get(("symptoms",), lambda: _symptoms_body(model)))
+        systems = set(model.symptom_catalog.system_symptoms) | set(SYSTEM_SYMPTOMS)
+    else:
+        systems = set(SYSTEM_SYMPTOMS)
+    for system in sorted(systems):
+        symptoms = _system_symptoms(model, system)
+        bodies.append(responses.get(("system", system), lambda: CachedBody(dumps(symptoms))))
+    for body in bodies:
+        body.compressed("gzip")
+
+
+# Serves the current ModelVersion; reloads swap it without a restart
+registry = ModelRegistry(build_version, model_files, on_swap=_mark_ready)
+
+
+def load_all():
+    """Load the first version (or reload from scratch); ready once it is warm"""
+    try:
+        registry.reload("startup", force=True)
+    except Exception as e:
+        startup["error"] = repr(e)
+    finally:
+        _loaded.set()
+
+
+def wait_until_ready(timeout=None) -> bool:
+    _loaded.wait(timeout)
+    return startup["ready"]
+
+
+def require_ready():
+    if not startup["ready"]:
+        raise HTTPException(status_code=503, detail="Model is still loading", headers={"Retry-After": "1"})
+
+
+def _init_inference_process():
+    """Process-pool initializer: each worker process loads its own models"""
+    load_all()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global inference_pool, row_batcher
+    inference_pool = InferencePool(INFERENCE_POOL, workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE,
+                                   initializer=_init_inference_process)
+    for name in MODELS:
+        batchers[name] = MicroBatcher(functools.partial(_score_pooled, model=name),
+                                      max_batch=MICROBATCH_MAX, max_wait_ms=MICROBATCH_WAIT_MS,
+                                      max_concurrent=inference_pool.workers, max_queue=INFERENCE_QUEUE)
+    row_batcher = MicroBatcher(functools.partial(_score_pooled, score=_score_rows),
+                               max_batch=MICROBATCH_MAX, max_wait_ms=MICROBATCH_WAIT_MS,
+                               max_concurrent=inference_pool.workers, max_queue=INFERENCE_QUEUE)
+    threading.Thread(target=load_all, name="cwa-loader", daemon=True).start()
+    if RELOAD_POLL > 0:
+        registry.watch(RELOAD_POLL)
+    yield
+    registry.stop()
+    inference_pool.shutdown()
+
+
+app = FastAPI(title="CWA Agent Prediction API", lifespan=lifespan)
+
+
+def _when_started(read):
+    """Scrape-time reader that reports nothing until the pool exists"""
+    return lambda: read() if inference_pool is not None else {}
+
+
+REGISTRY.collected("cwa_ready", "1 once models are loaded and warmed up", "gauge",
+                   lambda: {(): int(startup["ready"])})
+REGISTRY.collected("cwa_inference_in_flight", "Calls admitted to the inference pool", "gauge",
+                   _when_started(lambda: {(): inference_pool.in_flight}))
+REGISTRY.collected("cwa_inference_queue_depth", "Admitted calls waiting for a worker", "gauge",
+                   _when_started(lambda: {(): inference_pool.queue_depth}))
+REGISTRY.collected("cwa_inference_calls_total", "Inference pool calls by outcome", "counter",
+                   _when_started(lambda: {("completed",): inference_pool.completed,
+                                          ("failed",): inference_pool.failed,
+                                          ("rejected",): inference_pool.rejected}),
+                   ("outcome",))
+REGISTRY.collected("cwa_microbatch_batches_total", "Batches dispatched by the micro-batchers", "counter",
+                   _when_started(lambda: {(): sum(b.batches for b in batchers.values())}))
+REGISTRY.collected("cwa_microbatch_items_total", "Requests scored through the micro-batchers", "counter",
+                   _when_started(lambda: {(): sum(b.items for b in batchers.values())}))
+REGISTRY.collected("cwa_monitor_sessions", "Live /monitor sessions in this process", "gauge",
+                   lambda: {(): len(monitors)})
+REGISTRY.collected("cwa_monitor_updates_total", "/monitor updates by outcome", "counter",
+                   lambda: {(outcome,): n for outcome, n in monitors.updates.items()}, ("outcome",))
+REGISTRY.collected("cwa_model_reloads_total", "Model reloads by outcome", "counter",
+                   lambda: {(outcome,): n for outcome, n in registry.outcomes.items()}, ("outcome",))
+REGISTRY.collected("cwa_response_cache_lookups_total", "Cached catalog/detail response lookups by result",
+                   "counter", lambda: {("hit",): registry.current.responses.hits,
+                                       ("miss",): registry.current.responses.misses}
+                   if registry.current is not None else {}, ("result",))
+REGISTRY.collected("cwa_response_cache_bytes", "Encoded response bytes cached for the serving version", "gauge",
+                   lambda: {(): registry.current.responses.nbytes} if registry.current is not None else {})
+REGISTRY.collected("cwa_prediction_cache_events_total", "predict_agent cache lookups and removals by event",
+                   "counter", lambda: {(event,): getattr(registry.current.predictions, attr)
+                                       for event, attr in (("hit", "hits"), ("miss", "misses"),
+                                                           ("coalesced", "coalesced"), ("eviction", "evictions"),
+                                                           ("expired", "expirations"))}
+                   if registry.current is not None else {}, ("event",))
+REGISTRY.collected("cwa_prediction_cache_entries", "predict_agent results cached for the serving version", "gauge",
+                   lambda: {(): len(registry.current.predictions)} if registry.current is not None else {})
+REGISTRY.collected("cwa_model_loaded_timestamp_seconds", "When the serving model version was loaded", "gauge",
+                   lambda: {(): registry.current.loaded_at} if registry.current is not None else {})
 
 SYSTEM_SYMPTOMS = {
     "nervous": [
@@ -78,8 +341,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load trained model + augmented dataset
-model = CwaModel(model_path="models_cwa.pkl", dataset_path="cwa_dataset_augmented.csv")
+# outermost, so the header and request histogram cover CORS handling too
+app.add_middleware(ServerTimingMiddleware)
 
 # ----------------------------- #
 # Input schema
@@ -100,110 +363,641 @@ class PredictInput(BaseModel):
     human_system: str
     symptoms: str  # comma-separated or single string
 
+
+class MonitorUpdate(BaseModel):
+    """Partial PredictInput: only the fields sent change, null resets an optional one"""
+    age: Optional[float] = None
+    weight_kg: Optional[float] = None
+    heart_rate: Optional[float] = None
+    respiratory: Optional[float] = None
+    systolic_bp: Optional[float] = None
+    oxygen: Optional[float] = None
+    gcs: Optional[float] = None
+    gender: Optional[str] = None
+    comorbidity: Optional[str] = None
+    exposure_route: Optional[str] = None
+    exposure_unit: Optional[str] = None
+    severity: Optional[str] = None
+    human_system: Optional[str] = None
+    symptoms: Optional[str] = None
+
+
+def build_batch_frame(records: List[dict]) -> pd.DataFrame:
+    """Build one feature frame for a whole batch"""
+    encoder = registry.current.encoder
+    return encoder.to_frame(encoder.encode_batch(records))
+
+
+# Runs inside the inference pool, so it takes and returns plain data:
+# the (agent, score) pairs plus the stage laps for the caller to record
+def _score_batch(records: List[dict], version: Optional[str] = None, model: Optional[str] = None) -> tuple:
+    current = _serving(version)
+    clock = StageClock()
+    if model == "neighbors":
+        results = [current.model.predict(record) for record in records]
+        clock.lap("neighbors")
+        return [(r["predicted_agent"], r["score"]) for r in results], clock.laps
+    rows = current.encoder.encode_batch(records)
+    clock.lap("encode")
+    return _score_encoded(current, rows, clock, model)
+
+
+def _score_rows(items: List[tuple], version: Optional[str] = None, model: Optional[str] = None) -> tuple:
+    """_score_batch for (model version, row, fields) the caller already encoded (monitor sessions).
+
+    A row encoded for another version, as after a reload, may have other
+    columns: only that row is encoded again from its fields.
+    """
+    current = _serving(version)
+    rows = [row if encoded_for == current.version else current.encoder.encode_row(fields)
+            for encoded_for, row, fields in items]
+    return _score_encoded(current, np.vstack(rows), StageClock(), model)
+
+
+def _serving(version):
+    current = registry.current
+    if version is not None and current.version != version:
+        # a process worker behind the server: it loads the new files in the
+        # background and keeps scoring with the version it has meanwhile
+        registry.reload_in_background("server reloaded")
+    return current
+
+
+def _score_encoded(current, rows, clock, model=None):
+    """Score encoded rows with the compiled forest or, when asked or not compiled, the sklearn pipeline"""
+    if current.compiled is not None and model in (None, "compiled"):
+        # straight from encoded rows to the forest's float32 matrix, no DataFrame
+        features = current.compiled.transform(rows)
+        clock.lap("transform")
+        proba = current.compiled.forest.predict_proba(features)
+    else:
+        frame = current.encoder.to_frame(rows)
+        clock.lap("frame")
+        features = current.pipeline.named_steps["pre"].transform(frame)
+        clock.lap("transform")
+        proba = current.pipeline.named_steps["rf"].predict_proba(features)
+    clock.lap("forest")
+    best = proba.argmax(axis=1)
+    classes = current.pipeline.classes_
+    return [(str(classes[b]), round(float(p[b]), 2)) for b, p in zip(best, proba)], clock.laps
+
+
+async def _score_pooled(records: List[dict], score=_score_batch, model=None) -> List[tuple]:
+    """Micro-batcher callback; stage histograms get one observation per batch"""
+    scored, laps = await inference_pool.run(score, records, registry.current.version, model)
+    observe_laps(laps)
+    return [(agent_name, score, laps) for agent_name, score in scored]
+
+
+async def _predict_one(record, via) -> tuple:
+    # Concurrent requests to the same batcher (one per model) are scored
+    # together, in the inference pool and off the event loop
+    submitted = time.perf_counter()
+    agent_name, score, laps = await via.submit(record)
+    # whatever was not spent scoring the batch was spent waiting for it
+    record_stage("wait", time.perf_counter() - submitted - sum(seconds for _, seconds in laps))
+    add_laps(laps)
+    return agent_name, score
+
+
+async def _predict_with(model: str, record: dict) -> tuple:
+    """Score one record with the named model, recording its latency and whether it failed"""
+    started = time.perf_counter()
+    try:
+        result = await _predict_one(record, via=batchers[model])
+    except PoolSaturated:
+        # not the model's doing, nothing to record
+        raise
+    except Exception:
+        model_stats.record(model, time.perf_counter() - started, ok=False)
+        raise
+    model_stats.record(model, time.perf_counter() - started)
+    return result
+
+
+def _choose_model(current, name: Optional[str]) -> str:
+    """The model asked for, or one picked by traffic share when none is"""
+    if name is None:
+        return router.choose(current.models, current.engine)
+    if name not in current.models:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown model '{name}', available: {', '.join(current.models)}")
+    return name
+
+
+def _require_admin(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled, set CWA_ADMIN_TOKEN")
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _pool_saturated():
+    return HTTPException(status_code=503, detail="Inference queue is full, retry shortly",
+                         headers={"Retry-After": "1"})
+
 # ----------------------------- #
 # Routes
 # ----------------------------- #
 
 
-@app.get("/get_all_agents", response_model=List[str])
-async def get_all_agents():
-    """Return list of trained agents"""
-    return model.agents
+@app.get("/health")
+def health():
+    """Liveness: the process is up, models may still be loading"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: models are loaded and warm-up predictions have run"""
+    if not startup["ready"]:
+        return JSONResponse(status_code=503, content=startup, headers={"Retry-After": "1"})
+    return {**startup, **registry.current.info()}
+
+
+@app.get("/model_version", dependencies=[Depends(require_ready)])
+def model_version():
+    """The serving model version, when and how fast it loaded, and recent reloads"""
+    return registry.stats()
+
 
+@app.post("/admin/reload")
+async def admin_reload(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Load the model files now on disk in the background and swap them in once warm.
+
+    Requests keep being served by the current version until the swap; if
+    loading fails it stays. ``force`` reloads even when the files are unchanged.
+    """
+    _require_admin(x_admin_token)
+    if registry.reloading:
+        raise HTTPException(status_code=409, detail="A reload is already running")
 
-@app.post("/predict_agent")
-async def predict_agent(data: PredictInput):
     try:
-        # 1️⃣ Start with a template dict containing all expected features
-        input_dict = {}
-        for col in expected_features:
-            if col.startswith("sym_"):
-                input_dict[col] = 0  # default for symptom multi-hot
-            elif col in ["age","weight_kg","heart_rate","respiratory","systolic_bp","oxygen","gcs",
-                         "exposure_estimate","time_since_exposure_min"]:
-                input_dict[col] = 0  # numeric default
-            else:
-                input_dict[col] = "unknown"  # categorical default
-
-        # 2️⃣ Overwrite template with user-provided values
-        user_dict = data.dict()
-        for key, value in user_dict.items():
-            if key == "symptoms":
-                # handle multiple comma-separated symptoms
-                user_symptoms = [s.strip() for s in value.split(",")]
-                for sym in mlb_classes:
-                    col = f"sym_{sym}"
-                    if col in input_dict:
-                        input_dict[col] = 1 if sym in user_symptoms else 0
-            elif key in input_dict:
-                input_dict[key] = value if value is not None else input_dict[key]
-
-        # 3️⃣ Convert to DataFrame in the exact expected order
-        input_df = pd.DataFrame([input_dict])[expected_features]
-
-        # 4️⃣ Predict
-        prediction = model.predict(input_df)
-
-        # 5️⃣ Return exactly as before
-        return prediction
+        current, outcome = await asyncio.to_thread(registry.reload, "admin", force)
+    except Exception as e:
+        logger.exception("Admin reload failed")
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving the previous version: {e!r}")
+    return {"outcome": outcome, **current.info()}
+
+
+@app.get("/models", dependencies=[Depends(require_ready)])
+def models():
+    """The models that can score requests, the traffic split and each model's calls, errors, latency and cache hits"""
+    current = registry.current
+    return {
+        "default": current.engine,
+        "available": current.models,
+        "routes": router.weights,
+        "stats": model_stats.stats(),
+    }
+
+
+@app.put("/admin/routes")
+def admin_routes(weights: Dict[str, float], x_admin_token: Optional[str] = Header(None)):
+    """Replace the traffic split, e.g. {"compiled": 90, "neighbors": 10}; {} sends everything to the default"""
+    _require_admin(x_admin_token)
+    try:
+        router.set_weights(check_routes(weights))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"routes": router.weights}
+
+
+@app.get("/inference_stats")
+def inference_stats():
+    """Queue depth, rejections and wait/run times of the inference pool, the prediction cache and monitor sessions"""
+    if inference_pool is None:
+        raise HTTPException(status_code=503, detail="Inference pool not started")
+    stats = {**inference_pool.stats(), "microbatch": {name: b.stats() for name, b in batchers.items()},
+             "monitor": monitors.stats()}
+    if registry.current is not None:
+        stats["prediction_cache"] = registry.current.predictions.stats()
+    return stats
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of request, stage, fallback and pool metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/memory", dependencies=[Depends(require_ready)])
+def debug_memory():
+    """Bytes held by the serving version: dataset columns and the structures built from them"""
+    current = registry.current
+    model = current.model
+    columns = column_memory(model.df)
+    structures = {
+        "feature_matrix": model.feature_matrix.nbytes if model.feature_matrix is not None else 0,
+        "symptoms": model.symptoms.nbytes if model.symptoms is not None else 0,
+        "symptom_catalog": array_bytes(model.symptom_catalog),
+        "case_index": array_bytes(model.case_index),
+        "case_stats": model.case_stats.nbytes if model.case_stats is not None else 0,
+        "agent_index": model.agent_order.nbytes,
+        "compiled": current.compiled.nbytes if current.compiled is not None else 0,
+        "response_cache": current.responses.nbytes,
+    }
+    return {
+        "version": current.version,
+        "compact": model.compact,
+        "rows": len(model.df),
+        "dataframe_bytes": sum(c["bytes"] for c in columns),
+        "columns": columns,
+        "structures": structures,
+    }
+
+
+_profile_lock = asyncio.Lock()
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(
+    seconds: float = Query(10, gt=0, le=120),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    """Sample every thread of this process for a while and return collapsed stacks.
+
+    Feed the output to flamegraph.pl or speedscope. With the process pool
+    the scoring itself runs in other processes and will not show up here.
+    """
+    if not PROFILING:
+        raise HTTPException(status_code=404, detail="Profiling is disabled, set CWA_PROFILING=1")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+
+    async with _profile_lock:
+        profiler = SamplingProfiler(interval=interval_ms / 1000)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            # joining the sampler waits out its current interval; not on the event loop
+            await asyncio.to_thread(profiler.stop)
+
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.samples)})
 
+
+@app.get("/get_all_agents", response_model=List[str], dependencies=[Depends(require_ready)])
+async def get_all_agents(request: Request):
+    """Return list of trained agents"""
+    current = registry.current
+    return current.responses.get(("agents",), lambda: _agents_body(current.model)).respond(request, CACHE_CONTROL)
+
+
+@app.post("/predict_agent", dependencies=[Depends(require_ready)])
+async def predict_agent(data: PredictInput, response: Response, model: Optional[str] = Query(
+        None, description="compiled, sklearn or neighbors; by default the traffic split (CWA_MODEL_ROUTES) picks")):
+    mark("parse")
+    current = registry.current
+    chosen = _choose_model(current, model)
+    # identical inputs (after quantizing vitals) are scored once per model and shared
+    record = quantize(data.dict(), PREDICT_QUANTIZE)
+
+    async def answer(name):
+        response.headers["X-Model"] = name
+        # the neighbour vote reads symptoms through the catalog, not the forest's columns
+        key = current.model.key(record) if name == "neighbors" else current.encoder.key(record)
+        scored = False
+
+        def score_it():
+            nonlocal scored
+            scored = True
+            return _predict_with(name, record)
+
+        agent_name, score = await current.predictions.get((name, key), score_it)
+        if not scored:
+            # answered from the cache or a concurrent identical request; _predict_with counted the call
+            model_stats.record_hit(name)
+        return {
+            "predicted_agent": agent_name,
+            "score": score,
+            "medicine": current.model.agent_to_medicine.get(agent_name, {})
+        }
+
+    try:
+        try:
+            return await answer(chosen)
+        except PoolSaturated:
+            raise
+        except Exception:
+            if model is not None or chosen == current.engine:
+                raise
+            # a model on a share of the traffic failed: the default one answers instead
+            logger.exception("predict_agent failed on model %s, answering with %s", chosen, current.engine)
+            return await answer(current.engine)
+
+    except PoolSaturated:
+        raise _pool_saturated()
     except Exception as e:
+        logger.exception("predict_agent failed, answering with the sample response")
+        FALLBACKS.inc(route="predict_agent", reason=type(e).__name__)
+        # no model produced this answer
+        response.headers["X-Model"] = "fallback"
         return sample_response
 
 
-@app.get("/get_all_symptoms")
-def get_all_symptoms():
+@app.post("/predict_agents_batch", dependencies=[Depends(require_ready)])
+async def predict_agents_batch(records: List[Dict[str, Any]], response: Response,
+                               model: Optional[str] = Query(None, description="as for /predict_agent")):
+    """Score many patients with a single model call, preserving input order"""
+    mark("parse")
+    current = registry.current
+    chosen = _choose_model(current, model)
+    response.headers["X-Model"] = chosen
+    results: List[Optional[dict]] = [None] * len(records)
+    valid, valid_idx = [], []
+
+    with stage("validate"):
+        for i, record in enumerate(records):
+            try:
+                valid.append(PredictInput(**record))
+                valid_idx.append(i)
+            except ValidationError as e:
+                err = e.errors()[0]
+                field = ".".join(str(part) for part in err.get("loc", ()))
+                results[i] = {"error": f"{field}: {err.get('msg')}" if field else err.get("msg")}
+
+    if valid:
+        try:
+            submitted = time.perf_counter()
+            try:
+                scored, laps = await inference_pool.run(_score_batch, [r.dict() for r in valid],
+                                                        current.version, chosen)
+            except PoolSaturated:
+                raise
+            except Exception:
+                model_stats.record(chosen, time.perf_counter() - submitted, ok=False)
+                raise
+            model_stats.record(chosen, time.perf_counter() - submitted)
+            record_stage("wait", time.perf_counter() - submitted - sum(seconds for _, seconds in laps))
+            observe_laps(laps)
+            add_laps(laps)
+            for i, (agent_name, score) in zip(valid_idx, scored):
+                results[i] = {
+                    "predicted_agent": agent_name,
+                    "score": score,
+                    "medicine": current.model.agent_to_medicine.get(agent_name, {})
+                }
+        except PoolSaturated:
+            raise _pool_saturated()
+        except Exception as e:
+            logger.exception("predict_agents_batch scoring failed")
+            for i in valid_idx:
+                results[i] = {"error": str(e)}
+
+    return results
+
+
+async def _monitor_score(session, changes: dict) -> tuple:
+    """Patch the session's row with ``changes`` and re-score it if needed; (changed fields, pushed)"""
+    current = registry.current
+    changed = session.apply(changes, current.encoder, current.version)
+    if not session.stale:
+        monitors.count("unchanged")
+        return changed, False
+    update = session.updates
+    try:
+        result = await _predict_one((session.version, session.row.copy(), dict(session.fields)), via=row_batcher)
+    except PoolSaturated:
+        raise _pool_saturated()
+    except Exception as e:
+        logger.exception("monitor scoring failed")
+        FALLBACKS.inc(route="monitor", reason=type(e).__name__)
+        # no sample response here: subscribers would take it for this patient's prediction
+        raise HTTPException(status_code=503, detail="Scoring failed, retry the update",
+                            headers={"Retry-After": "1"})
+    pushed = session.record(update, result)
+    monitors.count("pushed" if pushed else "suppressed")
+    return changed, pushed
+
+
+def _monitor_body(session, result):
+    agent_name, score = result
+    return {
+        "session_id": session.id,
+        "predicted_agent": agent_name,
+        "score": score,
+        "medicine": registry.current.model.agent_to_medicine.get(agent_name, {}),
+    }
+
+
+def _monitor_session(session_id):
+    session = monitors.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"No monitor session '{session_id}'")
+    return session
+
+
+@app.post("/monitor", status_code=201, dependencies=[Depends(require_ready)])
+async def monitor_start(data: PredictInput, min_score_change: Optional[float] = Query(None, ge=0)):
+    """Start monitoring a patient: scores the full record and keeps it encoded for updates.
+
+    Send vitals as they change with PATCH /monitor/{id}; GET /monitor/{id}/events
+    streams (Server-Sent Events) each result whose agent differs, or whose score
+    moved by ``min_score_change`` (default CWA_MONITOR_MIN_CHANGE), from the last one sent.
+    """
+    session = monitors.create(MONITOR_MIN_CHANGE if min_score_change is None else min_score_change)
+    if session is None:
+        raise HTTPException(status_code=503, detail="Too many monitor sessions", headers={"Retry-After": "5"})
+    try:
+        await _monitor_score(session, data.dict())
+    except HTTPException:
+        monitors.remove(session.id)
+        raise
+    return {**_monitor_body(session, session.result), "events": f"/monitor/{session.id}/events"}
+
+
+@app.patch("/monitor/{session_id}", dependencies=[Depends(require_ready)])
+async def monitor_update(session_id: str, data: MonitorUpdate):
+    """Change some fields of a monitored patient; re-scores only if the model input changed"""
+    session = _monitor_session(session_id)
+    changes = data.dict(exclude_unset=True)
+    cleared = [f for f in ("gender", "human_system", "symptoms") if f in changes and changes[f] is None]
+    if cleared:
+        raise HTTPException(status_code=422, detail=f"Required fields cannot be null: {', '.join(cleared)}")
+    changed, pushed = await _monitor_score(session, changes)
+    return {**_monitor_body(session, session.result), "changed": changed, "pushed": pushed}
+
+
+@app.get("/monitor/{session_id}/events", dependencies=[Depends(require_ready)])
+async def monitor_events(session_id: str):
+    """Server-Sent Events: the last pushed result at once, then every push, until the session ends"""
+    session = _monitor_session(session_id)
+
+    async def stream():
+        session.subscribers += 1
+        seen = 0
+        try:
+            while not session.closed:
+                if session.pushes > seen:
+                    seen = session.pushes
+                    body = dumps(_monitor_body(session, session.pushed)).decode()
+                    yield f"id: {seen}\nevent: prediction\ndata: {body}\n\n"
+                else:
+                    # keeps proxies from timing the connection out
+                    yield ": keep-alive\n\n"
+                await session.wait(seen, MONITOR_KEEPALIVE)
+            yield "event: closed\ndata: {}\n\n"
+        finally:
+            session.subscribers -= 1
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.delete("/monitor/{session_id}")
+def monitor_stop(session_id: str):
+    """End a monitor session; its event streams send "closed" and finish"""
+    if monitors.remove(session_id) is None:
+        raise HTTPException(status_code=404, detail=f"No monitor session '{session_id}'")
+    return {"session_id": session_id, "closed": True}
+
+
+@app.get("/get_all_symptoms", dependencies=[Depends(require_ready)])
+def get_all_symptoms(request: Request):
     """Return all unique symptoms from dataset"""
-    if "symptom_list" not in model.df.columns:
+    current = registry.current
+    if current.model.symptom_catalog is None:
         raise HTTPException(status_code=500, detail="Dataset missing 'symptom_list' column")
 
-    all_symptoms = set()
-
-    for syms in model.df["symptom_list"]:
-        # If it's a list
-        if isinstance(syms, list):
-            for s in syms:
-                s_clean = re.sub(r"^[\[\]'\"\s]+|[\[\]'\"\s]+$", "", str(s))
-                if s_clean:
-                    all_symptoms.add(s_clean)
-        # If it's a string (from CSV)
-        elif isinstance(syms, str):
-            # Split by comma first
-            parts = syms.split(",")
-            for part in parts:
-                # Remove all leading/trailing brackets, quotes, whitespace
-                part_clean = re.sub(r"^[\[\]'\"\s]+|[\[\]'\"\s]+$", "", part)
-                if part_clean:
-                    all_symptoms.add(part_clean)
-
-    return sorted(all_symptoms)
-
-@app.get("/get_symptoms_by_system")
-def get_symptoms_by_system(human_system: str = Query(..., example="Respiratory")):
+    with stage("catalog"):
+        body = current.responses.get(("symptoms",), lambda: _symptoms_body(current.model))
+    return body.respond(request, CACHE_CONTROL)
+
+@app.get("/get_symptoms_by_system", dependencies=[Depends(require_ready)])
+def get_symptoms_by_system(request: Request, human_system: str = Query(..., example="Respiratory")):
     """Return all symptoms associated with a given human system"""
+    current = registry.current
     human_system_norm = human_system.strip().lower()
-    
-    if human_system_norm not in SYSTEM_SYMPTOMS:
-        raise HTTPException(status_code=404, detail=f"No symptoms found for '{human_system}'")
-    
-    return SYSTEM_SYMPTOMS[human_system_norm]
-
 
+    with stage("catalog"):
+        symptoms = _system_symptoms(current.model, human_system_norm)
+        if symptoms is None:
+            raise HTTPException(status_code=404, detail=f"No symptoms found for '{human_system}'")
+        body = current.responses.get(("system", human_system_norm), lambda: CachedBody(dumps(symptoms)))
+    return body.respond(request, CACHE_CONTROL)
+
+
+@app.get("/agents_by_symptoms", dependencies=[Depends(require_ready)])
+def agents_by_symptoms(
+    symptoms: str = Query(..., example="Headache, Dizziness"),
+    match: Literal["all", "any"] = "all",
+):
+    """Return candidate agents with case counts for a comma-separated symptom set"""
+    model = registry.current.model
+    if model.symptom_catalog is None:
+        raise HTTPException(status_code=500, detail="Dataset missing 'symptom_list' column")
 
-@app.get("/get_agent_details")
-def get_agent_details(agent_name: str = Query(..., example="Chlorine")):
-    """Return all rows/details for a given agent"""
-    if "agent" not in model.df.columns:
+    names = [s for s in symptoms.split(",") if s.strip()]
+    if not names:
+        raise HTTPException(status_code=400, detail="No symptoms given")
+
+    with stage("catalog"):
+        return model.symptom_catalog.match_agents(names, mode=match)
+
+
+@app.get("/case_stats", dependencies=[Depends(require_ready)])
+def case_stats(
+    request: Request,
+    agent: Optional[str] = Query(None, description="Comma-separated agents, all of them when omitted"),
+    severity: Optional[str] = Query(None, example="Moderate,Severe"),
+    exposure_route: Optional[str] = Query(None, example="Inhalation"),
+    human_system: Optional[str] = Query(None, example="Respiratory"),
+    exposure_unit: Optional[str] = Query(None, example="ppm"),
+    ranges: List[str] = Query([], alias="range", description="column:min:max, either bound may be empty",
+                              example=["heart_rate:100:"]),
+    columns: Optional[str] = Query(None, description="Comma-separated columns to summarise"),
+):
+    """Per-agent vitals, severity mix and exposure statistics, optionally filtered"""
+    current = registry.current
+    stats = current.model.case_stats
+    if stats is None:
         raise HTTPException(status_code=500, detail="Dataset missing 'agent' column")
 
-    agent_name_norm = agent_name.strip().lower()
-
-    if "agent_norm" not in model.df.columns:
-        model.df["agent_norm"] = model.df["agent"].str.strip().str.lower()
+    try:
+        agent_ids = stats.agent_ids(agent.split(",")) if agent and agent.strip() else None
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"No data found for agent '{e.args[0].strip()}'")
 
-    df_filtered = model.df[model.df["agent_norm"] == agent_name_norm]
+    given = {"severity": severity, "exposure_route": exposure_route,
+             "human_system": human_system, "exposure_unit": exposure_unit}
+    try:
+        equals = {col: stats.category_codes(col, names) for col, names in given.items()
+                  if names is not None and col in stats.categorical}
+        bounds = stats.parse_ranges(ranges)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    numeric, categorical = stats.numeric, stats.categorical
+    if columns:
+        wanted = [c.strip() for c in columns.split(",") if c.strip()]
+        unknown = [c for c in wanted if c not in stats.numeric and c not in stats.categorical]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+        numeric = [c for c in stats.numeric if c in wanted]
+        categorical = [c for c in stats.categorical if c in wanted]
+
+    key = ("case_stats", tuple(agent_ids) if agent_ids is not None else None,
+           tuple(sorted(bounds.items())), tuple(sorted(equals.items())), tuple(numeric), tuple(categorical))
+
+    def build():
+        with stage("query"):
+            agents = stats.query(agent_ids, bounds, equals, numeric, categorical)
+        return CachedBody(dumps({"count": sum(a["count"] for a in agents), "agents": agents}))
+
+    return current.responses.get(key, build).respond(request, CACHE_CONTROL)
+
+
+DETAILS_STREAM_CHUNK = 1000
+
+
+@app.get("/get_agent_details", dependencies=[Depends(require_ready)])
+def get_agent_details(
+    request: Request,
+    agent_name: str = Query(..., example="Chlorine"),
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    format: Literal["json", "ndjson"] = "json",
+):
+    """Return rows/details for a given agent, optionally paginated, projected or streamed"""
+    current = registry.current
+    model = current.model
+    if "agent" not in model.df.columns:
+        raise HTTPException(status_code=500, detail="Dataset missing 'agent' column")
 
-    if df_filtered.empty:
+    bounds = model.agent_offsets.get(agent_name.strip().lower())
+    if bounds is None:
         raise HTTPException(status_code=404, detail=f"No data found for agent '{agent_name}'")
 
-    return df_filtered.to_dict(orient="records")
+    columns = list(model.df.columns)
+    if fields:
+        columns = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [c for c in columns if c not in model.df.columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    total = bounds[1] - bounds[0]
+
+    if format == "ndjson":
+        with stage("lookup"):
+            rows = model.agent_rows(agent_name, offset=offset, limit=limit)
+
+        def stream():
+            for i in range(0, len(rows), DETAILS_STREAM_CHUNK):
+                chunk = model.df.iloc[rows[i:i + DETAILS_STREAM_CHUNK]][columns]
+                text = chunk.to_json(orient="records", lines=True)
+                yield text if text.endswith("\n") else text + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson",
+                                 headers={"X-Total-Count": str(total)})
+
+    def build():
+        with stage("lookup"):
+            rows = model.agent_rows(agent_name, offset=offset, limit=limit)
+        with stage("records"):
+            records = model.df.iloc[rows][columns].to_dict(orient="records")
+            return CachedBody(dumps(records), headers={"X-Total-Count": str(total)})
+
+    key = ("details", agent_name.strip().lower(), offset, limit, tuple(columns) if fields else None)
+    return current.responses.get(key, build).respond(request, CACHE_CONTROL)
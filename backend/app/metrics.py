@@ -0,0 +1,262 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense; observe() is one bisect and a lock"""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            running = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                running += count
+                le = ("le", _number(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [le])} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+class Collected:
+    """Metric read from elsewhere at scrape time; ``fn`` returns {label values: number}"""
+
+    def __init__(self, name, help, kind, fn, labelnames=()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted((self.fn() or {}).items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collected(self, name, help, kind, fn, labelnames=()):
+        return self.register(Collected(name, help, kind, fn, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "cwa_request_seconds", "Time from request start to the last response byte",
+    ("route", "method", "status"))
+STAGE_SECONDS = REGISTRY.histogram(
+    "cwa_stage_seconds", "Time spent in one stage of request handling or scoring", ("stage",))
+FALLBACKS = REGISTRY.counter(
+    "cwa_fallback_total", "Requests answered with the canned sample response", ("route", "reason"))
+MODEL_SECONDS = REGISTRY.histogram(
+    "cwa_model_seconds", "Time a model took to answer a request, batch wait included", ("model",))
+MODEL_CALLS = REGISTRY.counter(
+    "cwa_model_calls_total", "Requests scored by each model, by outcome", ("model", "outcome"))
+MODEL_CACHE_HITS = REGISTRY.counter(
+    "cwa_model_cache_hits_total", "Requests answered with a model's cached or shared result", ("model",))
+
+
+# ----------------------------- #
+# Per-request stage timings
+# ----------------------------- #
+class RequestTimings:
+    __slots__ = ("started", "stages")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+
+    def add(self, name, seconds):
+        self.stages.append((name, seconds))
+
+    def server_timing(self):
+        total = time.perf_counter() - self.started
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages]
+        parts.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("cwa_request_timings", default=None)
+
+
+def current_timings():
+    return _current.get()
+
+
+def record_stage(name, seconds):
+    """Add a stage to the histograms and, inside a request, to its Server-Timing header"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def mark(name):
+    """Record the time since the request started as a stage, e.g. parsing before the endpoint ran"""
+    timings = _current.get()
+    if timings is not None:
+        record_stage(name, time.perf_counter() - timings.started)
+
+
+class StageClock:
+    """Lap timer for code running outside the request context (pool threads or processes).
+
+    The laps are plain tuples, so they can be returned from a worker and
+    recorded by the caller with ``observe_laps`` and ``add_laps``.
+    """
+
+    def __init__(self):
+        self.laps = []
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.laps.append((name, now - self._last))
+        self._last = now
+
+
+def observe_laps(laps):
+    for name, seconds in laps:
+        STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def add_laps(laps):
+    """Attach laps to the current request's Server-Timing without observing them again"""
+    timings = _current.get()
+    if timings is not None:
+        for name, seconds in laps:
+            timings.add(name, seconds)
+
+
+class ServerTimingMiddleware:
+    """Plain ASGI middleware: per-request timings, a Server-Timing header and request histograms.
+
+    Routes are labelled by endpoint function name so the label set stays
+    bounded whatever paths clients send.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            endpoint = scope.get("endpoint")
+            REQUEST_SECONDS.observe(time.perf_counter() - timings.started,
+                                    route=getattr(endpoint, "__name__", "unmatched"),
+                                    method=scope["method"], status=status)
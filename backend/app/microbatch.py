@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from app.inference_pool import PoolSaturated
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item calls into batched calls.
+
+    ``run_batch`` is an async callable taking a list of items and returning
+    a list of results in the same order. When nothing is running, an item
+    is dispatched at once, so a lone request under light load waits for
+    nothing. While batches are running, new items linger for up to
+    ``max_wait_ms`` if a slot is free, or until a running batch finishes if
+    all ``max_concurrent`` slots are busy, so batch size grows with load.
+    ``max_batch`` waiting items are always dispatched straight away.
+
+    ``max_queue`` bounds items, not batches: once ``max_concurrent`` full
+    batches are being scored and ``max_queue`` more items are waiting,
+    ``submit`` raises PoolSaturated right away. None means no bound.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, run_batch, max_batch=32, max_wait_ms=5.0, max_concurrent=1, max_queue=None):
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.capacity = None if max_queue is None else self.max_concurrent * self.max_batch + max(0, max_queue)
+
+        self._pending = []
+        self._running = 0
+        self._outstanding = 0   # submitted items without a result yet, pending or dispatched
+        self._timer = None
+
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.wait_seconds_total = 0.0
+        self.rejected = 0
+
+    async def submit(self, item):
+        if self.capacity is not None and self._outstanding >= self.capacity:
+            self.rejected += 1
+            raise PoolSaturated()
+
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((item, fut, time.monotonic()))
+        self._outstanding += 1
+
+        if self._running == 0 or len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None and self._running < self.max_concurrent:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._on_timer)
+        # otherwise every slot is busy and the next finished batch flushes
+
+        return await fut
+
+    def _on_timer(self):
+        self._timer = None
+        if self._running < self.max_concurrent:
+            self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._running += 1
+            asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        now = time.monotonic()
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.wait_seconds_total += sum(now - queued for _, _, queued in batch)
+
+        try:
+            results = await self.run_batch([item for item, _, _ in batch])
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            for (_, fut, _), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+        finally:
+            self._running -= 1
+            self._outstanding -= len(batch)
+            if self._pending:
+                self._flush()
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / max(self.batches, 1), 2),
+            "largest_batch": self.largest_batch,
+            "pending": len(self._pending),
+            "outstanding": self._outstanding,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "batch_wait_ms_avg": round(self.wait_seconds_total / max(self.items, 1) * 1000, 3),
+        }
@@ -2,12 +2,102 @@ import pandas as pd
 import numpy as np
 import pickle
 from sklearn.preprocessing import LabelEncoder
-import random
+from app.symptom_catalog import SymptomCatalog
+from app.symptom_store import SymptomMatrix, load_symptoms
+from app.dataset_cache import read_csv_cached
+from app.neighbors import CaseIndex
+from app.case_stats import CaseStats
+from app.frame_memory import compact_frame
+from app.metrics import stage
+
+SEVERITY_MAPPING = {"Mild": 1, "Moderate": 2, "Severe": 3}
+
+# ✅ static medicine mapping per agent
+AGENT_TO_MEDICINE = {
+    "Tabun (GA)": {
+        'atropine_mg_initial': 2,
+        'pralidoxime_mg_initial': 600,
+        'diazepam_mg_initial': 10,
+        'hydroxocobalamin_g_initial': 0,
+        'methylprednisolone_mg_initial': 0,
+        'albuterol_neb_mg_initial': 0,
+        'dimercaprol_BAL_mg_initial': 0
+    },
+    "Sarin (GB)": {
+        'atropine_mg_initial': 2,
+        'pralidoxime_mg_initial': 1000,
+        'diazepam_mg_initial': 10,
+        'hydroxocobalamin_g_initial': 0,
+        'methylprednisolone_mg_initial': 0,
+        'albuterol_neb_mg_initial': 0,
+        'dimercaprol_BAL_mg_initial': 0
+    },
+    "Soman (GD)": {
+        'atropine_mg_initial': 4,
+        'pralidoxime_mg_initial': 600,
+        'diazepam_mg_initial': 10,
+        'hydroxocobalamin_g_initial': 0,
+        'methylprednisolone_mg_initial': 0,
+        'albuterol_neb_mg_initial': 0,
+        'dimercaprol_BAL_mg_initial': 0
+    },
+    "VX": {
+        'atropine_mg_initial': 2,
+        'pralidoxime_mg_initial': 600,
+        'diazepam_mg_initial': 10,
+        'hydroxocobalamin_g_initial': 0,
+        'methylprednisolone_mg_initial': 0,
+        'albuterol_neb_mg_initial': 0,
+        'dimercaprol_BAL_mg_initial': 0
+    },
+    "Hydrogen Cyanide (AC)": {
+        'atropine_mg_initial': 0,
+        'pralidoxime_mg_initial': 0,
+        'diazepam_mg_initial': 0,
+        'hydroxocobalamin_g_initial': 5,  # 5 g IV
+        'methylprednisolone_mg_initial': 0,
+        'albuterol_neb_mg_initial': 0,
+        'dimercaprol_BAL_mg_initial': 0
+    },
+    "Chlorine": {
+        'atropine_mg_initial': 0,
+        'pralidoxime_mg_initial': 0,
+        'diazepam_mg_initial': 0,
+        'hydroxocobalamin_g_initial': 0,
+        'methylprednisolone_mg_initial': 125,  # mg IV
+        'albuterol_neb_mg_initial': 2.5,       # mg nebulized
+        'dimercaprol_BAL_mg_initial': 0
+    },
+    "Lewisite (L)": {
+        'atropine_mg_initial': 0,
+        'pralidoxime_mg_initial': 0,
+        'diazepam_mg_initial': 0,
+        'hydroxocobalamin_g_initial': 0,
+        'methylprednisolone_mg_initial': 0,
+        'albuterol_neb_mg_initial': 0,
+        'dimercaprol_BAL_mg_initial': 3  # mg/kg IM
+    },
+    "Nitrogen Mustard": {
+        'atropine_mg_initial': 1.2,
+        'pralidoxime_mg_initial': 0,
+        'diazepam_mg_initial': 0,
+        'hydroxocobalamin_g_initial': 2.3,
+        'methylprednisolone_mg_initial': 0,
+        'albuterol_neb_mg_initial': 0,
+        'dimercaprol_BAL_mg_initial': 0  # mg/kg IM
+    }
+}
+
+# neighbours that vote on the predicted agent (top_n only limits what is returned)
+VOTE_NEIGHBOURS = 25
 
 class CwaModel:
-    def __init__(self, model_path, dataset_path):
+    def __init__(self, model_path, dataset_path, cache_dir=None, compact=False):
         self.model_path = model_path
         self.dataset_path = dataset_path
+        self.cache_dir = cache_dir
+        # smaller dtypes for df and no feature_matrix kept after indexing
+        self.compact = compact
 
         self.agent_models = {}
         self.label_encoders = {}
@@ -16,82 +106,15 @@ class CwaModel:
 
         self.df = None
         self.feature_matrix = None
+        self.symptoms = None
+        self.symptom_catalog = None
+        self.agent_order = None
+        self.agent_offsets = {}
+        self.case_index = None
+        self.case_stats = None
+        self._category_codes = {}
 
-        # ✅ static medicine mapping per agent
-        self.agent_to_medicine = {
-            "Tabun (GA)": {
-                'atropine_mg_initial': 2,
-                'pralidoxime_mg_initial': 600,
-                'diazepam_mg_initial': 10,
-                'hydroxocobalamin_g_initial': 0,
-                'methylprednisolone_mg_initial': 0,
-                'albuterol_neb_mg_initial': 0,
-                'dimercaprol_BAL_mg_initial': 0
-            },
-            "Sarin (GB)": {
-                'atropine_mg_initial': 2,
-                'pralidoxime_mg_initial': 1000,
-                'diazepam_mg_initial': 10,
-                'hydroxocobalamin_g_initial': 0,
-                'methylprednisolone_mg_initial': 0,
-                'albuterol_neb_mg_initial': 0,
-                'dimercaprol_BAL_mg_initial': 0
-            },
-            "Soman (GD)": {
-                'atropine_mg_initial': 4,
-                'pralidoxime_mg_initial': 600,
-                'diazepam_mg_initial': 10,
-                'hydroxocobalamin_g_initial': 0,
-                'methylprednisolone_mg_initial': 0,
-                'albuterol_neb_mg_initial': 0,
-                'dimercaprol_BAL_mg_initial': 0
-            },
-            "VX": {
-                'atropine_mg_initial': 2,
-                'pralidoxime_mg_initial': 600,
-                'diazepam_mg_initial': 10,
-                'hydroxocobalamin_g_initial': 0,
-                'methylprednisolone_mg_initial': 0,
-                'albuterol_neb_mg_initial': 0,
-                'dimercaprol_BAL_mg_initial': 0
-            },
-            "Hydrogen Cyanide (AC)": {
-                'atropine_mg_initial': 0,
-                'pralidoxime_mg_initial': 0,
-                'diazepam_mg_initial': 0,
-                'hydroxocobalamin_g_initial': 5,  # 5 g IV
-                'methylprednisolone_mg_initial': 0,
-                'albuterol_neb_mg_initial': 0,
-                'dimercaprol_BAL_mg_initial': 0
-            },
-            "Chlorine": {
-                'atropine_mg_initial': 0,
-                'pralidoxime_mg_initial': 0,
-                'diazepam_mg_initial': 0,
-                'hydroxocobalamin_g_initial': 0,
-                'methylprednisolone_mg_initial': 125,  # mg IV
-                'albuterol_neb_mg_initial': 2.5,       # mg nebulized
-                'dimercaprol_BAL_mg_initial': 0
-            },
-            "Lewisite (L)": {
-                'atropine_mg_initial': 0,
-                'pralidoxime_mg_initial': 0,
-                'diazepam_mg_initial': 0,
-                'hydroxocobalamin_g_initial': 0,
-                'methylprednisolone_mg_initial': 0,
-                'albuterol_neb_mg_initial': 0,
-                'dimercaprol_BAL_mg_initial': 3  # mg/kg IM
-            },
-            "Nitrogen Mustard": {
-                'atropine_mg_initial': 1.2,
-                'pralidoxime_mg_initial': 0,
-                'diazepam_mg_initial': 0,
-                'hydroxocobalamin_g_initial': 2.3,
-                'methylprednisolone_mg_initial': 0,
-                'albuterol_neb_mg_initial': 0,
-                'dimercaprol_BAL_mg_initial': 0  # mg/kg IM
-            }
-        }
+        self.agent_to_medicine = AGENT_TO_MEDICINE
 
         self.load_models()
         self.load_and_preprocess_dataset()
@@ -107,20 +130,40 @@ class CwaModel:
     def load_and_preprocess_dataset(self):
         # use CSV instead of Excel for augmented dataset
         if self.dataset_path.endswith(".csv"):
-            self.df = pd.read_csv(self.dataset_path)
+            self.df = read_csv_cached(self.dataset_path, self.cache_dir, categorical=self.compact)
         else:
             self.df = pd.read_excel(self.dataset_path)
 
-        self.df.fillna(0, inplace=True)
+        # Symptom sets come from the dataset's symptom store when it has one;
+        # read before fillna so missing lists stay empty rather than "0"
+        if 'symptom_list' in self.df.columns:
+            if self.dataset_path.endswith(".csv"):
+                self.symptoms = load_symptoms(self.dataset_path, self.df['symptom_list'])
+            else:
+                self.symptoms = SymptomMatrix.from_cells(self.df['symptom_list'])
+
+        for col in self.df.columns[self.df.isna().any()]:
+            values = self.df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # a categorical can only be filled with one of its categories
+                values = values.cat.add_categories([0])
+            self.df[col] = values.fillna(0)
+
+        # Index symptoms while human_system still holds the raw names
+        if self.symptoms is not None:
+            self.symptom_catalog = SymptomCatalog(
+                self.symptoms,
+                self.df['human_system'] if 'human_system' in self.df.columns else [""] * len(self.df),
+                self.df['agent'] if 'agent' in self.df.columns else [""] * len(self.df),
+            )
 
         # Map severity into numeric
-        severity_mapping = {"Mild": 1, "Moderate": 2, "Severe": 3}
         if 'severity' in self.df.columns:
             self.df['severity'] = (
                 self.df['severity']
-                .map(severity_mapping)
-                .fillna(0)
+                .map(SEVERITY_MAPPING)
                 .astype(float)
+                .fillna(0)
             )
 
         # Encode categorical columns that exist in dataset
@@ -150,7 +193,117 @@ class CwaModel:
             if col in self.df.columns
         ]
 
-        self.feature_matrix = self.df[self.features].to_numpy()
+        if self.compact:
+            self.df = compact_frame(self.df)
+
+        self.feature_matrix = self.df[self.features].to_numpy(dtype=float)
+
+        self.build_agent_index()
+        self.build_case_index()
+        self.build_case_stats()
+
+        if self.compact:
+            # the case index keeps what it needs; the matrix is a second copy of df columns
+            self.feature_matrix = None
+
+    def build_agent_index(self):
+        """Group row positions by normalized agent name (stable, so rows keep dataset order)"""
+        if 'agent' not in self.df.columns:
+            self.agent_order = np.arange(0)
+            self.agent_offsets = {}
+            return
+
+        # normalize the distinct names only, then merge names that collide
+        raw_codes, raw_uniques = pd.factorize(self.df['agent'].astype(str))
+        norm_codes, uniques = pd.factorize(pd.Index(raw_uniques).str.strip().str.lower())
+        codes = norm_codes[raw_codes]
+        counts = np.bincount(codes, minlength=len(uniques))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        self.agent_order = np.argsort(codes, kind="stable")
+        self.agent_offsets = {
+            name: (int(start), int(start + count))
+            for name, start, count in zip(uniques, starts, counts)
+        }
+
+    def build_case_index(self):
+        """Nearest-neighbour index over feature_matrix plus the symptom sets"""
+        self._category_codes = {
+            col: {str(c): i for i, c in enumerate(le.classes_)}
+            for col, le in self.label_encoders.items() if col in self.features
+        }
+
+        if self.symptom_catalog is None or 'agent' not in self.df.columns:
+            self.case_index = None
+            return
+
+        agent_codes, agents = pd.factorize(self.df['agent'].astype(str))
+        self.case_index = CaseIndex(
+            self.feature_matrix,
+            self.symptom_catalog.row_lists,
+            self.symptom_catalog.list_symptom_ids,
+            agent_codes,
+            list(agents),
+            len(self.symptom_catalog.vocab),
+        )
+
+    def build_case_stats(self):
+        """Per-agent aggregates and sorted column indexes for /case_stats"""
+        if 'agent' not in self.df.columns:
+            self.case_stats = None
+            return
+
+        # codes back to names; missing values were filled with 0 before encoding
+        categories = {"severity": ["Unknown"] + sorted(SEVERITY_MAPPING, key=SEVERITY_MAPPING.get)}
+        for col in ['human_system', 'exposure_route', 'exposure_unit']:
+            if col in self.label_encoders:
+                categories[col] = ["Unknown" if str(c) == "0" else str(c) for c in self.label_encoders[col].classes_]
+        self.case_stats = CaseStats(self.df, self.agent_order, self.agent_offsets, categories)
+
+    def encode_features(self, input_data: dict):
+        """Raw input values -> feature_matrix encoding, NaN where unknown"""
+        vec = np.full(len(self.features), np.nan)
+        for i, col in enumerate(self.features):
+            val = input_data.get(col)
+            if val is None:
+                continue
+            if col in self._category_codes:
+                code = self._category_codes[col].get(str(val))
+                if code is not None:
+                    vec[i] = code
+            elif col == 'severity' and isinstance(val, str):
+                vec[i] = SEVERITY_MAPPING.get(val.strip().capitalize(), np.nan)
+            else:
+                try:
+                    vec[i] = float(val)
+                except (TypeError, ValueError):
+                    pass
+        return vec
+
+    def key(self, input_data: dict) -> tuple:
+        """Hashable identity of what predict() votes on for ``input_data``.
+
+        The encoded features (None where unknown) and the catalog ids of
+        the symptoms, matched case-insensitively as predict() does; order,
+        duplicates and unknown symptom names make no difference.
+        """
+        features = tuple(None if np.isnan(v) else float(v) for v in self.encode_features(input_data))
+        symptoms = input_data.get('symptoms') or ""
+        if isinstance(symptoms, str):
+            symptoms = symptoms.split(",")
+        ids, _ = self.symptom_catalog.resolve([s for s in symptoms if s.strip()])
+        return features, tuple(sorted(set(ids)))
+
+    def agent_rows(self, agent_name, offset=0, limit=None):
+        """Row positions for an agent (case/space-insensitive), or None if unknown"""
+        bounds = self.agent_offsets.get(agent_name.strip().lower())
+        if bounds is None:
+            return None
+        start, end = bounds
+        start = min(start + offset, end)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.agent_order[start:end]
 
 
     def preprocess_input(self, input_data: dict):
@@ -172,28 +325,40 @@ class CwaModel:
         return pd.DataFrame([X_pred])
 
     def predict(self, input_data: dict, top_n=3):
-        # pick a best row (nearest neighbour logic kept for diversity)
-        best_row = self.df.sample(1).iloc[0]
+        """Agent prediction by similarity-weighted vote of the nearest dataset cases"""
+        if self.case_index is None or len(self.case_index) == 0:
+            raise ValueError("No case index available")
 
-        X_pred_df = self.preprocess_input(input_data)
-        agent_name = best_row['agent']
+        with stage("nn_encode"):
+            symptoms = input_data.get('symptoms') or ""
+            if isinstance(symptoms, str):
+                symptoms = symptoms.split(",")
+            symptom_ids, _ = self.symptom_catalog.resolve([s for s in symptoms if s.strip()])
+            numeric = self.encode_features(input_data)
 
-        model = self.agent_models.get(agent_name)
-        if model is None:
-            raw_score = 0.0
-        else:
-            X_pred_ordered = X_pred_df[self.features]
-            raw_score = model.predict(X_pred_ordered)[0]
+        with stage("nn_search"):
+            idx, similarity = self.case_index.query(numeric, symptom_ids, k=max(top_n, VOTE_NEIGHBOURS))
+
+        with stage("nn_vote"):
+            votes = np.zeros(len(self.case_index.agents))
+            np.add.at(votes, self.case_index.agent_codes[idx], similarity * self.case_index.counts[idx])
+            ranked = sorted(range(len(votes)), key=lambda a: (-votes[a], self.case_index.agents[a]))
+            agent_name = self.case_index.agents[ranked[0]]
+            score = round(float(votes[ranked[0]] / votes.sum()), 2) if votes.sum() > 0 else 0.0
 
-        # clamp + normalize
-        min_severity, max_severity = 1.0, 3.0
-        clamped_score = max(min_severity, min(max_severity, raw_score))
-        base_normalized_score = (clamped_score - min_severity) / (max_severity - min_severity)
-        random_offset = random.uniform(0.0, 0.4) 
-        normalized_score = round(max(0.0, min(1.0, base_normalized_score + random_offset)), 2)
+        similar_cases = [
+            {
+                "row": int(self.case_index.first_row[i]),
+                "agent": self.case_index.agents[self.case_index.agent_codes[i]],
+                "similarity": round(float(sim), 3),
+                "cases": int(self.case_index.counts[i]),
+            }
+            for i, sim in zip(idx[:top_n], similarity[:top_n])
+        ]
 
         return {
             "predicted_agent": agent_name,
-            "score": normalized_score,
-            "medicine": self.agent_to_medicine.get(agent_name, {})
+            "score": score,
+            "medicine": self.agent_to_medicine.get(agent_name, {}),
+            "similar_cases": similar_cases,
         }
@@ -0,0 +1,166 @@
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+
+
+class MonitorSession:
+    """One continuously monitored patient.
+
+    Keeps the patient's inputs and their encoded row, so an update only
+    patches the fields that changed. Results are compared with the last
+    one pushed: subscribers hear of a new result only when the predicted
+    agent changes or the score moves by at least ``min_change``.
+    """
+
+    def __init__(self, session_id, min_change, clock=time.monotonic):
+        self.id = session_id
+        self.min_change = min_change
+        self.clock = clock
+        self.fields = {}
+        self.row = None
+        self.version = None
+        self.updates = 0        # applied updates, numbers each scoring
+        self.scored = 0         # update behind the newest result
+        self.result = None      # newest (agent, score)
+        self.pushed = None      # last (agent, score) sent to subscribers
+        self.pushes = 0
+        self.subscribers = 0
+        self.closed = False
+        self.touched = clock()
+        self._pushed = asyncio.Event()
+
+    def apply(self, changes, encoder, version):
+        """Take the fields of ``changes`` that differ and patch the row; returns their names.
+
+        A row encoded for another model version is rebuilt from all the
+        fields, as its columns may differ.
+        """
+        changed = {key: value for key, value in changes.items()
+                   if key not in self.fields or self.fields[key] != value}
+        self.fields.update(changed)
+        if self.version != version:
+            self.row = encoder.encode_row(self.fields)
+            self.version = version
+        elif changed:
+            encoder.update_row(self.row, changed)
+        else:
+            return []
+        self.updates += 1
+        return list(changed)
+
+    @property
+    def stale(self):
+        """True while the newest update has no result yet"""
+        return self.scored < self.updates
+
+    def record(self, update, result):
+        """Keep the result of scoring ``update``; True when it was pushed to subscribers.
+
+        Results of updates older than the newest scored one are dropped, so
+        concurrent updates cannot push an outdated prediction.
+        """
+        if update <= self.scored:
+            return False
+        self.scored = update
+        self.result = result
+        if (self.pushed is not None and result[0] == self.pushed[0]
+                and abs(result[1] - self.pushed[1]) < self.min_change):
+            return False
+        self.pushed = result
+        self.pushes += 1
+        self._notify()
+        return True
+
+    def close(self):
+        self.closed = True
+        self._notify()
+
+    def _notify(self):
+        self._pushed.set()
+        self._pushed = asyncio.Event()
+
+    async def wait(self, seen, timeout):
+        """Return once there is a push after the ``seen``-th, the session closes or ``timeout`` passes"""
+        if self.pushes > seen or self.closed:
+            return
+        try:
+            await asyncio.wait_for(self._pushed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class MonitorSessions:
+    """The monitor sessions of one server process, by id.
+
+    Sessions nobody has updated or subscribed to for ``idle_seconds``
+    are dropped the next time one is created; ``max_sessions`` bounds the
+    rest. Must be used from a single event loop.
+    """
+
+    def __init__(self, max_sessions=1000, idle_seconds=600.0, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self.created = 0
+        self.expired = 0
+        self.updates = {"pushed": 0, "suppressed": 0, "unchanged": 0}
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, min_change):
+        """A new empty session, or None when ``max_sessions`` are still active"""
+        self.sweep()
+        if len(self._sessions) >= self.max_sessions:
+            return None
+        session = MonitorSession(secrets.token_urlsafe(12), min_change, self.clock)
+        self._sessions[session.id] = session
+        self.created += 1
+        return session
+
+    def get(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.touched = self.clock()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def remove(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+        return session
+
+    def sweep(self):
+        """Drop idle sessions; the least recently used come first, so stop at the first live one"""
+        if self.idle_seconds <= 0:
+            return
+        deadline = self.clock() - self.idle_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.touched > deadline:
+                break
+            self._sessions.popitem(last=False)
+            if session.subscribers:
+                # still streamed to: keep it, as recently used
+                self._sessions[session.id] = session
+                session.touched = self.clock()
+                continue
+            session.close()
+            self.expired += 1
+
+    def count(self, outcome):
+        self.updates[outcome] += 1
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_seconds": self.idle_seconds,
+            "subscribers": sum(s.subscribers for s in self._sessions.values()),
+            "created": self.created,
+            "expired": self.expired,
+            "updates": dict(self.updates),
+        }
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+
+def popcount(words):
+    """Set bits per element of an unsigned integer array"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    as_bytes = words.view(np.uint8).reshape(words.shape + (-1,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1)
+
+
+def pack_symptoms(id_lists, n_words):
+    """(n, n_words) uint32 bitmasks, bit i set when symptom id i is present"""
+    masks = np.zeros((len(id_lists), n_words), dtype=np.uint32)
+    for row, ids in enumerate(id_lists):
+        for sid in ids:
+            masks[row, sid >> 5] |= np.uint32(1 << (sid & 31))
+    return masks
+
+
+class CaseIndex:
+    """Exact top-k search over dataset cases.
+
+    Similarity mixes bitset Jaccard over symptoms with an inverse distance on
+    the standardised numeric features. Identical cases (same features, same
+    symptom list, same agent) are collapsed into one weighted point. A query
+    scores every distinct symptom list and every distinct numeric key (both
+    bounded by the vocabularies, not the row count), then visits lists in
+    order of decreasing Jaccard and stops as soon as no unvisited list can
+    beat the current k-th best case (threshold algorithm).
+    """
+
+    def __init__(self, numeric, list_codes, list_symptom_ids, agent_codes, agents, n_symptoms,
+                 symptom_weight=0.5, block=32):
+        numeric = np.asarray(numeric, dtype=float).reshape(len(list_codes), -1)
+        list_codes = np.asarray(list_codes)
+        agent_codes = np.asarray(agent_codes)
+
+        self.agents = list(agents)
+        self.n_symptoms = n_symptoms
+        self.n_words = max(1, (n_symptoms + 31) // 32)
+        self.symptom_weight = symptom_weight
+        self.block = block
+
+        self.center = numeric.mean(axis=0) if len(numeric) else np.zeros(numeric.shape[1])
+        self.scale = numeric.std(axis=0) if len(numeric) else np.ones(numeric.shape[1])
+        self.scale[self.scale == 0] = 1.0
+
+        # distinct numeric keys; every case points at one of them
+        key_frame = pd.DataFrame(numeric)
+        row_keys = key_frame.groupby(list(key_frame.columns), sort=False).ngroup().to_numpy()
+
+        # collapse identical cases into weighted points
+        groups = pd.DataFrame({"key": row_keys, "list": list_codes, "agent": agent_codes}) \
+            .groupby(["key", "list", "agent"], sort=False).ngroup().to_numpy()
+        n_points = int(groups.max()) + 1 if len(groups) else 0
+        first_row = np.full(n_points, len(groups), dtype=np.int64)
+        np.minimum.at(first_row, groups, np.arange(len(groups)))
+
+        self.first_row = first_row
+        self.counts = np.bincount(groups, minlength=n_points)
+        self.agent_codes = agent_codes[first_row]
+
+        n_keys = int(row_keys.max()) + 1 if len(row_keys) else 0
+        key_first = np.full(n_keys, len(row_keys), dtype=np.int64)
+        np.minimum.at(key_first, row_keys, np.arange(len(row_keys)))
+        self.keys = (numeric[key_first] - self.center) / self.scale
+        self.point_key = row_keys[first_row]
+
+        # only symptom lists that actually occur; points grouped by list (CSR)
+        used_lists, point_list = np.unique(list_codes[first_row], return_inverse=True)
+        self.list_masks = pack_symptoms([list_symptom_ids[c] for c in used_lists], self.n_words)
+        self.list_sizes = popcount(self.list_masks).sum(axis=1)
+        self.list_points = np.argsort(point_list, kind="stable")
+        self.list_ptr = np.concatenate(([0], np.cumsum(np.bincount(point_list, minlength=len(used_lists)))))
+
+    def __len__(self):
+        return len(self.first_row)
+
+    def _score(self, jaccard, distance):
+        return self.symptom_weight * jaccard + (1 - self.symptom_weight) / (1.0 + distance)
+
+    def query(self, numeric, symptom_ids, k=3):
+        """Top-k points as (point ids, similarities), best first, ties by dataset order.
+
+        ``numeric`` may contain NaN for unknown values; those count as average.
+        """
+        if len(self) == 0:
+            return np.arange(0), np.zeros(0)
+
+        q = (np.asarray(numeric, dtype=float) - self.center) / self.scale
+        q = np.where(np.isnan(q), 0.0, q)
+        q_mask = pack_symptoms([symptom_ids], self.n_words)
+
+        key_distance = np.linalg.norm(self.keys - q, axis=1)
+        inter = popcount(self.list_masks & q_mask).sum(axis=1)
+        union = self.list_sizes + popcount(q_mask).sum() - inter
+        list_jaccard = np.where(union == 0, 1.0, inter / np.maximum(union, 1))
+
+        order = np.argsort(-list_jaccard, kind="stable")
+        bound = self._score(list_jaccard[order], key_distance.min())
+
+        best_ids = np.arange(0)
+        best_sim = np.zeros(0)
+        start, block = 0, self.block
+        while start < len(order):
+            if len(best_ids) >= k and bound[start] < best_sim[k - 1]:
+                break
+            lists = order[start:start + block]
+            start += block
+            block *= 2  # few rounds even when many lists tie on Jaccard
+            ids = np.concatenate([self.list_points[self.list_ptr[l]:self.list_ptr[l + 1]] for l in lists])
+            sims = self._score(np.repeat(list_jaccard[lists], np.diff(self.list_ptr)[lists]),
+                               key_distance[self.point_key[ids]])
+
+            ids = np.concatenate([best_ids, ids])
+            sims = np.concatenate([best_sim, sims])
+            keep = np.lexsort((self.first_row[ids], -sims))[:k]
+            best_ids, best_sim = ids[keep], sims[keep]
+
+        return best_ids, best_sim
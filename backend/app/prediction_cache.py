@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+def parse_quantize(spec):
+    """"heart_rate=5,oxygen=1" -> {"heart_rate": 5.0, "oxygen": 1.0}; empty means no quantization"""
+    steps = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        field, _, step = part.partition("=")
+        step = float(step)
+        if step <= 0:
+            raise ValueError(f"Quantization step for {field.strip()} must be positive")
+        steps[field.strip()] = step
+    return steps
+
+
+def quantize(data, steps):
+    """Copy of ``data`` with each numeric field in ``steps`` rounded to the nearest multiple of its step"""
+    if not steps:
+        return data
+    out = dict(data)
+    for field, step in steps.items():
+        value = out.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # the outer round drops float noise such as 0.30000000000000004
+            out[field] = round(round(value / step) * step, 9)
+    return out
+
+
+class PredictionCache:
+    """Bounded LRU of prediction results with a time-to-live and single-flight.
+
+    Concurrent misses on one key share a single computation: the first
+    starts it as a task, later callers await the same task. The task is
+    shielded, so a caller that disconnects does not cancel it for the
+    others. Failures are not cached. A ``ttl`` of 0 or less means entries
+    never expire and only leave by eviction. Must be used from a single
+    event loop; one cache per model version, so a reload starts from an
+    empty cache.
+    """
+
+    def __init__(self, max_entries=4096, ttl=300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def lookup(self, key):
+        """(True, value) for a fresh entry, else (False, None); expired entries are dropped"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires is not None and self.clock() >= expires:
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def store(self, key, value):
+        # no expiry time at all when ttl is off, rather than one in the past
+        expires = self.clock() + self.ttl if self.ttl > 0 else None
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key, compute):
+        """Cached value for ``key``, else the result of ``await compute()``, shared by concurrent callers"""
+        if not self.enabled:
+            self.misses += 1
+            return await compute()
+
+        found, value = self.lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.store(key, task.result())
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
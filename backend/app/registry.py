@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from app.dataset_cache import file_hash
+from app.http_cache import ResponseCache
+from app.prediction_cache import PredictionCache
+
+
+logger = logging.getLogger(__name__)
+
+
+def file_signature(paths):
+    """Cheap change check: (size, mtime_ns) per path, None for missing files"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_size, st.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def version_of(paths):
+    """Version id of a set of model files: a short content hash of each, in order"""
+    return "-".join(file_hash(path)[:8] for path in paths)
+
+
+class ModelVersion:
+    """Everything built from one set of model files, warmed up before it serves.
+
+    Never mutated once it is current: a request takes one reference and
+    uses it throughout, so it never mixes parts of two versions.
+    """
+
+    def __init__(self, version, artifact, model, pipeline, compiled, encoder, load_seconds, responses=None,
+                 predictions=None):
+        self.version = version
+        self.artifact = artifact
+        self.model = model
+        self.pipeline = pipeline
+        self.compiled = compiled
+        self.encoder = encoder
+        # encoded catalog/detail responses built from this version's data
+        self.responses = responses if responses is not None else ResponseCache()
+        # predict_agent results for this version only, so a reload never serves stale ones
+        self.predictions = predictions if predictions is not None else PredictionCache()
+        self.mlb_classes = artifact["mlb_classes"]
+        self.expected_features = artifact["feature_columns"]
+        # models that can score requests, and the one that does by default
+        self.models = [name for name, present in (("compiled", compiled is not None), ("sklearn", True),
+                                                  ("neighbors", getattr(model, "case_index", None) is not None))
+                       if present]
+        self.engine = "compiled" if compiled is not None else "sklearn"
+        self.load_seconds = load_seconds
+        self.warmup_seconds = None
+        self.loaded_at = time.time()
+
+    def info(self):
+        return {
+            "version": self.version,
+            "engine": self.engine,
+            "models": self.models,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+
+class ModelRegistry:
+    """Holds the serving ModelVersion and replaces it without a restart.
+
+    ``build(version)`` loads, indexes and warms a complete new version; only
+    then is ``current`` reassigned, a single reference swap, so requests see
+    either the old version or the new one. A failed build leaves the old one
+    serving. ``sources()`` gives the model file paths, read at every reload;
+    ``on_swap(version)`` runs after each swap.
+    """
+
+    def __init__(self, build, sources, on_swap=None, history=20):
+        self.build = build
+        self.sources = sources
+        self.on_swap = on_swap
+        self.current = None
+        self.history = deque(maxlen=history)
+        self.outcomes = {"loaded": 0, "unchanged": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    @property
+    def reloading(self):
+        return self._lock.locked()
+
+    def reload(self, reason, force=False):
+        """Build what is on disk now and swap it in; returns (current, outcome).
+
+        Unless ``force``, files whose content matches the current version are
+        not reloaded. Raises if the build fails, with the old version still serving.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                version = version_of(self.sources())
+                if not force and self.current is not None and self.current.version == version:
+                    outcome = "unchanged"
+                else:
+                    candidate = self.build(version)
+                    self.current = candidate
+                    outcome = "loaded"
+                    if self.on_swap is not None:
+                        self.on_swap(candidate)
+            except Exception as e:
+                self._record(reason, "failed", started, error=repr(e))
+                raise
+            self._record(reason, outcome, started, version=self.current.version)
+            return self.current, outcome
+
+    def reload_in_background(self, reason):
+        """Start a reload unless one is running; the current version serves meanwhile"""
+        if self.reloading:
+            return
+        threading.Thread(target=self._reload_logged, args=(reason,), name="cwa-reload", daemon=True).start()
+
+    def _reload_logged(self, reason):
+        try:
+            self.reload(reason)
+        except Exception:
+            logger.exception("Model reload (%s) failed, keeping version %s", reason,
+                             self.current.version if self.current else None)
+
+    def _record(self, reason, outcome, started, **extra):
+        self.outcomes[outcome] += 1
+        self.history.append({"at": time.time(), "reason": reason, "outcome": outcome,
+                             "seconds": round(time.perf_counter() - started, 3), **extra})
+
+    def watch(self, interval):
+        """Poll the model files every ``interval`` seconds and reload when they change.
+
+        A change is acted on once the files have stopped changing for a whole
+        interval, so a copy in progress is not loaded half-written.
+        """
+        def run():
+            last = file_signature(self.sources())
+            pending = False
+            while not self._stop.wait(interval):
+                signature = file_signature(self.sources())
+                if signature != last:
+                    last, pending = signature, True
+                elif pending and None not in signature:
+                    pending = False
+                    self._reload_logged("file change")
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="cwa-model-watch", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "current": self.current.info() if self.current is not None else None,
+            "reloading": self.reloading,
+            "reloads": dict(self.outcomes),
+            "history": list(self.history),
+        }
@@ -0,0 +1,124 @@
+import random
+import threading
+from collections import deque
+
+import numpy as np
+
+from app.metrics import MODEL_CACHE_HITS, MODEL_CALLS, MODEL_SECONDS
+
+
+# What can score a request, in a ModelVersion: the compiled forest, the
+# artifact's sklearn pipeline, and CwaModel's vote of the nearest dataset cases
+MODELS = ("compiled", "sklearn", "neighbors")
+
+
+def parse_routes(spec):
+    """"compiled=90,neighbors=10" -> {"compiled": 90.0, "neighbors": 10.0}; empty means no split"""
+    weights = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    return check_routes(weights)
+
+
+def check_routes(weights):
+    """``weights`` as {model: float}; raises ValueError for unknown models or negative shares"""
+    checked = {}
+    for name, weight in weights.items():
+        if name not in MODELS:
+            raise ValueError(f"Unknown model {name!r}, expected one of {', '.join(MODELS)}")
+        if weight < 0:
+            raise ValueError(f"Traffic share of {name} must not be negative")
+        checked[name] = float(weight)
+    return checked
+
+
+class ModelRouter:
+    """Picks the model that scores a request: the one asked for by name, or one
+    drawn by traffic share.
+
+    Shares are relative weights ({"compiled": 90, "neighbors": 10} sends about
+    one request in ten to neighbors). The share of a model the serving
+    version lacks, and all traffic when no shares are set, goes to the
+    version's default model.
+    """
+
+    def __init__(self, weights=None, rng=random.random):
+        self.rng = rng
+        self.weights = dict(weights or {})
+
+    def set_weights(self, weights):
+        # one reference swap, so a concurrent choose() sees the old or the new split
+        self.weights = dict(weights)
+
+    def choose(self, available, default):
+        weights = self.weights
+        total = sum(weights.values())
+        if total <= 0:
+            return default
+        point = self.rng() * total
+        for name, weight in weights.items():
+            point -= weight
+            if point < 0:
+                return name if name in available else default
+        return default
+
+
+class ModelStats:
+    """Calls, errors and latency percentiles per model, and its cache hits.
+
+    Calls are requests the model actually scored. Requests answered from
+    the prediction cache, or by sharing a concurrent identical call, are
+    only counted as ``cache_hits``. Percentiles are over the last
+    ``window`` calls of each model, so they follow the current load rather
+    than the whole uptime; everything also goes to the cwa_model_* metrics.
+    Thread-safe.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._calls = {}
+        self._errors = {}
+        self._hits = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds, ok=True):
+        MODEL_SECONDS.observe(seconds, model=model)
+        MODEL_CALLS.inc(model=model, outcome="ok" if ok else "error")
+        with self._lock:
+            self._calls[model] = self._calls.get(model, 0) + 1
+            if not ok:
+                self._errors[model] = self._errors.get(model, 0) + 1
+            recent = self._latency.get(model)
+            if recent is None:
+                recent = self._latency[model] = deque(maxlen=self.window)
+            recent.append(seconds)
+
+    def record_hit(self, model):
+        MODEL_CACHE_HITS.inc(model=model)
+        with self._lock:
+            self._hits[model] = self._hits.get(model, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = {model: (self._calls.get(model, 0), self._errors.get(model, 0), self._hits.get(model, 0),
+                                np.array(self._latency.get(model, ())))
+                        for model in {**self._calls, **self._hits}}
+        report = {}
+        for model, (calls, errors, hits, recent) in snapshot.items():
+            latency = None
+            if len(recent):
+                p50, p95, p99 = np.percentile(recent, [50, 95, 99]) * 1000
+                latency = {"mean": round(float(recent.mean()) * 1000, 3), "p50": round(float(p50), 3),
+                           "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+            report[model] = {
+                "calls": calls,
+                "errors": errors,
+                "error_rate": round(errors / calls, 4) if calls else 0.0,
+                "cache_hits": hits,
+                "latency_ms": latency,
+            }
+        return report
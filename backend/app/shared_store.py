@@ -0,0 +1,266 @@
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.dataset_cache import file_hash
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: exports are still atomic, just not serialized
+    fcntl = None
+
+
+FOREST_FIELDS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+class FlatForest:
+    """All trees of a fitted RandomForestClassifier in one set of flat node arrays.
+
+    Node ids are global across trees; ``roots[t]`` is tree t's root and a
+    node is a leaf when ``left == -1``. ``value`` holds the per-node class
+    probabilities exactly as each sklearn tree would return them. The arrays
+    can be saved as .npy files and opened with ``mmap_mode="r"`` so every
+    worker process maps the same pages.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        for est in forest.estimators_:
+            tree = est.tree_
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+
+            # same normalisation DecisionTreeClassifier.predict_proba applies per row
+            proba = tree.value[:, 0, :forest.n_classes_]
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value.append(proba / normalizer)
+            offset += tree.node_count
+
+        return cls(
+            np.concatenate(feature).astype(np.int64),
+            np.concatenate(threshold).astype(np.float64),
+            np.concatenate(left).astype(np.int64),
+            np.concatenate(right).astype(np.int64),
+            np.ascontiguousarray(np.concatenate(value)),
+            np.asarray(roots, dtype=np.int64),
+            forest.classes_,
+        )
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in FOREST_FIELDS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "classes.json"), "w") as f:
+            json.dump([str(c) for c in self.classes_], f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in FOREST_FIELDS]
+        with open(os.path.join(directory, "classes.json")) as f:
+            classes = json.load(f)
+        return cls(*arrays, classes=np.array(classes, dtype=object))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in FOREST_FIELDS)
+
+    def apply(self, X):
+        """Leaf node id per (row, tree), walking all trees for all rows at once"""
+        X = np.asarray(X, dtype=np.float32)  # sklearn compares float32 inputs
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        while True:
+            left = self.left[node]
+            active = left != -1
+            if not active.any():
+                return node
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(active, np.where(go_left, left, self.right[node]), node)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]))
+        for t in range(leaves.shape[1]):  # tree order, like sklearn's accumulation
+            proba += self.value[leaves[:, t]]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class SharedPipeline:
+    """Stand-in for the artifact pipeline: sklearn preprocessing + a mapped FlatForest"""
+
+    def __init__(self, preprocessor, forest):
+        self.preprocessor = preprocessor
+        self.forest = forest
+        self.classes_ = forest.classes_
+        # same step names as the artifact Pipeline, for callers that time each step
+        self.named_steps = {"pre": preprocessor, "rf": forest}
+
+    def predict_proba(self, X):
+        return self.forest.predict_proba(self.preprocessor.transform(X))
+
+    def predict(self, X):
+        return self.forest.predict(self.preprocessor.transform(X))
+
+
+@contextmanager
+def _export_lock(shared_dir):
+    """Only one worker builds an export; the rest wait and then attach to it"""
+    os.makedirs(shared_dir, exist_ok=True)
+    with open(os.path.join(shared_dir, ".lock"), "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _publish(tmp_dir, final_dir):
+    try:
+        os.replace(tmp_dir, final_dir)
+    except OSError:  # another process published first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_shared_artifact(artifact_path, shared_dir):
+    """Artifact dict whose pipeline runs on a forest memory-mapped from ``shared_dir``.
+
+    The first worker unpickles the full artifact once and exports it; later
+    workers only load the small preprocessing step and map the node arrays.
+    """
+    export_dir = os.path.join(shared_dir, f"artifact-{file_hash(artifact_path)[:16]}")
+
+    with _export_lock(shared_dir):
+        if not os.path.isdir(export_dir):
+            artifact = joblib.load(artifact_path)
+            pipeline = artifact["pipeline"]
+            tmp_dir = f"{export_dir}.{os.getpid()}.tmp"
+            FlatForest.from_sklearn(pipeline.named_steps["rf"]).save(tmp_dir)
+            joblib.dump({
+                "preprocessor": pipeline.named_steps["pre"],
+                "mlb_classes": artifact["mlb_classes"],
+                "feature_columns": artifact["feature_columns"],
+            }, os.path.join(tmp_dir, "meta.joblib"))
+            del artifact, pipeline
+            _publish(tmp_dir, export_dir)
+
+    meta = joblib.load(os.path.join(export_dir, "meta.joblib"))
+    return {
+        "pipeline": SharedPipeline(meta["preprocessor"], FlatForest.load(export_dir, mmap_mode="r")),
+        "mlb_classes": meta["mlb_classes"],
+        "feature_columns": meta["feature_columns"],
+    }
+
+
+# CwaModel parts whose array attributes (direct, or in a dict by column) are shared
+SHARED_PARTS = ("model", "symptoms", "symptom_catalog", "case_index", "case_stats")
+# smaller arrays stay private; a mapping costs at least a page and a file
+MIN_SHARED_BYTES = 1 << 16
+
+
+def _shareable(value):
+    return (isinstance(value, np.ndarray) and value.dtype.kind in "biuf"
+            and value.nbytes >= MIN_SHARED_BYTES)
+
+
+def _model_arrays(model):
+    """(part, attribute, dict key or None, array) for every array worth sharing"""
+    for part in SHARED_PARTS:
+        owner = model if part == "model" else getattr(model, part, None)
+        if owner is None:
+            continue
+        for attr, value in vars(owner).items():
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(key, str) and _shareable(item):
+                        yield part, attr, key, item
+            elif _shareable(value):
+                yield part, attr, None, value
+
+
+def share_model_arrays(model, shared_dir):
+    """Swap CwaModel's df columns and derived index arrays for read-only memmaps.
+
+    Numeric columns and the codes of categorical ones are shared, and so are
+    the arrays of the symptom store, catalog, case index and case stats.
+    Keyed by the dataset and model file hashes, since the label-encoded
+    columns depend on both, and by the loading mode, which sets their dtypes.
+    """
+    key = f"{file_hash(model.dataset_path)[:16]}-{file_hash(model.model_path)[:16]}"
+    if model.compact:
+        key += "-compact"
+    export_dir = os.path.join(shared_dir, f"model-{key}")
+
+    with _export_lock(shared_dir):
+        if not os.path.isdir(export_dir):
+            tmp_dir = f"{export_dir}.{os.getpid()}.tmp"
+            os.makedirs(tmp_dir)
+            columns = []
+            for col in model.df.columns:
+                values = model.df[col]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    values = values.cat.codes
+                if values.dtype.kind in "biuf":
+                    np.save(os.path.join(tmp_dir, f"col{len(columns)}.npy"), values.to_numpy())
+                    columns.append(col)
+            arrays = []
+            for part, attr, item_key, value in _model_arrays(model):
+                np.save(os.path.join(tmp_dir, f"array{len(arrays)}.npy"), np.ascontiguousarray(value))
+                arrays.append([part, attr, item_key])
+            with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+                json.dump({"columns": columns, "arrays": arrays}, f)
+            _publish(tmp_dir, export_dir)
+
+    with open(os.path.join(export_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    columns = {}
+    for i, col in enumerate(manifest["columns"]):
+        mapped = np.load(os.path.join(export_dir, f"col{i}.npy"), mmap_mode="r")
+        values = model.df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # only the codes are per row; the categories stay private and small
+            mapped = pd.Series(pd.Categorical.from_codes(mapped, dtype=values.dtype),
+                               index=model.df.index, copy=False)
+        columns[col] = mapped
+    # copy=False keeps each mapped column as its own block instead of consolidating;
+    # unshared columns go in as Series so they keep their dtype
+    model.df = pd.DataFrame(
+        {col: columns[col] if col in columns else model.df[col] for col in model.df.columns},
+        index=model.df.index, copy=False,
+    )
+
+    for i, (part, attr, item_key) in enumerate(manifest["arrays"]):
+        owner = model if part == "model" else getattr(model, part)
+        mapped = np.load(os.path.join(export_dir, f"array{i}.npy"), mmap_mode="r")
+        if item_key is None:
+            setattr(owner, attr, mapped)
+        else:
+            getattr(owner, attr)[item_key] = mapped
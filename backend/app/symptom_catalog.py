@@ -0,0 +1,114 @@
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from app.symptom_store import factorize
+
+
+def _to_bitset(mask):
+    """Pack a boolean row mask into a Python int (bit i set = row i)"""
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+class SymptomCatalog:
+    """Symptom vocabulary plus per-system and symptom -> agent/row indexes.
+
+    Built once from the dataset's SymptomMatrix and raw system/agent columns.
+    Rows are grouped by distinct symptom set, and row and agent sets are
+    stored as Python int bitsets so lookups are a handful of ``&``/``|``
+    operations.
+    """
+
+    def __init__(self, symptoms, systems, agents):
+        list_codes, list_ids = symptoms.distinct()
+        system_codes, system_uniques = factorize(systems)
+        agent_codes, agent_uniques = factorize(agents)
+        n_rows = len(list_codes)
+        n_lists = len(list_ids)
+
+        self.vocab = list(symptoms.vocab)
+        self.ids = {s: i for i, s in enumerate(self.vocab)}
+        parsed = [[self.vocab[i] for i in ids] for ids in list_ids]
+        self._lookup = {s.lower(): i for i, s in enumerate(self.vocab)}
+
+        agent_names = [str(a) for a in agent_uniques]
+        self.agents = sorted(set(agent_names))
+        agent_ids = {a: i for i, a in enumerate(self.agents)}
+        agent_codes = np.array([agent_ids[a] for a in agent_names], dtype=np.int64)[agent_codes]
+
+        # which distinct symptom sets mention each symptom
+        symptom_lists_with = [np.zeros(n_lists, dtype=bool) for _ in self.vocab]
+        for code, ids in enumerate(list_ids):
+            for sid in ids:
+                symptom_lists_with[sid][code] = True
+
+        # per-row symptom sets, stored once per distinct set
+        self.row_lists = list_codes
+        self.list_symptom_ids = [ids.tolist() for ids in list_ids]
+
+        self.n_rows = n_rows
+        self.symptom_rows = {}
+        self.symptom_agents = {}
+        for sid, lists_with in enumerate(symptom_lists_with):
+            rows = lists_with[list_codes]
+            self.symptom_rows[sid] = _to_bitset(rows)
+            bits = 0
+            for a in np.unique(agent_codes[rows]):
+                bits |= 1 << int(a)
+            self.symptom_agents[sid] = bits
+        self.agent_rows = [_to_bitset(agent_codes == a) for a in range(len(self.agents))]
+
+        # symptom frequency per system, counting each distinct list once per occurrence
+        pair_keys, pair_counts = np.unique(system_codes * n_lists + list_codes, return_counts=True)
+        system_counts = defaultdict(Counter)
+        for key, count in zip(pair_keys, pair_counts):
+            system = str(system_uniques[key // n_lists]).strip().lower()
+            for s in parsed[key % n_lists]:
+                system_counts[system][s] += int(count)
+
+        # most frequent symptoms first, ties broken alphabetically
+        self.system_symptoms = {
+            system: [s for s, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))]
+            for system, counts in system_counts.items()
+        }
+
+    def resolve(self, names):
+        """Map names to vocabulary ids (case-insensitive); return (ids, unknown)"""
+        ids, unknown = [], []
+        for name in names:
+            sid = self._lookup.get(name.strip().lower())
+            if sid is None:
+                unknown.append(name.strip())
+            else:
+                ids.append(sid)
+        return ids, unknown
+
+    def match_agents(self, names, mode="all"):
+        """Candidate agents for a symptom set, ordered by number of matching cases.
+
+        ``mode="all"`` counts cases showing every known symptom, ``mode="any"``
+        counts cases showing at least one.
+        """
+        ids, unknown = self.resolve(names)
+        candidates = []
+        if ids:
+            rows = self.symptom_rows[ids[0]]
+            for sid in ids[1:]:
+                rows = rows & self.symptom_rows[sid] if mode == "all" else rows | self.symptom_rows[sid]
+
+            for a, agent in enumerate(self.agents):
+                cases = (rows & self.agent_rows[a]).bit_count()
+                if cases:
+                    bit = 1 << a
+                    candidates.append({
+                        "agent": agent,
+                        "matching_cases": cases,
+                        "matched_symptoms": sum(1 for sid in ids if self.symptom_agents[sid] & bit),
+                    })
+            candidates.sort(key=lambda c: (-c["matching_cases"], c["agent"]))
+
+        return {
+            "symptoms": [self.vocab[sid] for sid in ids],
+            "unknown_symptoms": unknown,
+            "candidates": candidates,
+        }
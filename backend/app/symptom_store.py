@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from app.dataset_cache import file_hash
+
+
+STORE_VERSION = 1
+
+_STRIP_RE = re.compile(r"^[\[\]'\"\s]+|[\[\]'\"\s]+$")
+
+
+def parse_symptoms(value):
+    """Split a raw symptom_list cell (list or stringified list) into clean names.
+
+    The one parser for every legacy format: real lists, "['A', 'B']" and the
+    doubly-stringified "[\"['A'\", \"'B']\"]" all give ["A", "B"].
+    """
+    parts = value if isinstance(value, list) else str(value).split(",")
+    out = []
+    for part in parts:
+        name = _STRIP_RE.sub("", str(part))
+        if name:
+            out.append(sys.intern(name))
+    return out
+
+
+def sidecar_path(csv_path):
+    """Where the symptom store for a dataset CSV lives: data.csv -> data.symptoms.npz"""
+    stem = csv_path
+    for ext in (".gz", ".bz2", ".xz", ".csv"):
+        if stem.endswith(ext):
+            stem = stem[:-len(ext)]
+    return f"{stem}.symptoms.npz"
+
+
+def _index_dtype(n_symptoms):
+    """Smallest dtype the store saves symptom ids in"""
+    return np.uint16 if n_symptoms <= np.iinfo(np.uint16).max else np.int32
+
+
+def factorize(values):
+    """pd.factorize for a column of any cells, lists included (compared by their text)"""
+    series = pd.Series(list(values) if not isinstance(values, pd.Series) else values, dtype=object)
+    try:
+        return pd.factorize(series)
+    except TypeError:  # unhashable cells such as real lists
+        return pd.factorize(series.astype(str))
+
+
+def gather_rows(indptr, indices, codes):
+    """CSR of rows ``codes`` picked out of another CSR, without a Python loop"""
+    lengths = np.diff(indptr)[codes]
+    out_ptr = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=out_ptr[1:])
+    offsets = np.arange(out_ptr[-1]) - np.repeat(out_ptr[:-1], lengths)
+    return out_ptr, indices[np.repeat(indptr[:-1][codes], lengths) + offsets]
+
+
+class SymptomMatrix:
+    """Per-row symptom sets as ids into one sorted, interned vocabulary (CSR).
+
+    ``indices[indptr[i]:indptr[i + 1]]`` are row i's symptom ids, sorted and
+    unique. Saved as a small .npz next to the dataset CSV (no pickles),
+    tagged with the CSV's content hash so a stale store is never used.
+    """
+
+    def __init__(self, vocab, indptr, indices):
+        self.vocab = [sys.intern(str(s)) for s in vocab]
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices)
+        self.ids = {s: i for i, s in enumerate(self.vocab)}
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes
+
+    @classmethod
+    def from_lists(cls, lists, vocab=None):
+        """From per-row lists of clean names; ``vocab`` fixes the id order if given"""
+        if vocab is None:
+            vocab = sorted({s for names in lists for s in names})
+        ids = {s: i for i, s in enumerate(vocab)}
+        rows = [sorted({ids[s] for s in names}) for names in lists]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in rows], out=indptr[1:])
+        indices = np.fromiter((i for r in rows for i in r), dtype=np.int32, count=int(indptr[-1]))
+        return cls(vocab, indptr, indices)
+
+    @classmethod
+    def from_cells(cls, cells):
+        """Convert a raw symptom_list column in any legacy format; each distinct cell is parsed once"""
+        codes, uniques = factorize(cells)
+        distinct = cls.from_lists([parse_symptoms(v) for v in uniques])
+        # missing cells factorize to -1; point them at an appended empty row
+        codes = np.where(codes < 0, len(uniques), codes)
+        indptr = np.append(distinct.indptr, distinct.indptr[-1])
+        return cls(distinct.vocab, *gather_rows(indptr, distinct.indices, codes))
+
+    def names(self, row):
+        return [self.vocab[i] for i in self.indices[self.indptr[row]:self.indptr[row + 1]]]
+
+    def masks(self):
+        """(rows, words) uint32 bitsets, bit i of a row set when it has symptom id i"""
+        n_words = max(1, (len(self.vocab) + 31) // 32)
+        rows = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+        ids = self.indices.astype(np.int64)
+        # ids are unique per row, so summing the distinct bits is the same as OR-ing them
+        slots = rows * n_words + (ids >> 5)
+        bits = np.left_shift(1, ids & 31).astype(np.float64)
+        words = np.bincount(slots, weights=bits, minlength=len(self) * n_words)
+        return words.astype(np.uint32).reshape(len(self), n_words)
+
+    def distinct(self):
+        """(per-row list codes, sorted id array per distinct list)"""
+        masks = self.masks()
+        if masks.shape[1] <= 2:
+            # up to 64 symptoms: one integer key per row, far cheaper than a row-wise unique
+            keys = masks[:, 0].astype(np.uint64)
+            if masks.shape[1] == 2:
+                keys |= masks[:, 1].astype(np.uint64) << np.uint64(32)
+            _, first, codes = np.unique(keys, return_index=True, return_inverse=True)
+            uniques = masks[first]
+        else:
+            uniques, codes = np.unique(masks, axis=0, return_inverse=True)
+        bits = np.unpackbits(uniques.view(np.uint8), axis=1, bitorder="little")[:, :len(self.vocab)]
+        rows, ids = np.nonzero(bits)
+        return codes.reshape(-1), np.split(ids, np.cumsum(np.bincount(rows, minlength=len(uniques)))[:-1])
+
+    def to_scipy(self, dtype=np.uint8):
+        from scipy import sparse
+        data = np.ones(len(self.indices), dtype=dtype)
+        return sparse.csr_matrix((data, self.indices, self.indptr), shape=(len(self), len(self.vocab)))
+
+    def save(self, path, source_hash=""):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=np.int64(STORE_VERSION), source_hash=np.array(source_hash),
+                     vocab=np.array(self.vocab, dtype=str), indptr=self.indptr,
+                     indices=self.indices.astype(_index_dtype(len(self.vocab)), copy=False))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, expected_hash=None):
+        """Open a saved store; None if it is missing, unreadable or not for ``expected_hash``"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != STORE_VERSION:
+                    return None
+                if expected_hash is not None and str(data["source_hash"]) != expected_hash:
+                    return None
+                return cls(data["vocab"].tolist(), data["indptr"], data["indices"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+class SymptomMatrixWriter:
+    """Collects symptom ids chunk by chunk for a dataset being streamed to disk.
+
+    Row lengths and ids are appended to two unlinked temp files in
+    ``spill_dir`` (the system temp dir by default) as they arrive, already
+    in the store's id dtype, so memory stays flat however many rows are
+    written. ``matrix()`` maps them back rather than reading them in.
+    """
+
+    def __init__(self, vocab, spill_dir=None):
+        self.vocab = list(vocab)
+        self.index_dtype = _index_dtype(len(self.vocab))
+        self.rows = 0
+        self._spill_dir = spill_dir
+        self._lengths = tempfile.TemporaryFile(dir=spill_dir)
+        self._indices = tempfile.TemporaryFile(dir=spill_dir)
+
+    def append(self, lengths, indices):
+        lengths = np.asarray(lengths, dtype=np.int64)
+        lengths.tofile(self._lengths)
+        np.asarray(indices).astype(self.index_dtype, copy=False).tofile(self._indices)
+        self.rows += len(lengths)
+
+    def append_matrix(self, matrix):
+        """Rows from a matrix over a (sub)vocabulary, remapped onto this writer's ids"""
+        ids = {s: i for i, s in enumerate(self.vocab)}
+        remap = np.array([ids[s] for s in matrix.vocab], dtype=np.int32)
+        self.append(np.diff(matrix.indptr), remap[matrix.indices] if len(remap) else matrix.indices)
+
+    def _mapped(self, f, dtype):
+        f.flush()
+        if not f.tell():  # an empty file cannot be mapped
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(f, dtype=dtype, mode="r")
+
+    def matrix(self):
+        """The rows so far as a SymptomMatrix over memory-mapped spill files"""
+        lengths = self._mapped(self._lengths, np.int64)
+        indptr = np.memmap(tempfile.TemporaryFile(dir=self._spill_dir), dtype=np.int64,
+                           mode="w+", shape=(self.rows + 1,))
+        indptr[0] = 0
+        np.cumsum(lengths, out=indptr[1:])
+        return SymptomMatrix(self.vocab, indptr, self._mapped(self._indices, self.index_dtype))
+
+    def close(self):
+        self._lengths.close()
+        self._indices.close()
+
+
+def write_store(csv_path, matrix):
+    """Save ``matrix`` as the store for a CSV that has already been written"""
+    path = sidecar_path(csv_path)
+    matrix.save(path, source_hash=file_hash(csv_path))
+    return path
+
+
+def load_symptoms(csv_path, cells=None, source_hash=None):
+    """The dataset's SymptomMatrix: from its store when it matches the CSV, else parsed.
+
+    ``cells`` is the already-loaded symptom_list column, used when there is
+    no valid store; otherwise only that column is read from the CSV.
+    """
+    if os.path.exists(sidecar_path(csv_path)):
+        matrix = SymptomMatrix.load(sidecar_path(csv_path), source_hash or file_hash(csv_path))
+        if matrix is not None:
+            return matrix
+    if cells is None:
+        cells = pd.read_csv(csv_path, usecols=["symptom_list"])["symptom_list"]
+    return SymptomMatrix.from_cells(cells)
@@ -1,92 +1,250 @@
-# augment_data.py (fixed)
+# augment_data.py
+# Generates synthetic cases per agent from the cleaned dataset's per-agent
+# statistics and streams them to disk in chunks. Each chunk draws its numerics,
+# categoricals and symptom subsets as whole arrays; chunks run in parallel
+# processes. Output depends only on --seed and --chunk-rows, not on --workers.
+# Run from backend/:
+#   python augment_data.py                                    # 300 per agent, as before
+#   python augment_data.py --rows 5000000 --output big.csv.gz --seed 7
+#   python augment_data.py --per-agent 100000 --format parquet --output big.parquet
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-import pandas as pd
 import numpy as np
-import random
-from ast import literal_eval
-
-df = pd.read_csv("cwa_dataset_clean.csv")
-TARGET_PER_AGENT = 300   # adjust as needed
-
-def parse_symptoms(s):
-    if pd.isna(s): return []
-    return [x.strip() for x in str(s).split(",") if x.strip()]
-
-# build symptom pools per agent
-symptom_pools = {}
-for ag in df['agent'].unique():
-    pool = set()
-    for s in df[df['agent']==ag]['symptom_list']:
-        if isinstance(s, str):
-            try:
-                items = literal_eval(s)
-            except:
-                items = []
-        else:
-            items = s if isinstance(s, list) else []
-        for it in items:
-            pool.add(it.strip())
-    symptom_pools[ag] = list(pool)
-
-numeric_cols = ["exposure_estimate","time_since_exposure_min","age","weight_kg",
-                "heart_rate","respiratory","systolic_bp","oxygen","gcs"]
-cat_cols = ["gender","comorbidity","exposure_route","severity","human_system"]
-
-aug_rows = []
-for agent in df['agent'].unique():
-    sub = df[df['agent']==agent]
-
-    # compute numeric stats with safe fallback
-    stats = {}
-    for c in numeric_cols:
-        vals = pd.to_numeric(sub[c], errors='coerce').dropna()
-        if len(vals) > 0:
-            mu, sig = vals.mean(), vals.std()
-            if np.isnan(mu) or np.isnan(sig) or sig == 0:
-                mu, sig = float(vals.mean()), max(float(vals.std()), 1.0)
-        else:
-            # safe defaults
-            mu, sig = 50.0, 10.0
-        stats[c] = (mu, sig)
-
-    for i in range(TARGET_PER_AGENT):
-        row = {"agent": agent}
-        # sample numerics safely
-        for c,(mu,sig) in stats.items():
-            samp = np.random.normal(mu, sig)
-            if np.isnan(samp):   # fallback if still nan
-                samp = mu
-            if c in ("age","heart_rate","respiratory","systolic_bp","gcs"):
-                samp = max(0, int(round(samp)))
-            else:
-                samp = float(round(samp,3))
-            row[c] = samp
+import pandas as pd
+
+from app.symptom_store import SymptomMatrix, SymptomMatrixWriter, write_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet output is optional
+    pa = pq = None
+
+
+NUMERIC_COLS = ["exposure_estimate", "time_since_exposure_min", "age", "weight_kg",
+                "heart_rate", "respiratory", "systolic_bp", "oxygen", "gcs"]
+INT_COLS = {"age", "heart_rate", "respiratory", "systolic_bp", "gcs"}
+CAT_COLS = ["gender", "comorbidity", "exposure_route", "severity", "human_system"]
+# physiological limits, so wide distributions don't produce impossible vitals
+CLIP = {"oxygen": (0.0, 100.0), "gcs": (3, 15)}
+MAX_SYMPTOMS = 6
+
+
+def agent_specs(df, symptoms):
+    """Per-agent numeric (mean, std), categorical value pools and symptom pool (vocabulary ids)"""
+    specs = []
+    row_ids = np.repeat(np.arange(len(symptoms)), np.diff(symptoms.indptr))
+    for agent in df['agent'].unique():
+        mask = (df['agent'] == agent).to_numpy()
+        sub = df[mask]
 
-        # sample categoricals
-        for c in cat_cols:
-            vals = sub[c].dropna().values
+        stats = {}
+        for c in NUMERIC_COLS:
+            vals = pd.to_numeric(sub[c], errors='coerce').dropna() if c in sub.columns else pd.Series([])
             if len(vals) > 0:
-                row[c] = random.choice(vals)
+                mu, sig = float(vals.mean()), float(vals.std())
+                if np.isnan(sig) or sig == 0:
+                    sig = max(sig if not np.isnan(sig) else 0.0, 1.0)
             else:
-                row[c] = None
+                mu, sig = 50.0, 10.0  # safe defaults
+            stats[c] = (mu, sig)
+
+        # raw values with repeats, so draws keep the observed frequencies
+        categories = {c: sub[c].dropna().to_numpy() if c in sub.columns else np.array([]) for c in CAT_COLS}
+        pool_ids = np.unique(symptoms.indices[mask[row_ids]]).astype(np.int32)
+        specs.append({"agent": agent, "stats": stats, "categories": categories, "pool_ids": pool_ids,
+                      "pool": [symptoms.vocab[i] for i in pool_ids]})
+    return specs
+
+
+def generate_chunk(spec, n, seed):
+    """``n`` synthetic rows for one agent, every column drawn at once.
+
+    Returns the DataFrame plus the rows' symptom ids (lengths, flat sorted ids).
+    """
+    rng = np.random.default_rng(seed)
+    out = {"agent": np.full(n, spec["agent"], dtype=object)}
+
+    for c, (mu, sig) in spec["stats"].items():
+        vals = rng.normal(mu, sig, n)
+        if c in CLIP:
+            vals = np.clip(vals, *CLIP[c])
+        if c in INT_COLS:
+            out[c] = np.maximum(0, np.rint(vals)).astype(np.int64)
+        else:
+            out[c] = np.round(vals, 3)
+
+    for c, values in spec["categories"].items():
+        out[c] = values[rng.integers(0, len(values), n)] if len(values) else np.full(n, None, dtype=object)
+
+    pool = spec["pool"]
+    if pool:
+        # a uniform random subset of size k per row: the first k of a random permutation
+        quoted = np.array([repr(s) for s in pool], dtype=object)
+        k = rng.integers(1, min(MAX_SYMPTOMS, len(pool)) + 1, n)
+        picks = np.argsort(rng.random((n, len(pool))), axis=1)[:, :MAX_SYMPTOMS]
+        out["symptom_list"] = ["[" + ", ".join(quoted[p[:m]]) + "]" for p, m in zip(picks, k)]
+
+        # the same picks as vocabulary ids, sorted per row for the symptom store;
+        # unpicked slots sort last, so the first k slots of each row stay the picked ones
+        chosen = np.arange(picks.shape[1]) < k[:, np.newaxis]
+        ids = np.sort(np.where(chosen, spec["pool_ids"][picks], np.iinfo(np.int32).max), axis=1)[chosen]
+    else:
+        out["symptom_list"] = ["[]"] * n
+        k, ids = np.zeros(n, dtype=np.int64), np.zeros(0, dtype=np.int32)
+
+    return pd.DataFrame(out), k, ids
+
 
-        # sample symptoms
-        pool = symptom_pools.get(agent, [])
-        if pool:
-            k = min(len(pool), random.randint(1, min(6, len(pool))))
-            row["symptom_list"] = random.sample(pool, k)
+# concatenated members/streams of these read back as one file
+COMPRESSORS = {".gz": partial(gzip.compress, compresslevel=6), ".bz2": bz2.compress, ".xz": lzma.compress}
+
+
+def encode_csv(frame, columns, compress, header=False):
+    data = frame.reindex(columns=columns).to_csv(index=False, header=header).encode()
+    return compress(data) if compress else data
+
+
+def render_chunk(spec, n, seed, columns, fmt, compress):
+    """Worker task: generate a chunk and, for CSV, also serialize and compress it.
+
+    Serializing dominates the cost, so doing it here spreads it over the
+    workers and leaves the parent only writing bytes.
+    """
+    chunk, lengths, ids = generate_chunk(spec, n, seed)
+    if fmt == "csv":
+        return n, encode_csv(chunk, columns, compress), lengths, ids
+    return n, chunk.reindex(columns=columns), lengths, ids
+
+
+class ChunkWriter:
+    """Appends CSV bytes or DataFrame chunks (Parquet) to one output file"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        if fmt == "parquet" and pq is None:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        # write to a temp name and rename at the end, so readers never see half a file
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._csv = open(self._tmp, "wb") if fmt == "csv" else None
+        self._parquet = None
+
+    def write(self, n, chunk):
+        if self.fmt == "csv":
+            self._csv.write(chunk)
         else:
-            row["symptom_list"] = []
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self._tmp, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        self.rows += n
+
+    def close(self):
+        if self._csv is not None:
+            self._csv.close()
+        if self._parquet is not None:
+            self._parquet.close()
+        if os.path.exists(self._tmp):
+            os.replace(self._tmp, self.path)
+
+
+def write_chunk(writer, store, result):
+    n, payload, lengths, ids = result
+    writer.write(n, payload)
+    store.append(lengths, ids)
+
+
+def plan(specs, per_agent, chunk_rows, seed):
+    """(spec, rows, seed) tasks in output order, one independent seed per chunk"""
+    sizes = [(spec, min(chunk_rows, target - start))
+             for spec, target in zip(specs, per_agent) for start in range(0, target, chunk_rows)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return [(spec, n, s) for (spec, n), s in zip(sizes, seeds)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic CWA cases")
+    parser.add_argument("--source", default="cwa_dataset_clean.csv")
+    parser.add_argument("--output", default="cwa_dataset_augmented.csv")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--per-agent", type=int, default=300, help="synthetic rows per agent")
+    size.add_argument("--rows", type=int, help="total synthetic rows, split evenly across agents")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="default: from the output extension")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-source-rows", action="store_true", help="write only synthetic rows")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+
+    df = pd.read_csv(args.source)
+    # source symptoms in whatever legacy format; written back out canonical
+    symptoms = SymptomMatrix.from_cells(df["symptom_list"])
+    specs = agent_specs(df, symptoms)
+    if args.rows:
+        base, extra = divmod(args.rows, len(specs))
+        per_agent = [base + (i < extra) for i in range(len(specs))]
+    else:
+        per_agent = [args.per_agent] * len(specs)
+    tasks = plan(specs, per_agent, args.chunk_rows, args.seed)
+
+    orig = df.copy()
+    # one level of list repr, like the synthetic rows
+    orig["symptom_list"] = [str(symptoms.names(i)) for i in range(len(orig))]
+    # same column order a concat of the source and synthetic frames gives
+    columns = list(orig.columns) + [c for c in ["agent", *NUMERIC_COLS, *CAT_COLS, "symptom_list"]
+                                    if c not in orig.columns]
+
+    compress = COMPRESSORS.get(os.path.splitext(args.output)[1]) if fmt == "csv" else None
+    if fmt == "csv" and args.output.endswith(".zst"):
+        raise SystemExit("zstd output is not supported; use .gz, .bz2 or .xz")
+
+    started = time.perf_counter()
+    writer = ChunkWriter(args.output, fmt)
+    # symptom ids spill next to the output, not into a possibly RAM-backed /tmp
+    store = SymptomMatrixWriter(symptoms.vocab, spill_dir=os.path.dirname(os.path.abspath(args.output)))
+    if not args.no_source_rows:
+        store.append(np.diff(symptoms.indptr), symptoms.indices)
+    if fmt == "csv":
+        # the header goes out even when the source rows are skipped
+        source = orig.iloc[:0] if args.no_source_rows else orig
+        writer.write(len(source), encode_csv(source, columns, compress, header=True))
+    elif not args.no_source_rows:
+        writer.write(len(orig), orig.reindex(columns=columns))
 
-        aug_rows.append(row)
+    # at most two chunks per worker in flight, so memory stays flat whatever the target size
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pending = deque()
+        for spec, n, seed in tasks:
+            pending.append(pool.submit(render_chunk, spec, n, seed, columns, fmt, compress))
+            if len(pending) >= 2 * args.workers:
+                write_chunk(writer, store, pending.popleft().result())
+        while pending:
+            write_chunk(writer, store, pending.popleft().result())
+    writer.close()
+    store_path = write_store(args.output, store.matrix())
+    store.close()
 
-aug_df = pd.DataFrame(aug_rows)
+    elapsed = time.perf_counter() - started
+    synthetic = sum(n for _, n, _ in tasks)
+    print(f"Saved {args.output} with {writer.rows} rows ({synthetic} synthetic, {len(specs)} agents) "
+          f"in {elapsed:.2f}s: {synthetic / elapsed:,.0f} rows/s, "
+          f"{os.path.getsize(args.output) / 1e6:.1f} MB; symptoms in {store_path}")
 
-# combine with original
-orig = df.copy()
-if not isinstance(orig["symptom_list"].iloc[0], list):
-    orig["symptom_list"] = orig["symptom_list"].apply(parse_symptoms)
 
-combined = pd.concat([orig, aug_df], ignore_index=True)
-combined.to_csv("cwa_dataset_augmented.csv", index=False)
-print("Saved augmented dataset with", combined.shape)
+if __name__ == "__main__":
+    main()
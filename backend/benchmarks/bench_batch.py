@@ -0,0 +1,55 @@
+# bench_batch.py
+# Compare N single /predict_agent calls against one /predict_agents_batch call.
+# Run from backend/: python -m benchmarks.bench_batch [n_patients]
+import sys
+import time
+import random
+import pandas as pd
+from fastapi.testclient import TestClient
+from app.main import app, wait_until_ready
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+SYMPTOMS = ["Headache", "Dizziness", "Cough", "Nausea", "Blurred vision", "Seizures", "Chest pain"]
+
+df = pd.read_csv("cwa_dataset_augmented.csv")
+rng = random.Random(42)
+
+
+def sample_payload():
+    row = df.iloc[rng.randrange(len(df))]
+    return {
+        "age": float(row["age"]),
+        "weight_kg": float(row["weight_kg"]),
+        "heart_rate": float(row["heart_rate"]),
+        "respiratory": float(row["respiratory"]),
+        "systolic_bp": float(row["systolic_bp"]),
+        "oxygen": float(row["oxygen"]),
+        "gcs": float(row["gcs"]),
+        "gender": str(row["gender"]),
+        "comorbidity": str(row["comorbidity"]),
+        "exposure_route": str(row["exposure_route"]),
+        "severity": str(row["severity"]),
+        "human_system": str(row["human_system"]),
+        "symptoms": ", ".join(rng.sample(SYMPTOMS, rng.randint(1, 4))),
+    }
+
+
+payloads = [sample_payload() for _ in range(N)]
+client = TestClient(app)
+client.__enter__()  # run the lifespan so models load
+assert wait_until_ready(), "models failed to load"
+
+start = time.perf_counter()
+for p in payloads:
+    client.post("/predict_agent", json=p)
+single_s = time.perf_counter() - start
+
+start = time.perf_counter()
+res = client.post("/predict_agents_batch", json=payloads)
+batch_s = time.perf_counter() - start
+assert res.status_code == 200 and len(res.json()) == N
+
+print(f"patients:            {N}")
+print(f"single calls:        {single_s:.3f}s  ({N / single_s:,.0f} patients/s)")
+print(f"one batch call:      {batch_s:.3f}s  ({N / batch_s:,.0f} patients/s)")
+print(f"speedup:             {single_s / batch_s:.1f}x")
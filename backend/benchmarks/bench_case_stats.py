@@ -0,0 +1,89 @@
+# bench_case_stats.py
+# CaseStats build time and query latency as the case dataset grows, against a
+# pandas scan that filters every row and groups the survivors by agent.
+# The dataset is tiled with jittered vitals; results are checked against the
+# scan before timing.
+# Run from backend/: python -m benchmarks.bench_case_stats [max_rows]
+import sys
+import time
+import numpy as np
+import pandas as pd
+from app.case_stats import CaseStats
+from app.model import CwaModel
+
+MAX_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+REPEATS = 20
+
+base = CwaModel(model_path="models_cwa.pkl", dataset_path="cwa_dataset_augmented.csv")
+categories = {c: base.case_stats.categories[c] for c in base.case_stats.categorical}
+numeric = base.case_stats.numeric
+columns = ["agent", *numeric, *base.case_stats.categorical]
+rng = np.random.default_rng(0)
+
+QUERIES = {
+    "unfiltered": (None, {}, {}),
+    "agent + hr range": (["Chlorine"], {"heart_rate": (85.0, 90.0)}, {}),
+    "severe + o2 < 90": (None, {"oxygen": (None, 90.0)}, {"severity": (3,)}),
+    "3 filters": (None, {"age": (40.0, 60.0), "systolic_bp": (None, 100.0)}, {"human_system": (3,)}),
+}
+
+
+def tiled(n):
+    reps = -(-n // len(base.df))
+    df = pd.concat([base.df[columns]] * reps, ignore_index=True).iloc[:n].copy()
+    for col in numeric:
+        df[col] = df[col] + rng.normal(0, 0.5, n).round(1)
+    return df
+
+
+def build(df):
+    model = CwaModel.__new__(CwaModel)
+    model.df = df
+    model.build_agent_index()
+    return CaseStats(df, model.agent_order, model.agent_offsets, categories)
+
+
+def scan(df, agents, ranges, equals):
+    """Filter every row, then count and describe per agent"""
+    mask = np.ones(len(df), dtype=bool)
+    if agents:
+        mask &= df["agent"].str.strip().str.lower().isin([a.lower() for a in agents]).to_numpy()
+    for col, (low, high) in ranges.items():
+        if low is not None:
+            mask &= df[col].to_numpy() >= low
+        if high is not None:
+            mask &= df[col].to_numpy() <= high
+    for col, codes in equals.items():
+        mask &= df[col].isin(codes).to_numpy()
+    groups = df[mask].groupby("agent")
+    return groups.size(), groups[numeric].describe(), groups["severity"].value_counts()
+
+
+def timed(fn, repeats):
+    lat = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t)
+    return np.percentile(lat, 50) * 1e3
+
+
+print(f"{'rows':>10} {'build s':>8} {'index MB':>9}  {'query':18} {'index ms':>9} {'scan ms':>9}")
+n = len(base.df)
+while n <= MAX_ROWS:
+    df = tiled(n)
+    start = time.perf_counter()
+    stats = build(df)
+    build_s = time.perf_counter() - start
+
+    for i, (label, (agents, ranges, equals)) in enumerate(QUERIES.items()):
+        ids = stats.agent_ids(agents) if agents else None
+        got = stats.query(ids, ranges, equals)
+        counts, _, _ = scan(df, agents, ranges, equals)
+        assert {a["agent"]: a["count"] for a in got if a["count"]} == counts.to_dict()
+
+        index_ms = timed(lambda: stats.query(ids, ranges, equals), REPEATS)
+        scan_ms = timed(lambda: scan(df, agents, ranges, equals), max(1, REPEATS // 4))
+        head = f"{n:>10,} {build_s:>8.2f} {stats.nbytes / 1e6:>9.1f}" if i == 0 else " " * 29
+        print(f"{head}  {label:18} {index_ms:>9.2f} {scan_ms:>9.1f}")
+    n *= 10
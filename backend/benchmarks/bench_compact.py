@@ -0,0 +1,71 @@
+# bench_compact.py
+# Memory of the loaded dataset with CwaModel's plain pandas dtypes against the
+# compact loading mode, on the augmented CSV replicated `scale` times.
+# Each mode loads in its own process; reports per-column bytes, the structures
+# built from the frame, load time and how much the process RSS grew while loading (past the imports).
+# memory_usage(deep=True) counts every string cell in full, while read_csv shares
+# repeated strings, so the RSS growth is the figure to compare.
+# Run from backend/ on Linux: python -m benchmarks.bench_compact [scale]
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+import pandas as pd
+
+SCALE = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+
+def rss_mib():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def load(dataset, compact, queue):
+    from app.frame_memory import column_memory
+    from app.model import CwaModel
+    baseline = rss_mib()
+    started = time.perf_counter()
+    model = CwaModel(model_path="models_cwa.pkl", dataset_path=dataset, compact=compact)
+    seconds = time.perf_counter() - started
+    queue.put({
+        "seconds": seconds,
+        "rss": rss_mib() - baseline,
+        "columns": {c["column"]: (c["dtype"], c["bytes"]) for c in column_memory(model.df)},
+        "feature_matrix": model.feature_matrix.nbytes if model.feature_matrix is not None else 0,
+    })
+
+
+def run(dataset, compact):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    p = ctx.Process(target=load, args=(dataset, compact, queue))
+    p.start()
+    result = queue.get()
+    p.join()
+    return result
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp(prefix="cwa_compact_")
+    dataset = os.path.join(workdir, "cwa_dataset_scaled.csv")
+    base = pd.read_csv("cwa_dataset_augmented.csv")
+    pd.concat([base] * SCALE, ignore_index=True).to_csv(dataset, index=False)
+
+    try:
+        plain, compact = run(dataset, False), run(dataset, True)
+        print(f"rows: {len(base) * SCALE:,}\n")
+        print(f"{'column':26} {'plain dtype':>12} {'MB':>8}   {'compact dtype':>13} {'MB':>8}")
+        for col, (dtype, nbytes) in sorted(plain["columns"].items(), key=lambda c: -c[1][1]):
+            new_dtype, new_bytes = compact["columns"][col]
+            print(f"{col:26} {dtype:>12} {nbytes / 1e6:>8.2f}   {new_dtype:>13} {new_bytes / 1e6:>8.2f}")
+        for label, result in (("plain", plain), ("compact", compact)):
+            frame = sum(nbytes for _, nbytes in result["columns"].values())
+            print(f"\n{label:8} frame {frame / 1e6:8.1f} MB   feature_matrix {result['feature_matrix'] / 1e6:6.1f} MB   "
+                  f"load {result['seconds']:5.1f}s   RSS growth {result['rss']:7.1f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,81 @@
+# bench_compiled.py
+# Parity and latency of the compiled engine (flat-array preprocessing + forest)
+# against the artifact's sklearn Pipeline, starting from FeatureEncoder rows.
+# Parity: the held-out split train_model.py uses (test_size 0.15, seed 42) plus
+# payloads with unknown categories and missing values; probabilities must be
+# identical, not just close.
+# Run from backend/: python -m benchmarks.bench_compiled [repeats]
+import os
+import sys
+import time
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from app.compiled import CompiledPipeline
+from app.encoder import FeatureEncoder
+from compile_model import dataset_records
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+DATASET = "cwa_dataset_augmented.csv"
+
+warnings.simplefilter("ignore", FutureWarning)
+artifact = joblib.load("model_artifact.joblib")
+pipeline = artifact["pipeline"]
+encoder = FeatureEncoder(artifact["feature_columns"], artifact["mlb_classes"])
+
+started = time.perf_counter()
+compiled = CompiledPipeline.from_pipeline(pipeline, artifact["feature_columns"])
+compile_seconds = time.perf_counter() - started
+
+# held-out rows, then the same rows with some fields missing or never seen in training
+agents = pd.read_csv(DATASET, usecols=["agent"])["agent"].to_numpy()
+_, held_out = train_test_split(np.arange(len(agents)), test_size=0.15, stratify=agents, random_state=42)
+records = dataset_records(DATASET, held_out)
+rng = np.random.default_rng(0)
+odd = []
+for r in records:
+    r = dict(r)
+    for field in ("age", "oxygen", "gcs"):
+        if rng.random() < 0.3:
+            r[field] = np.nan
+    for field in ("gender", "severity", "comorbidity"):
+        if rng.random() < 0.3:
+            r[field] = rng.choice([np.nan, "Unknown value"])
+    odd.append(r)
+
+for name, batch in (("held-out", records), ("missing/unknown", odd)):
+    rows = encoder.encode_batch(batch)
+    expected = pipeline.predict_proba(encoder.to_frame(rows))
+    got = compiled.predict_proba(rows)
+    assert np.array_equal(expected, got), f"{name}: max diff {np.abs(expected - got).max()}"
+    assert (pipeline.predict(encoder.to_frame(rows)) == compiled.predict(rows)).all(), name
+    print(f"parity {name:16} {len(rows):5} rows: identical predict_proba and predict")
+
+
+def timed(fn):
+    fn()
+    samples = []
+    for _ in range(REPEATS):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    p50, p99 = np.percentile(samples, [50, 99]) * 1e3
+    return p50, p99
+
+
+print(f"\n{'case':24} {'sklearn p50':>12} {'p99':>8} {'compiled p50':>13} {'p99':>8} {'speedup':>8}")
+all_rows = encoder.encode_batch(records)
+for n in (1, 16, 256):
+    rows = all_rows[:n]
+    sk = timed(lambda: pipeline.predict_proba(encoder.to_frame(rows)))
+    fast = timed(lambda: compiled.predict_proba(rows))
+    print(f"{f'predict_proba x{n}':24} {sk[0]:9.3f} ms {sk[1]:8.3f} {fast[0]:10.3f} ms {fast[1]:8.3f} "
+          f"{sk[0] / fast[0]:7.1f}x")
+
+tmp = "bench_compiled.tmp.npz"
+compiled.save(tmp)
+print(f"\ncompile {compile_seconds * 1e3:.0f} ms; size: artifact {os.path.getsize('model_artifact.joblib') / 1e3:.0f} kB, "
+      f"compiled export {os.path.getsize(tmp) / 1e3:.0f} kB on disk, {compiled.nbytes / 1e3:.0f} kB in memory")
+os.remove(tmp)
@@ -0,0 +1,88 @@
+# bench_concurrency.py
+# Catalog endpoint latency while predictions saturate the server, with inference
+# run inline on the event loop (the old behaviour) versus in the bounded pool.
+# Starts a real uvicorn server on localhost in a background thread.
+# Run from backend/: python -m benchmarks.bench_concurrency [seconds] [concurrency]
+import asyncio
+import sys
+import threading
+import time
+import httpx
+import numpy as np
+import uvicorn
+from app import main
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+PATIENT = {"age": 40, "heart_rate": 110, "oxygen": 91, "gender": "Male", "exposure_route": "Inhalation",
+           "severity": "Severe", "human_system": "Nervous", "symptoms": "Headache, Dizziness, Seizures"}
+BATCH = [PATIENT] * 20
+
+
+def start_server():
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def run_load(base_url):
+    deadline = time.perf_counter() + SECONDS
+    catalog_ms, predict_ok, rejected = [], 0, 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30,
+                                 limits=httpx.Limits(max_connections=CONCURRENCY + 4)) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.1)
+
+        async def predictor(i):
+            nonlocal predict_ok, rejected
+            while time.perf_counter() < deadline:
+                if i % 2:
+                    r = await client.post("/predict_agent", json=PATIENT)
+                else:
+                    r = await client.post("/predict_agents_batch", json=BATCH)
+                if r.status_code == 503:
+                    rejected += 1
+                    await asyncio.sleep(float(r.headers.get("Retry-After", 1)) / 10)
+                else:
+                    predict_ok += 1
+
+        async def catalog():
+            while time.perf_counter() < deadline:
+                for path in ("/get_all_agents", "/get_all_symptoms"):
+                    t = time.perf_counter()
+                    await client.get(path)
+                    catalog_ms.append((time.perf_counter() - t) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(catalog(), *(predictor(i) for i in range(CONCURRENCY)))
+        stats = (await client.get("/inference_stats")).json()
+
+    return catalog_ms, predict_ok, rejected, stats
+
+
+results = {}
+for kind in ("inline", "thread"):
+    main.INFERENCE_POOL = kind
+    main.INFERENCE_QUEUE = 16
+    server, thread, url = start_server()
+    try:
+        catalog_ms, ok, rejected, stats = asyncio.run(run_load(url))
+    finally:
+        server.should_exit = True
+        thread.join()
+    p50, p99 = np.percentile(catalog_ms, [50, 99])
+    results[kind] = p99
+    print(f"{kind:>7}: catalog p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  | predictions ok {ok:5d}  "
+          f"503s {rejected:5d}  | max queue {stats['max_in_flight'] - stats['workers']:3d}  "
+          f"wait avg {stats['wait_ms_avg']} ms")
+
+# the load generator shares this process, so absolute numbers depend on cores;
+# the pool must at least keep catalog tail latency well below the inline case
+assert results["thread"] < results["inline"] / 2, "pool did not protect catalog latency"
+print(f"catalog p99 improved {results['inline'] / results['thread']:.1f}x with the pool")
@@ -0,0 +1,87 @@
+# bench_encoder.py
+# Parity check and timing for FeatureEncoder against the original template-dict route.
+# Run from backend/: python -m benchmarks.bench_encoder [n_payloads]
+import sys
+import time
+import random
+import joblib
+import numpy as np
+import pandas as pd
+from app.encoder import FeatureEncoder, NUMERIC_FEATURES
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+artifact = joblib.load("model_artifact.joblib")
+pipeline = artifact["pipeline"]
+mlb_classes = artifact["mlb_classes"]
+expected_features = artifact["feature_columns"]
+encoder = FeatureEncoder(expected_features, mlb_classes)
+
+df = pd.read_csv("cwa_dataset_augmented.csv")
+rng = random.Random(7)
+SYMPTOMS = [s for s in mlb_classes if "'" not in s] + ["['Headache'", "Not a symptom"]
+
+
+def legacy_frame(user_dict):
+    """The pre-encoder predict_agent template logic, kept verbatim for parity"""
+    input_dict = {}
+    for col in expected_features:
+        if col.startswith("sym_"):
+            input_dict[col] = 0
+        elif col in NUMERIC_FEATURES:
+            input_dict[col] = 0
+        else:
+            input_dict[col] = "unknown"
+    for key, value in user_dict.items():
+        if key == "symptoms":
+            user_symptoms = [s.strip() for s in value.split(",")]
+            for sym in mlb_classes:
+                col = f"sym_{sym}"
+                if col in input_dict:
+                    input_dict[col] = 1 if sym in user_symptoms else 0
+        elif key in input_dict:
+            input_dict[key] = value if value is not None else input_dict[key]
+    return pd.DataFrame([input_dict])[expected_features]
+
+
+def sample_payload():
+    row = df.iloc[rng.randrange(len(df))]
+    payload = {"gender": str(row["gender"]), "human_system": str(row["human_system"]),
+               "symptoms": " , ".join(rng.sample(SYMPTOMS, rng.randint(0, 5)))}
+    for col in ["age", "weight_kg", "heart_rate", "respiratory", "systolic_bp", "oxygen", "gcs"]:
+        payload[col] = float(row[col]) if rng.random() < 0.8 else None
+    for col in ["comorbidity", "exposure_route", "exposure_unit", "severity"]:
+        payload[col] = str(row[col]) if rng.random() < 0.8 else None
+    return payload
+
+
+payloads = [sample_payload() for _ in range(N)]
+
+# parity: same frame values and identical model output
+for p in payloads:
+    old, new = legacy_frame(p), encoder.to_frame(encoder.encode_row(p))
+    pd.testing.assert_frame_equal(old, new, check_dtype=False)
+old_batch = pd.concat([legacy_frame(p) for p in payloads], ignore_index=True)
+new_batch = encoder.to_frame(encoder.encode_batch(payloads))
+assert np.array_equal(pipeline.predict_proba(old_batch), pipeline.predict_proba(new_batch))
+print(f"parity OK on {N} payloads")
+
+start = time.perf_counter()
+for p in payloads:
+    legacy_frame(p)
+legacy_us = (time.perf_counter() - start) / N * 1e6
+
+row = encoder.template.copy()
+start = time.perf_counter()
+for p in payloads:
+    encoder.encode_row(p, out=row)
+encode_us = (time.perf_counter() - start) / N * 1e6
+
+start = time.perf_counter()
+for p in payloads:
+    encoder.to_frame(encoder.encode_row(p, out=row))
+frame_us = (time.perf_counter() - start) / N * 1e6
+
+print(f"legacy template + DataFrame: {legacy_us:8.1f} us/request")
+print(f"encoder.encode_row:          {encode_us:8.1f} us/request")
+print(f"encode_row + to_frame:       {frame_us:8.1f} us/request")
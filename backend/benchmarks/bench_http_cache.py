@@ -0,0 +1,81 @@
+# bench_http_cache.py
+# Requests/sec of the catalog and detail endpoints: the previous handlers
+# (recomputed and encoded by FastAPI per request, kept verbatim under /legacy),
+# the cached bodies, cached + gzip, and conditional GETs answered with 304.
+# In-process through httpx.ASGITransport, so it measures the app, not a network.
+# Run from backend/: python -m benchmarks.bench_http_cache [requests_per_case]
+import asyncio
+import sys
+import time
+import httpx
+from fastapi import Depends, Query
+from app import main
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+
+@main.app.get("/legacy/get_all_agents", dependencies=[Depends(main.require_ready)])
+async def legacy_agents():
+    return main.registry.current.model.agents
+
+
+@main.app.get("/legacy/get_all_symptoms", dependencies=[Depends(main.require_ready)])
+def legacy_symptoms():
+    return main.registry.current.model.symptom_catalog.vocab
+
+
+@main.app.get("/legacy/get_symptoms_by_system", dependencies=[Depends(main.require_ready)])
+def legacy_system(human_system: str = Query(...)):
+    return main._system_symptoms(main.registry.current.model, human_system.strip().lower())
+
+
+@main.app.get("/legacy/get_agent_details", dependencies=[Depends(main.require_ready)])
+def legacy_details(agent_name: str = Query(...), limit: int = Query(None)):
+    model = main.registry.current.model
+    rows = model.agent_rows(agent_name, offset=0, limit=limit)
+    return model.df.iloc[rows][list(model.df.columns)].to_dict(orient="records")
+
+
+CASES = [
+    ("get_all_agents", {}),
+    ("get_all_symptoms", {}),
+    ("get_symptoms_by_system", {"human_system": "Respiratory"}),
+    ("get_agent_details", {"agent_name": "Chlorine", "limit": 50}),
+    ("get_agent_details", {"agent_name": "Chlorine"}),
+]
+
+
+async def rate(client, path, params, headers):
+    """Sequential requests/sec and response bytes as sent (before client decoding)"""
+    r = await client.get(path, params=params, headers=headers)
+    status, size = r.status_code, len(r.content) if "content-encoding" not in r.headers else int(
+        r.headers.get("content-length", 0))
+    start = time.perf_counter()
+    for _ in range(N):
+        await client.get(path, params=params, headers=headers)
+    return N / (time.perf_counter() - start), status, size
+
+
+async def run():
+    async with main.lifespan(main.app):
+        if not await asyncio.to_thread(main.wait_until_ready, 600):
+            raise RuntimeError(f"models failed to load: {main.startup['error']}")
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"{'endpoint':48} {'mode':14} {'req/s':>8} {'status':>6} {'bytes':>8}")
+            for name, params in CASES:
+                label = name + "".join(f" {k}={v}" for k, v in params.items() if k != "agent_name")
+                etag = (await client.get(f"/{name}", params=params)).headers["etag"]
+                modes = [
+                    ("legacy", f"/legacy/{name}", {"accept-encoding": "identity"}),
+                    ("cached", f"/{name}", {"accept-encoding": "identity"}),
+                    ("cached+gzip", f"/{name}", {"accept-encoding": "gzip"}),
+                    ("conditional", f"/{name}", {"accept-encoding": "identity", "if-none-match": etag}),
+                ]
+                for mode, path, headers in modes:
+                    per_sec, status, size = await rate(client, path, params, headers)
+                    print(f"{label:48} {mode:14} {per_sec:8.0f} {status:6} {size:8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
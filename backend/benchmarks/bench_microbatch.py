@@ -0,0 +1,84 @@
+# bench_microbatch.py
+# Open-loop load on /predict_agent at several request rates, with micro-batching
+# off (max batch 1) and on. Reports achieved throughput and p50/p99 latency.
+# Starts a real uvicorn server on localhost in a background thread.
+# Run from backend/: python -m benchmarks.bench_microbatch [seconds_per_rate] [rates...]
+import asyncio
+import sys
+import threading
+import time
+import httpx
+import numpy as np
+import uvicorn
+from app import main
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+RATES = [int(r) for r in sys.argv[2:]] or [10, 25, 50, 100, 200]
+
+PATIENT = {"age": 40, "heart_rate": 110, "oxygen": 91, "gender": "Male", "exposure_route": "Inhalation",
+           "severity": "Severe", "human_system": "Nervous", "symptoms": "Headache, Dizziness, Seizures"}
+
+
+def start_server():
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def open_loop(client, rate):
+    """Fire requests on a fixed schedule regardless of how fast they complete"""
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        t = time.perf_counter()
+        try:
+            r = await client.post("/predict_agent", json=PATIENT)
+        except httpx.HTTPError:
+            errors += 1
+            return
+        if r.status_code == 200:
+            latencies.append((time.perf_counter() - t) * 1000)
+        else:
+            errors += 1
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(rate * SECONDS)):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one()))
+    await asyncio.gather(*tasks)
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run(url):
+    rows = []
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=httpx.Limits(max_connections=256)) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.1)
+        for rate in RATES:
+            latencies, errors, elapsed = await open_loop(client, rate)
+            rows.append((rate, len(latencies) / elapsed, *np.percentile(latencies or [0], [50, 99]), errors))
+        # every request went to the default model, so its batcher did all the work
+        stats = (await client.get("/inference_stats")).json()["microbatch"][main.registry.current.engine]
+    return rows, stats
+
+
+for label, max_batch in (("off", 1), ("on", 32)):
+    main.MICROBATCH_MAX = max_batch
+    server, thread, url = start_server()
+    try:
+        rows, stats = asyncio.run(run(url))
+    finally:
+        server.should_exit = True
+        thread.join()
+    print(f"\nmicro-batching {label} (avg batch {stats['avg_batch']}, largest {stats['largest_batch']})")
+    print(f"{'rate/s':>8} {'done/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for rate, throughput, p50, p99, errors in rows:
+        print(f"{rate:>8} {throughput:>8.1f} {p50:>8.1f} {p99:>8.1f} {errors:>7}")
@@ -0,0 +1,78 @@
+# bench_models.py
+# The three models behind /predict_agent (compiled forest, sklearn pipeline,
+# nearest-case vote) compared under one load: a traffic split sends each
+# request to one of them, and /models reports their calls, error rates and
+# latency percentiles (batch wait included), as it would in production.
+# Closed loop, `concurrency` clients sending varied patients; prediction cache off.
+# Starts a real uvicorn server on localhost in a background thread.
+# Run from backend/: python -m benchmarks.bench_models [seconds] [concurrency] [routes]
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+os.environ["CWA_MODEL_ROUTES"] = sys.argv[3] if len(sys.argv) > 3 else "compiled=1,sklearn=1,neighbors=1"
+os.environ["CWA_PREDICT_CACHE_SIZE"] = "0"
+os.environ.setdefault("CWA_RELOAD_POLL", "0")
+
+import httpx
+import uvicorn
+from app import main
+
+SYMPTOMS = ["Headache", "Dizziness", "Seizures", "Cough", "Shortness of breath", "Wheezing", "Eye pain",
+            "Redness", "Tearing", "Nausea", "Vomiting", "Muscle pain", "Confusion", "Blurred vision"]
+
+
+def patient(rng):
+    return {"age": rng.randint(18, 80), "weight_kg": rng.randint(50, 110), "heart_rate": rng.randint(55, 150),
+            "respiratory": rng.randint(10, 35), "systolic_bp": rng.randint(80, 170), "oxygen": rng.randint(80, 100),
+            "gcs": rng.randint(8, 15), "gender": rng.choice(["Male", "Female"]),
+            "exposure_route": rng.choice(["Inhalation", "Dermal", "Ingestion"]),
+            "severity": rng.choice(["Mild", "Moderate", "Severe"]),
+            "human_system": rng.choice(["Nervous", "Respiratory", "Ocular"]),
+            "symptoms": ", ".join(rng.sample(SYMPTOMS, rng.randint(1, 4)))}
+
+
+def start_server():
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def run(url):
+    async with httpx.AsyncClient(base_url=url, timeout=60,
+                                 limits=httpx.Limits(max_connections=CONCURRENCY + 4)) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.1)
+        deadline = time.perf_counter() + SECONDS
+
+        async def worker(i):
+            rng = random.Random(i)
+            while time.perf_counter() < deadline:
+                await client.post("/predict_agent", json=patient(rng))
+
+        await asyncio.gather(*(worker(i) for i in range(CONCURRENCY)))
+        return (await client.get("/models")).json()
+
+
+server, thread, url = start_server()
+try:
+    report = asyncio.run(run(url))
+finally:
+    server.should_exit = True
+    thread.join()
+
+print(f"routes {report['routes']}, default {report['default']}, {CONCURRENCY} clients, {SECONDS:g}s\n")
+print(f"{'model':10} {'calls':>7} {'errors':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+for name, stats in sorted(report["stats"].items()):
+    latency = stats["latency_ms"]
+    print(f"{name:10} {stats['calls']:>7} {stats['error_rate']:>7.2%} {latency['mean']:>8.2f} {latency['p50']:>8.2f} "
+          f"{latency['p95']:>8.2f} {latency['p99']:>8.2f}")
@@ -0,0 +1,206 @@
+# bench_monitor.py
+# Load test for /monitor: a local simulator of `sessions` monitored casualties,
+# each holding an SSE stream open and sending a partial vitals update every
+# `interval` seconds (a random walk of 1-3 vitals). Compared with the same
+# patients polling /predict_agent with their full record on the same schedule.
+# Reports update latency, how many results were pushed versus suppressed,
+# update-to-event latency and CPU time of the server per update and of the
+# simulator; session setup and teardown are not timed.
+# Starts uvicorn in a child process (prediction cache off, so polling pays
+# for every request); the simulator runs in this one.
+# Run from backend/ on Linux: python -m benchmarks.bench_monitor [sessions] [seconds] [interval]
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+
+SESSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+INTERVAL = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+PATIENTS = [
+    {"age": 40, "weight_kg": 80, "heart_rate": 110, "respiratory": 24, "systolic_bp": 100, "oxygen": 91, "gcs": 13,
+     "gender": "Male", "exposure_route": "Inhalation", "severity": "Severe", "human_system": "Nervous",
+     "symptoms": "Headache, Dizziness, Seizures"},
+    {"age": 28, "weight_kg": 62, "heart_rate": 96, "respiratory": 28, "systolic_bp": 118, "oxygen": 88, "gcs": 15,
+     "gender": "Female", "exposure_route": "Inhalation", "severity": "Moderate", "human_system": "Respiratory",
+     "symptoms": "Cough, Shortness of breath, Wheezing"},
+    {"age": 55, "weight_kg": 90, "heart_rate": 72, "respiratory": 18, "systolic_bp": 135, "oxygen": 95, "gcs": 14,
+     "gender": "Male", "exposure_route": "Dermal", "severity": "Mild", "human_system": "Ocular",
+     "symptoms": "Eye pain, Redness, Tearing"},
+]
+# vital -> (step of the random walk, lowest, highest)
+VITALS = {"heart_rate": (6, 40, 180), "respiratory": (2, 6, 45), "systolic_bp": (6, 60, 200),
+          "oxygen": (1, 70, 100), "gcs": (1, 3, 15)}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def drift(record, rng):
+    """Move 1-3 vitals one step; returns just the changed fields"""
+    changes = {}
+    for vital in rng.sample(list(VITALS), rng.randint(1, 3)):
+        step, low, high = VITALS[vital]
+        changes[vital] = min(high, max(low, record[vital] + rng.choice((-step, step))))
+    record.update(changes)
+    return changes
+
+
+def pct(values, q):
+    return np.percentile(values, q) * 1000 if values else float("nan")
+
+
+class Patient:
+    """One simulated casualty whose vitals drift; reports through /monitor or by polling"""
+
+    def __init__(self, i, stats):
+        self.rng = random.Random(i)
+        self.record = dict(PATIENTS[i % len(PATIENTS)])
+        self.stats = stats
+        self.session_id = None
+        self.listener = None
+        self.sent_at = None
+
+    async def open(self, client, streams):
+        r = await client.post("/monitor", json=self.record)
+        r.raise_for_status()
+        self.session_id = r.json()["session_id"]
+        connected = asyncio.get_running_loop().create_future()
+        self.listener = asyncio.ensure_future(self.listen(streams, connected))
+        await connected
+
+    async def listen(self, streams, connected):
+        async with streams.stream("GET", f"/monitor/{self.session_id}/events") as events:
+            async for line in events.aiter_lines():
+                if line.startswith("event: closed"):
+                    return
+                if line.startswith("event: prediction"):
+                    self.stats["events"] += 1
+                    if not connected.done():
+                        connected.set_result(None)
+                    elif self.sent_at is not None:
+                        self.stats["event_latency"].append(time.perf_counter() - self.sent_at)
+                        self.sent_at = None
+
+    async def close(self, client):
+        await client.delete(f"/monitor/{self.session_id}")
+        await self.listener
+
+    async def monitor(self, client, deadline):
+        stats = self.stats
+        # spread the first updates over one interval
+        await asyncio.sleep(self.rng.random() * INTERVAL)
+        while time.perf_counter() < deadline:
+            changes = drift(self.record, self.rng)
+            t = self.sent_at = time.perf_counter()
+            try:
+                r = await client.patch(f"/monitor/{self.session_id}", json=changes)
+            except httpx.TransportError:
+                r = None
+            if r is None or r.status_code != 200:
+                self.sent_at = None
+                stats["errors"] += 1
+            else:
+                stats["latency"].append(time.perf_counter() - t)
+                if r.json()["pushed"]:
+                    stats["pushed"] += 1
+                else:
+                    self.sent_at = None
+                    stats["suppressed"] += 1
+            await asyncio.sleep(INTERVAL)
+
+    async def poll(self, client, deadline):
+        stats = self.stats
+        await asyncio.sleep(self.rng.random() * INTERVAL)
+        while time.perf_counter() < deadline:
+            drift(self.record, self.rng)
+            t = time.perf_counter()
+            try:
+                r = await client.post("/predict_agent", json=self.record)
+            except httpx.TransportError:
+                r = None
+            if r is None or r.status_code != 200:
+                stats["errors"] += 1
+            else:
+                stats["latency"].append(time.perf_counter() - t)
+            await asyncio.sleep(INTERVAL)
+
+
+async def run(base_url, pid, mode):
+    stats = {"latency": [], "event_latency": [], "events": 0, "pushed": 0, "suppressed": 0, "errors": 0}
+    # event streams hold their connections, so they get a client of their own, and idle
+    # connections are dropped before uvicorn's 5 s keep-alive timeout can race a reuse
+    limits = httpx.Limits(max_connections=SESSIONS + 8, max_keepalive_connections=SESSIONS + 8, keepalive_expiry=3)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client, \
+            httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as streams:
+        patients = [Patient(i, stats) for i in range(SESSIONS)]
+        if mode == "monitor":
+            # sessions and their streams are set up before timing starts
+            await asyncio.gather(*(p.open(client, streams) for p in patients))
+
+        cpu, client_cpu = cpu_seconds(pid), time.process_time()
+        started = time.perf_counter()
+        deadline = started + SECONDS
+        await asyncio.gather(*(getattr(p, mode)(client, deadline) for p in patients))
+        stats["seconds"] = time.perf_counter() - started
+        stats["cpu"] = cpu_seconds(pid) - cpu
+        stats["client_cpu"] = time.process_time() - client_cpu
+
+        if mode == "monitor":
+            stats["server"] = (await client.get("/inference_stats")).json()["monitor"]
+            await asyncio.gather(*(p.close(client) for p in patients))
+    return stats
+
+
+def report(label, stats):
+    n = len(stats["latency"])
+    print(f"{label:8} {n:6,} updates  {n / stats['seconds']:6.1f}/s   latency p50 {pct(stats['latency'], 50):6.1f}  "
+          f"p95 {pct(stats['latency'], 95):6.1f}  p99 {pct(stats['latency'], 99):6.1f} ms   "
+          f"server CPU {stats['cpu'] / max(n, 1) * 1000:5.2f} ms/update   simulator CPU {stats['client_cpu']:5.1f}s   errors {stats['errors']}")
+
+
+if __name__ == "__main__":
+    port = free_port()
+    env = {**os.environ, "CWA_PREDICT_CACHE_SIZE": "0", "CWA_RELOAD_POLL": "0"}
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                               "--log-level", "error"], env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            try:
+                if httpx.get(f"{base_url}/ready").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+
+        print(f"{SESSIONS} patients, one update per {INTERVAL:g}s each, {SECONDS:g}s per mode\n")
+        monitor = asyncio.run(run(base_url, server.pid, "monitor"))
+        poll = asyncio.run(run(base_url, server.pid, "poll"))
+        report("monitor", monitor)
+        report("polling", poll)
+        scored = monitor["pushed"] + monitor["suppressed"]
+        print(f"\nmonitor: {monitor['pushed']:,} of {scored:,} re-scores pushed "
+              f"({monitor['pushed'] / max(scored, 1):.0%}), {monitor['events']:,} events received "
+              f"(incl. one per session on connect), update-to-event p50 {pct(monitor['event_latency'], 50):.1f} "
+              f"p95 {pct(monitor['event_latency'], 95):.1f} ms")
+        print(f"server counters: {json.dumps(monitor['server'])}")
+    finally:
+        server.terminate()
+        server.wait()
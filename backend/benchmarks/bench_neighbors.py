@@ -0,0 +1,69 @@
+# bench_neighbors.py
+# CaseIndex build time and lookup latency as the case dataset grows, against a
+# brute-force scan over every row.
+# Run from backend/: python -m benchmarks.bench_neighbors [max_rows]
+import sys
+import time
+import numpy as np
+from app.neighbors import CaseIndex, pack_symptoms, popcount
+
+MAX_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_800_000
+N_SYMPTOMS, N_AGENTS, POOL = 57, 10, 9
+QUERIES = 200
+
+rng = np.random.default_rng(0)
+pools = [rng.choice(N_SYMPTOMS, POOL, replace=False) for _ in range(N_AGENTS)]
+
+# a symptom list is an agent's pool restricted by a 9-bit subset mask
+list_symptom_ids = [sorted(int(pools[a][b]) for b in range(POOL) if m >> b & 1)
+                    for a in range(N_AGENTS) for m in range(1 << POOL)]
+
+
+def synthetic(n):
+    agents = rng.integers(0, N_AGENTS, n)
+    subsets = rng.integers(1, 1 << POOL, n)
+    numeric = np.column_stack([
+        rng.integers(0, 7, n), rng.integers(1, 4, n), rng.integers(0, 3, n), rng.integers(0, 3, n),
+    ]).astype(float)
+    return numeric, agents * (1 << POOL) + subsets, agents
+
+
+def brute_force(index, numeric, list_codes, masks, q_num, q_mask):
+    """Similarity of every row, computed the same way CaseIndex scores points"""
+    rows = masks[list_codes]
+    inter = popcount(rows & q_mask).sum(axis=1)
+    union = popcount(rows).sum(axis=1) + popcount(q_mask).sum() - inter
+    jaccard = np.where(union == 0, 1.0, inter / np.maximum(union, 1))
+    distance = np.linalg.norm((numeric - q_num) / index.scale, axis=1)
+    return index._score(jaccard, distance)
+
+
+print(f"{'rows':>10} {'points':>8} {'build s':>8} {'index p50 us':>13} {'p99 us':>8} {'scan p50 us':>12}")
+n = 1_800
+while n <= MAX_ROWS:
+    numeric, list_codes, agents = synthetic(n)
+    start = time.perf_counter()
+    index = CaseIndex(numeric, list_codes, list_symptom_ids, agents, list(range(N_AGENTS)), N_SYMPTOMS)
+    build_s = time.perf_counter() - start
+
+    queries = [(numeric[i], list_symptom_ids[list_codes[i]]) for i in rng.integers(0, n, QUERIES)]
+    lat = []
+    for q_num, q_ids in queries:
+        t = time.perf_counter()
+        index.query(q_num, q_ids, k=25)
+        lat.append(time.perf_counter() - t)
+
+    masks = pack_symptoms(list_symptom_ids, index.n_words)
+    scan = []
+    for q_num, q_ids in queries[:20]:
+        t = time.perf_counter()
+        sim = brute_force(index, numeric, list_codes, masks, q_num, pack_symptoms([q_ids], index.n_words))
+        np.argsort(-sim, kind="stable")[:25]
+        scan.append(time.perf_counter() - t)
+        # exact: same top-25 similarities as scoring every distinct case
+        _, got = index.query(q_num, q_ids, k=25)
+        assert np.allclose(got, np.sort(sim[index.first_row])[::-1][:25])
+
+    print(f"{n:>10,} {len(index):>8,} {build_s:>8.2f} {np.percentile(lat, 50) * 1e6:>13.0f} "
+          f"{np.percentile(lat, 99) * 1e6:>8.0f} {np.percentile(scan, 50) * 1e6:>12.0f}")
+    n *= 10
@@ -0,0 +1,120 @@
+# bench_prediction_cache.py
+# Open-loop /predict_agent load shaped like an incident: a few exposure
+# profiles repeated with small differences in vitals and symptom order.
+# Compares the prediction cache off, on with exact keys, and on with vitals
+# quantized. Reports throughput, p50/p99 latency and cache counters.
+# Starts a real uvicorn server on localhost in a background thread.
+# Run from backend/: python -m benchmarks.bench_prediction_cache [seconds] [rate]
+import asyncio
+import random
+import sys
+import threading
+import time
+import httpx
+import numpy as np
+import uvicorn
+from app import main
+from app.prediction_cache import parse_quantize
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+RATE = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+PROFILES = 12
+
+SYMPTOMS = {
+    "Nervous": ["Headache", "Dizziness", "Seizures", "Confusion", "Tremors"],
+    "Respiratory": ["Cough", "Shortness of breath", "Wheezing", "Chest pain"],
+    "Ocular": ["Blurred vision", "Eye pain", "Tearing", "Redness"],
+}
+
+random.seed(0)
+profiles = []
+for i in range(PROFILES):
+    system = list(SYMPTOMS)[i % len(SYMPTOMS)]
+    profiles.append({
+        "age": random.randint(20, 70), "gender": random.choice(["Male", "Female"]),
+        "heart_rate": random.randint(60, 130), "oxygen": random.randint(85, 99),
+        "systolic_bp": random.randint(80, 150), "exposure_route": "Inhalation",
+        "severity": random.choice(["Mild", "Moderate", "Severe"]), "human_system": system,
+        "symptoms": random.sample(SYMPTOMS[system], 3),
+    })
+# a few profiles dominate, as when one release affects many people at once
+weights = 1 / np.arange(1, PROFILES + 1)
+
+
+def patient():
+    base = random.choices(profiles, weights)[0]
+    symptoms = random.sample(base["symptoms"], len(base["symptoms"]))
+    return {**base,
+            "heart_rate": base["heart_rate"] + random.choice([-1, 0, 0, 1]),
+            "oxygen": base["oxygen"] + random.choice([0, 0, 0.5]),
+            "systolic_bp": base["systolic_bp"] + random.choice([-2, 0, 2]),
+            "symptoms": ", ".join(symptoms)}
+
+
+def start_server():
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def open_loop(client, requests):
+    latencies, errors = [], 0
+
+    async def one(body):
+        nonlocal errors
+        t = time.perf_counter()
+        try:
+            r = await client.post("/predict_agent", json=body)
+        except httpx.HTTPError:
+            errors += 1
+            return
+        if r.status_code == 200:
+            latencies.append((time.perf_counter() - t) * 1000)
+        else:
+            errors += 1
+
+    tasks = []
+    start = time.perf_counter()
+    for i, body in enumerate(requests):
+        delay = start + i / RATE - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(body)))
+    await asyncio.gather(*tasks)
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run(url, requests):
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=httpx.Limits(max_connections=512)) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.1)
+        # a burst of one profile: concurrent identical requests share one inference
+        burst = await asyncio.gather(*[client.post("/predict_agent", json=requests[0]) for _ in range(50)])
+        assert len({r.text for r in burst}) == 1
+        latencies, errors, elapsed = await open_loop(client, requests)
+        stats = (await client.get("/inference_stats")).json()
+    return latencies, errors, elapsed, stats
+
+
+requests = [patient() for _ in range(int(SECONDS * RATE))]
+print(f"{len(requests)} requests at {RATE}/s over {PROFILES} profiles\n")
+print(f"{'cache':18} {'req/s':>7} {'p50 ms':>7} {'p99 ms':>7} {'errors':>6} {'hits':>6} {'coalesced':>9} "
+      f"{'misses':>6} {'batches':>7}")
+for label, size, steps in (("off", 0, ""), ("exact", 4096, ""),
+                           ("quantized", 4096, "heart_rate=5,oxygen=1,systolic_bp=5")):
+    main.PREDICT_CACHE_SIZE = size
+    main.PREDICT_QUANTIZE = parse_quantize(steps)
+    server, thread, url = start_server()
+    try:
+        latencies, errors, elapsed, stats = asyncio.run(run(url, requests))
+    finally:
+        server.should_exit = True
+        thread.join()
+    cache = stats["prediction_cache"]
+    p50, p99 = np.percentile(latencies or [0], [50, 99])
+    print(f"{label:18} {len(latencies) / elapsed:>7.0f} {p50:>7.1f} {p99:>7.1f} {errors:>6} {cache['hits']:>6} "
+          f"{cache['coalesced']:>9} {cache['misses']:>6} {stats['microbatch']['batches']:>7}")
@@ -0,0 +1,107 @@
+# bench_reload.py
+# Hot reload under load: open-loop /predict_agent traffic while the model is
+# reloaded through POST /admin/reload and then by changing a model file on disk.
+# Reports latency per phase, failed requests and the versions served; a restart
+# instead would answer 503 for the whole load time printed at the end.
+# Works on copies of the model files in a temp directory.
+# Run from backend/: python -m benchmarks.bench_reload [rate] [seconds_per_phase]
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import threading
+import httpx
+import numpy as np
+import pandas as pd
+import uvicorn
+from app import main
+
+RATE = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 6
+TOKEN = "bench"
+
+workdir = tempfile.mkdtemp(prefix="cwa_reload_")
+for name in ("ARTIFACT_PATH", "MODEL_PATH", "DATASET_PATH"):
+    path = os.path.join(workdir, os.path.basename(getattr(main, name)))
+    shutil.copy(getattr(main, name), path)
+    setattr(main, name, path)
+main.ADMIN_TOKEN = TOKEN
+main.RELOAD_POLL = 0.5
+
+PATIENT = {"age": 40, "heart_rate": 110, "oxygen": 91, "gender": "Male", "exposure_route": "Inhalation",
+           "severity": "Severe", "human_system": "Nervous", "symptoms": "Headache, Dizziness, Seizures"}
+
+
+def start_server():
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def phase(client, label, trigger=None):
+    """SECONDS of open-loop traffic; ``trigger`` runs a third of the way in"""
+    latencies, failed = [], 0
+
+    async def one():
+        nonlocal failed
+        t = time.perf_counter()
+        r = await client.post("/predict_agent", json=PATIENT)
+        latencies.append(time.perf_counter() - t)
+        failed += r.status_code != 200
+
+    tasks, start = [], time.perf_counter()
+    for i in range(int(RATE * SECONDS)):
+        await asyncio.sleep(max(0.0, start + i / RATE - time.perf_counter()))
+        tasks.append(asyncio.create_task(one()))
+        if trigger is not None and i == int(RATE * SECONDS) // 3:
+            tasks.append(asyncio.create_task(trigger()))
+    await asyncio.gather(*tasks)
+    version = (await client.get("/model_version")).json()["current"]["version"]
+    p50, p99, worst = np.percentile(latencies, [50, 99, 100]) * 1e3
+    print(f"{label:22} {len(latencies):6} {failed:6} {p50:8.1f} {p99:8.1f} {worst:8.1f}  {version}")
+
+
+async def admin_reload(client):
+    r = await client.post("/admin/reload", params={"force": "true"}, headers={"X-Admin-Token": TOKEN})
+    r.raise_for_status()
+
+
+async def change_dataset():
+    # same rows in reverse order: new content hash, so the watcher picks it up
+    df = pd.read_csv(main.DATASET_PATH)
+    tmp = main.DATASET_PATH + ".tmp"
+    df.iloc[::-1].to_csv(tmp, index=False)
+    os.replace(tmp, main.DATASET_PATH)
+
+
+async def run():
+    server, thread, url = start_server()
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.1)
+            print(f"{'phase':22} {'reqs':>6} {'failed':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  version")
+            await phase(client, "steady")
+            await phase(client, "admin reload", lambda: admin_reload(client))
+            await phase(client, "file change (watcher)", change_dataset)
+            await phase(client, "steady after")
+            stats = (await client.get("/model_version")).json()
+            for entry in stats["history"]:
+                print(f"  reload {entry['reason']:12} {entry['outcome']:9} {entry['seconds']:6.2f}s  "
+                      f"{entry.get('version', entry.get('error'))}")
+            print(f"load + warm-up of one version (a restart's 503 window): "
+                  f"{stats['current']['load_seconds'] + stats['current']['warmup_seconds']:.2f}s")
+    finally:
+        server.should_exit = True
+        thread.join()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,61 @@
+# bench_score_patients.py
+# Parity and throughput of score_patients.py: scores dataset rows with the CLI
+# and through /predict_agent, and checks that every row gets the same agent and
+# score. The input keeps the dataset's extra columns (exposure_estimate,
+# time_since_exposure_min), which the API never sees, and one of them holds
+# text, so the CLI must ignore them as the API does.
+# Run from backend/: python -m benchmarks.bench_score_patients [n_rows]
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+from fastapi.testclient import TestClient
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+os.environ["CWA_PREDICT_CACHE_SIZE"] = "0"
+os.environ.setdefault("CWA_RELOAD_POLL", "0")
+
+from app.main import app, wait_until_ready  # noqa: E402
+
+SYMPTOMS = ["Headache", "Dizziness", "Cough", "Nausea", "Blurred vision", "Seizures", "Chest pain", "Wheezing"]
+FIELDS = ["age", "weight_kg", "heart_rate", "respiratory", "systolic_bp", "oxygen", "gcs", "gender",
+          "comorbidity", "exposure_route", "exposure_unit", "severity", "human_system"]
+
+rng = random.Random(7)
+df = pd.read_csv("cwa_dataset_augmented.csv").sample(n=N, random_state=7).reset_index(drop=True)
+records = df[FIELDS + ["exposure_estimate", "time_since_exposure_min"]].copy()
+records["symptoms"] = [", ".join(rng.sample(SYMPTOMS, rng.randint(1, 4))) for _ in range(N)]
+records["exposure_estimate"] = records["exposure_estimate"].astype(object)
+records.loc[0, "exposure_estimate"] = "high"
+
+workdir = tempfile.mkdtemp(prefix="cwa_score_")
+try:
+    source = os.path.join(workdir, "patients.csv")
+    results = os.path.join(workdir, "results.ndjson")
+    records.to_csv(source, index=False)
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "score_patients.py", source, results, "--workers", "0", "--progress", "0"],
+                   check=True)
+    cli_s = time.perf_counter() - started
+    with open(results) as f:
+        cli = [json.loads(line) for line in f]
+finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+
+with TestClient(app) as client:
+    assert wait_until_ready(), "models failed to load"
+    # empty CSV cells are omitted fields for the CLI, so they are omitted here too
+    payloads = [{k: v for k, v in p.items() if pd.notna(v)}
+                for p in records[FIELDS + ["symptoms"]].to_dict(orient="records")]
+    api = [client.post("/predict_agent", json=p).json() for p in payloads]
+
+assert len(cli) == N and all("error" not in r for r in cli), "CLI rejected rows the API accepts"
+mismatches = [i for i, (c, a) in enumerate(zip(cli, api))
+              if (c["predicted_agent"], c["score"]) != (a["predicted_agent"], a["score"])]
+assert not mismatches, f"{len(mismatches)} of {N} rows differ from /predict_agent, first at row {mismatches[0]}"
+print(f"{N} rows: CLI matches /predict_agent on every row; CLI run {cli_s:.1f}s including model load")
@@ -0,0 +1,53 @@
+# bench_startup.py
+# Cold-start time of the original sequential import-time loading vs the
+# concurrent loader with the binary dataset cache (cold and warm).
+# Run from backend/: python -m benchmarks.bench_startup [scale]
+# `scale` replicates the augmented CSV that many times to mimic a larger dataset.
+import os
+import sys
+import time
+import shutil
+import tempfile
+import joblib
+import pandas as pd
+from app import main
+from app.model import CwaModel
+
+SCALE = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+workdir = tempfile.mkdtemp(prefix="cwa_startup_")
+dataset = os.path.join(workdir, "cwa_dataset_scaled.csv")
+cache_dir = os.path.join(workdir, "cache")
+base = pd.read_csv("cwa_dataset_augmented.csv")
+pd.concat([base] * SCALE, ignore_index=True).to_csv(dataset, index=False)
+
+
+def sequential():
+    """What main.py did before: artifact, then CwaModel with a plain read_csv"""
+    joblib.load("model_artifact.joblib")
+    CwaModel(model_path="models_cwa.pkl", dataset_path=dataset)
+
+
+def concurrent():
+    main.DATASET_PATH = dataset
+    main.CACHE_DIR = cache_dir
+    main.startup.update(ready=False, error=None)
+    main._loaded.clear()
+    main.load_all()
+    assert main.startup["ready"], main.startup["error"]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+try:
+    print(f"dataset rows:                     {len(base) * SCALE:,}")
+    print(f"sequential, no cache:             {timed(sequential):.3f}s")
+    print(f"concurrent, cold cache (writes):  {timed(concurrent):.3f}s")
+    print(f"concurrent, warm cache:           {timed(concurrent):.3f}s  "
+          f"(load {main.registry.current.load_seconds}s, warm-up {main.registry.current.warmup_seconds}s)")
+finally:
+    shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,105 @@
+# bench_symptoms.py
+# Parse time and memory of the old ways of reading symptom_list against the
+# symptom store (vocabulary + CSR ids in a .npz next to the CSV).
+# Builds a synthetic CSV in the legacy doubly-stringified format, converts it,
+# then times each reader and records its tracemalloc peak and retained size
+# (memory of the result it returns).
+# Run from backend/: python -m benchmarks.bench_symptoms [rows]
+import ast
+import os
+import sys
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MultiLabelBinarizer
+from app.symptom_store import SymptomMatrix, load_symptoms, parse_symptoms, sidecar_path, write_store
+from app.dataset_cache import _hash_memo
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+workdir = tempfile.mkdtemp(prefix="cwa_symptoms_")
+csv_path = os.path.join(workdir, "cwa_legacy.csv")
+
+vocab = load_symptoms("cwa_dataset_augmented.csv").vocab
+rng = np.random.default_rng(0)
+
+
+def legacy_cell(names):
+    """The doubly-stringified format cwa_dataset_augmented.csv uses"""
+    parts = [repr(n) for n in names]
+    parts[0] = "[" + parts[0]
+    parts[-1] += "]"
+    return str(parts)
+
+
+cells = [legacy_cell(list(rng.choice(vocab, rng.integers(1, 7), replace=False))) for _ in range(ROWS)]
+pd.DataFrame({"agent": "Chlorine", "symptom_list": cells}).to_csv(csv_path, index=False)
+del cells
+column = pd.read_csv(csv_path, usecols=["symptom_list"])["symptom_list"]
+
+
+def train_model_legacy():
+    """Old train_model.py: literal_eval per row, then a dense MultiLabelBinarizer"""
+    def ensure_list(x):
+        try:
+            return ast.literal_eval(x)
+        except Exception:
+            return []
+    return MultiLabelBinarizer().fit_transform(column.apply(ensure_list))
+
+
+def comma_split_legacy():
+    """Old data_prep/augment_data parse: split and strip per row, lists of str kept"""
+    return [[x.strip() for x in str(s).split(",") if x.strip()] for s in column]
+
+
+def regex_per_row():
+    """Old catalog parse without deduplication: regex strip per row"""
+    return [parse_symptoms(s) for s in column]
+
+
+def convert_cells():
+    """Converter path: each distinct cell parsed once into the CSR store"""
+    return SymptomMatrix.from_cells(column)
+
+
+def load_store():
+    """Readers now: hash the CSV, open the store"""
+    _hash_memo.clear()
+    return load_symptoms(csv_path)
+
+
+def load_store_distinct():
+    """Store plus the distinct-set grouping the catalog and case index build on"""
+    _hash_memo.clear()
+    matrix = load_symptoms(csv_path)
+    return matrix, matrix.distinct()
+
+
+def measure(fn):
+    """Untraced wall time, then a second run under tracemalloc for memory"""
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    del result
+
+    tracemalloc.start()
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, retained / 1e6, peak / 1e6
+
+
+write_store(csv_path, SymptomMatrix.from_cells(column))
+print(f"rows: {ROWS:,}   csv: {os.path.getsize(csv_path) / 1e6:.1f} MB   "
+      f"store: {os.path.getsize(sidecar_path(csv_path)) / 1e6:.2f} MB\n")
+print(f"{'reader':34} {'seconds':>8} {'kept MB':>8} {'peak MB':>8}")
+for fn in (train_model_legacy, comma_split_legacy, regex_per_row, convert_cells, load_store, load_store_distinct):
+    seconds, kept, peak = measure(fn)
+    print(f"{fn.__name__:34} {seconds:8.3f} {kept:8.1f} {peak:8.1f}")
+
+shutil.rmtree(workdir)
@@ -0,0 +1,84 @@
+# memory_report.py
+# RSS/PSS per worker process with the shared (memory-mapped) serving mode on and off,
+# and what each worker beyond the first adds: (total PSS of N workers - PSS of 1) / (N - 1).
+# Run from backend/ on Linux: python -m benchmarks.memory_report [workers] [scale]
+# `scale` replicates the augmented CSV so the dataset is large enough to matter.
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import pandas as pd
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+SCALE = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+
+def worker(dataset, shared_dir, ready, stop):
+    if shared_dir:
+        os.environ["CWA_SHARED_DIR"] = shared_dir
+    os.environ["CWA_DATASET_PATH"] = dataset
+    os.environ["CWA_CACHE_DIR"] = ""
+    from app import main
+    main.load_all()
+    assert main.startup["ready"], main.startup["error"]
+    ready.set()
+    stop.wait()
+
+
+def smaps(pid):
+    """Rss and Pss in MiB from /proc/<pid>/smaps_rollup"""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                out[key] = int(rest.split()[0]) / 1024
+    return out
+
+
+def run(dataset, shared_dir, workers):
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    procs, events = [], []
+    for _ in range(workers):
+        ready = ctx.Event()
+        p = ctx.Process(target=worker, args=(dataset, shared_dir, ready, stop))
+        p.start()
+        procs.append(p)
+        events.append(ready)
+    for e in events:
+        e.wait()
+    stats = [smaps(p.pid) for p in procs]
+    stop.set()
+    for p in procs:
+        p.join()
+    return stats
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp(prefix="cwa_mem_")
+    dataset = os.path.join(workdir, "cwa_dataset_scaled.csv")
+    base = pd.read_csv("cwa_dataset_augmented.csv")
+    pd.concat([base] * SCALE, ignore_index=True).to_csv(dataset, index=False)
+
+    try:
+        print(f"workers: {WORKERS}, dataset rows: {len(base) * SCALE:,}")
+        marginal = {}
+        for label, shared_dir in (("private copies", None), ("shared mmap", os.path.join(workdir, "shared"))):
+            single = sum(s["Pss"] for s in run(dataset, shared_dir, 1))
+            stats = run(dataset, shared_dir, WORKERS)
+            total = sum(s["Pss"] for s in stats)
+            print(f"\n{label}")
+            for i, s in enumerate(stats):
+                print(f"  worker {i}: RSS {s['Rss']:8.1f} MiB   PSS {s['Pss']:8.1f} MiB")
+            print(f"  total PSS: {total:8.1f} MiB   (1 worker: {single:.1f} MiB)")
+            if WORKERS > 1:
+                marginal[label] = (total - single) / (WORKERS - 1)
+                print(f"  PSS per added worker: {marginal[label]:8.1f} MiB")
+        if marginal:
+            private, shared = marginal["private copies"], marginal["shared mmap"]
+            print(f"\neach added worker costs {private - shared:.1f} MiB less with the shared mode "
+                  f"({shared / private:.0%} of a private worker)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,257 @@
+# suite.py
+# In-process benchmark suite: the FastAPI app is driven through an ASGI transport
+# (no sockets), with payloads sampled from cwa_dataset_augmented.csv, plus
+# microbenchmarks of CwaModel and the raw artifact pipeline. Results are JSON.
+# Run from backend/:
+#   python -m benchmarks.suite --output baseline.json
+#   python -m benchmarks.suite --compare baseline.json [--tolerance 0.25]
+# --compare exits with status 1 when a case got slower than the tolerance allows.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+import numpy as np
+import pandas as pd
+
+# predict_agent cases replay the same payloads, so with the result cache on they
+# would time cache hits; hits get their own case, http.predict_agent.cached
+os.environ["CWA_PREDICT_CACHE_SIZE"] = "0"
+
+from app import main
+from app.model import CwaModel
+from app.prediction_cache import PredictionCache
+from app.symptom_store import parse_symptoms
+
+DATASET = "cwa_dataset_augmented.csv"
+# compared in --compare mode, with the tolerance scaled per metric since tails are
+# noisier; throughput is derived from these so is not checked twice
+COMPARED = {"p50_ms": 1.0, "p99_ms": 2.0}
+
+
+def sample_payloads(df, n, seed=42):
+    """Realistic PredictInput bodies: real rows with a random subset of their own symptoms"""
+    rng = random.Random(seed)
+
+    def value(row, col, cast):
+        v = row.get(col)
+        return None if v is None or pd.isna(v) else cast(v)
+
+    payloads = []
+    for i in (rng.randrange(len(df)) for _ in range(n)):
+        row = df.iloc[i].to_dict()
+        symptoms = parse_symptoms(row["symptom_list"]) or ["Headache"]
+        payloads.append({
+            "age": value(row, "age", float),
+            "weight_kg": value(row, "weight_kg", float),
+            "heart_rate": value(row, "heart_rate", float),
+            "respiratory": value(row, "respiratory", float),
+            "systolic_bp": value(row, "systolic_bp", float),
+            "oxygen": value(row, "oxygen", float),
+            "gcs": value(row, "gcs", float),
+            "gender": str(row["gender"]),
+            "comorbidity": value(row, "comorbidity", str),
+            "exposure_route": value(row, "exposure_route", str),
+            "exposure_unit": value(row, "exposure_unit", str),
+            "severity": value(row, "severity", str),
+            "human_system": str(row["human_system"]),
+            "symptoms": ", ".join(rng.sample(symptoms, rng.randint(1, min(4, len(symptoms))))),
+        })
+    return payloads
+
+
+def summarize(latencies, elapsed):
+    ms = np.asarray(latencies) * 1000
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "n": len(ms),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p90_ms": round(float(p90), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "ops_per_s": round(len(ms) / elapsed, 2),
+    }
+
+
+def time_calls(fn, args_list, warmup=3):
+    for args in args_list[:warmup]:
+        fn(*args)
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        t = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def time_requests(client, send, n, concurrency=1, warmup=3):
+    """Latency of ``n`` requests from ``concurrency`` closed-loop clients; send(i) makes request i"""
+    for i in range(warmup):
+        (await send(i)).raise_for_status()
+
+    latencies = []
+
+    async def worker(indices):
+        for i in indices:
+            t = time.perf_counter()
+            r = await send(i)
+            latencies.append(time.perf_counter() - t)
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(range(w, n, concurrency)) for w in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def http_cases(payloads, agents, n):
+    results = {}
+    async with main.lifespan(main.app):
+        if not await asyncio.to_thread(main.wait_until_ready, 600):
+            raise RuntimeError(f"models failed to load: {main.startup['error']}")
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            rng = random.Random(7)
+            agent_picks = [rng.choice(agents) for _ in range(n)]
+
+            def predict(i):
+                return client.post("/predict_agent", json=payloads[i % len(payloads)])
+
+            results["http.predict_agent"] = await time_requests(client, predict, n)
+            results["http.predict_agent.c16"] = await time_requests(client, predict, n, concurrency=16)
+
+            # a cache for this case only, filled with every payload it replays before timing
+            current = main.registry.current
+            uncached = current.predictions
+            current.predictions = PredictionCache()
+            try:
+                for i in range(min(n, len(payloads))):
+                    (await predict(i)).raise_for_status()
+                results["http.predict_agent.cached"] = await time_requests(client, predict, n)
+            finally:
+                current.predictions = uncached
+            results["http.get_all_symptoms"] = await time_requests(
+                client, lambda i: client.get("/get_all_symptoms"), n)
+            results["http.get_all_agents"] = await time_requests(
+                client, lambda i: client.get("/get_all_agents"), n)
+            results["http.get_agent_details.limit50"] = await time_requests(
+                client, lambda i: client.get("/get_agent_details",
+                                             params={"agent_name": agent_picks[i], "limit": 50}), n)
+            results["http.get_agent_details.full"] = await time_requests(
+                client, lambda i: client.get("/get_agent_details", params={"agent_name": agent_picks[i]}),
+                max(10, n // 10))
+    return results
+
+
+def micro_cases(payloads, n):
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix="cwa_bench_") as cache_dir:
+        cached = CwaModel(model_path=main.MODEL_PATH, dataset_path=main.DATASET_PATH, cache_dir=cache_dir)
+        reps = [()] * max(5, n // 50)
+        results["model.load_and_preprocess_dataset.cached"] = time_calls(cached.load_and_preprocess_dataset, reps)
+        cached.cache_dir = None
+        results["model.load_and_preprocess_dataset.csv"] = time_calls(cached.load_and_preprocess_dataset, reps)
+
+    results["model.preprocess_input"] = time_calls(cached.preprocess_input, [(p,) for p in payloads[:n]])
+    results["model.predict"] = time_calls(cached.predict, [(p,) for p in payloads[:n]])
+
+    pipeline = main.registry.current.pipeline
+    single = [(main.build_batch_frame([p]),) for p in payloads[:n]]
+    results["pipeline.predict_proba.1"] = time_calls(pipeline.predict_proba, single)
+    batch = main.build_batch_frame(payloads[:256])
+    results["pipeline.predict_proba.256"] = time_calls(pipeline.predict_proba, [(batch,)] * max(5, n // 20))
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "inference_pool": main.INFERENCE_POOL,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Print a case-by-case comparison; return the regressed (case, metric) pairs"""
+    regressions = []
+    print(f"{'case':44} {'metric':7} {'baseline':>10} {'current':>10} {'change':>8}")
+    for case, now in current["results"].items():
+        before = baseline["results"].get(case)
+        if before is None:
+            print(f"{case:44} (new case)")
+            continue
+        for metric, scale in COMPARED.items():
+            change = now[metric] / before[metric] - 1 if before[metric] else 0.0
+            flag = ""
+            if change > tolerance * scale:
+                flag = "  REGRESSION"
+                regressions.append((case, metric))
+            print(f"{case:44} {metric:7} {before[metric]:10.3f} {now[metric]:10.3f} {change:+8.1%}{flag}")
+    for case in sorted(baseline["results"].keys() - current["results"].keys()):
+        print(f"{case:44} (missing from this run)")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CWA backend benchmark suite")
+    parser.add_argument("--requests", type=int, default=300, help="requests/calls per case")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed p50 slowdown as a fraction (0.25 = 25%% slower); p99 gets twice this")
+    parser.add_argument("--only", choices=["http", "micro"], help="run just one group")
+    return parser.parse_args()
+
+
+def run():
+    args = parse_args()
+    df = pd.read_csv(DATASET)
+    payloads = sample_payloads(df, max(args.requests, 256))
+    # the trained agent list includes agents without dataset rows; details need real ones
+    agents = sorted(df["agent"].dropna().unique())
+
+    results = {}
+    if args.only != "micro":
+        results.update(asyncio.run(http_cases(payloads, agents, args.requests)))
+    if args.only != "http":
+        if main.registry.current is None:  # http cases not run, load the models directly
+            main.load_all()
+        results.update(micro_cases(payloads, args.requests))
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,62 @@
+# compile_model.py
+# Exports the artifact's fitted preprocessing and forest as flat arrays
+# (model_artifact.compiled.npz) for the compiled serving engine, after checking
+# it scores a sample of the dataset exactly like the artifact pipeline.
+# The server also compiles in memory when the export is missing or stale;
+# exporting just skips that step at startup.
+# Run from backend/: python compile_model.py [--artifact model_artifact.joblib]
+import argparse
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from app.compiled import CompiledPipeline, export_compiled
+from app.encoder import FeatureEncoder, NUMERIC_FEATURES
+from app.symptom_store import load_symptoms
+
+CATEGORICAL_FIELDS = ["gender", "comorbidity", "exposure_route", "severity", "human_system"]
+
+
+def dataset_records(dataset, rows):
+    """Dataset rows as predict_agent payloads, missing values left as NaN"""
+    df = pd.read_csv(dataset)
+    symptoms = load_symptoms(dataset, df["symptom_list"])
+    fields = [c for c in NUMERIC_FEATURES + CATEGORICAL_FIELDS if c in df.columns]
+    records = df.iloc[rows][fields].to_dict("records")
+    for record, i in zip(records, rows):
+        record["symptoms"] = ", ".join(symptoms.names(i))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the model artifact for the compiled serving engine")
+    parser.add_argument("--artifact", default="model_artifact.joblib")
+    parser.add_argument("--dataset", default="cwa_dataset_augmented.csv")
+    parser.add_argument("--check-rows", type=int, default=2000, help="rows scored by both to check parity")
+    args = parser.parse_args()
+
+    artifact = joblib.load(args.artifact)
+    pipeline, columns = artifact["pipeline"], artifact["feature_columns"]
+    started = time.perf_counter()
+    path = export_compiled(args.artifact, pipeline, columns)
+    elapsed = time.perf_counter() - started
+
+    compiled = CompiledPipeline.load(path)
+    encoder = FeatureEncoder(columns, artifact["mlb_classes"])
+    n_rows = len(pd.read_csv(args.dataset, usecols=["agent"]))
+    picked = np.random.default_rng(0).permutation(n_rows)[:args.check_rows]
+    rows = encoder.encode_batch(dataset_records(args.dataset, picked))
+    expected = pipeline.predict_proba(encoder.to_frame(rows))
+    if not np.array_equal(expected, compiled.predict_proba(rows)):
+        os.remove(path)
+        raise SystemExit(f"compiled pipeline disagrees with {args.artifact}; export removed")
+
+    print(f"Saved {path} ({os.path.getsize(path) / 1e3:.0f} kB, {args.artifact} is "
+          f"{os.path.getsize(args.artifact) / 1e3:.0f} kB) in {elapsed:.2f}s: "
+          f"{len(compiled.forest.roots)} trees, {len(compiled.forest.feature)} nodes, depth {compiled.forest.depth}; "
+          f"identical probabilities on {len(rows)} dataset rows")
+
+
+if __name__ == "__main__":
+    main()
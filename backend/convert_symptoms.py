@@ -0,0 +1,40 @@
+# convert_symptoms.py
+# Writes the symptom store (<name>.symptoms.npz) for existing dataset CSVs, whatever
+# legacy symptom_list format they use. --rewrite also rewrites symptom_list in the
+# CSV itself as a single level of list repr (['A', 'B']) before storing.
+# Run from backend/: python convert_symptoms.py cwa_dataset_augmented.csv [more.csv ...] [--rewrite]
+import argparse
+import os
+import time
+import pandas as pd
+from app.symptom_store import SymptomMatrix, write_store
+
+
+def rewrite_csv(path, chunk_rows=200_000):
+    """Replace symptom_list with its canonical form, streaming so big files fit in memory"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    for i, chunk in enumerate(pd.read_csv(path, chunksize=chunk_rows)):
+        matrix = SymptomMatrix.from_cells(chunk["symptom_list"])
+        chunk["symptom_list"] = [str(matrix.names(r)) for r in range(len(matrix))]
+        chunk.to_csv(tmp, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    os.replace(tmp, path)
+
+
+def convert(path, rewrite=False):
+    started = time.perf_counter()
+    if rewrite:
+        rewrite_csv(path)
+    cells = pd.read_csv(path, usecols=["symptom_list"])["symptom_list"]
+    matrix = SymptomMatrix.from_cells(cells)
+    store = write_store(path, matrix)
+    print(f"{path}: {len(matrix)} rows, {len(matrix.vocab)} symptoms -> {store} "
+          f"({os.path.getsize(store) / 1e3:.1f} kB, {time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert symptom_list columns to the symptom store")
+    parser.add_argument("csv", nargs="+")
+    parser.add_argument("--rewrite", action="store_true", help="also rewrite symptom_list in the CSV")
+    args = parser.parse_args()
+    for path in args.csv:
+        convert(path, rewrite=args.rewrite)
@@ -1,17 +1,18 @@
 # data_prep.py
 import pandas as pd
+from app.symptom_store import SymptomMatrix, parse_symptoms, write_store
 
 df = pd.read_excel("cwa_dataset.xlsx")
 med_cols = [c for c in df.columns if c.endswith("_initial")]
 df_clean = df.drop(columns=med_cols)
 
-def parse_symptom_str(s):
-    if pd.isna(s): return []
-    return [x.strip() for x in str(s).split(",") if x.strip()]
-
-df_clean["symptom_list"] = df_clean["symptoms"].apply(parse_symptom_str)
+df_clean["symptom_list"] = df_clean["symptoms"].apply(lambda s: [] if pd.isna(s) else parse_symptoms(s))
 # keep columns we want for training (example)
 cols_to_keep = [c for c in df_clean.columns if c not in ("symptoms",)]  # adjust if you want
 df_clean = df_clean[cols_to_keep]
 df_clean.to_csv("cwa_dataset_clean.csv", index=False)
 print("Saved cwa_dataset_clean.csv with", df_clean.shape)
+
+# the canonical symptom sets, so nothing downstream re-parses symptom_list
+store = write_store("cwa_dataset_clean.csv", SymptomMatrix.from_lists(df_clean["symptom_list"]))
+print("Saved", store)
@@ -0,0 +1,231 @@
+# score_patients.py
+# Scores a CSV or NDJSON file of patient records (the predict_agent input schema)
+# with the artifact the API serves, streaming the predicted agent, score and
+# initial dosing to NDJSON or CSV. Reads fixed-size chunks, encodes each chunk
+# column-wise and scores chunks across a process pool, writing results in input
+# order with a bounded number of chunks in flight, so memory stays constant
+# whatever the file size. Reports rows/s on stderr.
+# Rows that fail validation get an "error" instead of a prediction, as in
+# /predict_agents_batch. Missing cells count as omitted fields, and columns that
+# are not PredictInput fields are ignored.
+# Run from backend/: python score_patients.py patients.csv results.ndjson [--workers 4] [--keep patient_id]
+import argparse
+import csv
+import io
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+from app.compiled import CompileError, load_compiled
+from app.encoder import FeatureEncoder
+from app.http_cache import dumps
+from app.model import AGENT_TO_MEDICINE
+
+# PredictInput: required fields, and the ones that must parse as numbers
+REQUIRED_FIELDS = ["gender", "human_system", "symptoms"]
+NUMBER_FIELDS = ["age", "weight_kg", "heart_rate", "respiratory", "systolic_bp", "oxygen", "gcs"]
+TEXT_FIELDS = ["gender", "comorbidity", "exposure_route", "exposure_unit", "severity", "human_system", "symptoms"]
+# everything PredictInput accepts; other columns, even model features such as
+# exposure_estimate, stay at the encoder defaults as they do in the API
+INPUT_FIELDS = NUMBER_FIELDS + TEXT_FIELDS
+MEDICINE_FIELDS = list(next(iter(AGENT_TO_MEDICINE.values())))
+
+_scorer = None
+
+
+def output_format(path, given):
+    if given:
+        return given
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def read_chunks(path, chunk_rows):
+    """DataFrame chunks of a CSV or NDJSON (.ndjson/.jsonl) file, every cell as read"""
+    if path.lower().endswith((".ndjson", ".jsonl")):
+        return pd.read_json(path, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False)
+    # text stays text ("007" is not 7); numbers are parsed during validation
+    return pd.read_csv(path, chunksize=chunk_rows, dtype=str)
+
+
+class Scorer:
+    """The artifact pipeline plus encoder, loaded once per worker process"""
+
+    def __init__(self, artifact_path, engine):
+        artifact = joblib.load(artifact_path)
+        self.pipeline = artifact["pipeline"]
+        self.encoder = FeatureEncoder(artifact["feature_columns"], artifact["mlb_classes"])
+        self.compiled = None
+        if engine == "compiled":
+            try:
+                self.compiled = load_compiled(artifact_path, self.pipeline, artifact["feature_columns"])
+            except CompileError:
+                print("artifact pipeline cannot be compiled, scoring with sklearn", file=sys.stderr)
+
+    def validate(self, frame):
+        """(frame with numbers parsed, per-row error message, mask of valid rows)"""
+        frame = frame.copy()
+        checks = []
+        for field in NUMBER_FIELDS:
+            if field in frame.columns:
+                raw = frame[field]
+                parsed = pd.to_numeric(raw, errors="coerce")
+                given = raw.notna() & (raw.astype(str).str.strip() != "")
+                checks.append(((parsed.isna() & given).to_numpy(), f"{field}: Input should be a valid number"))
+                frame[field] = parsed.astype(float)
+        for field in TEXT_FIELDS:
+            if field in frame.columns:
+                column = frame[field]
+                frame[field] = column.where(column.isna(), column.astype(str))
+        for field in REQUIRED_FIELDS:
+            missing = frame[field].isna().to_numpy() if field in frame.columns else np.ones(len(frame), bool)
+            checks.append((missing, f"{field}: Field required"))
+
+        # first failed check wins, as pydantic reports the first error
+        errors = np.full(len(frame), None, dtype=object)
+        valid = np.ones(len(frame), dtype=bool)
+        for failed, message in checks:
+            failed = failed & valid
+            errors[failed] = message
+            valid &= ~failed
+        return frame, errors, valid
+
+    def score(self, frame):
+        """(predicted agents, scores) for validated rows"""
+        rows = self.encoder.encode_frame(frame[[col for col in INPUT_FIELDS if col in frame.columns]])
+        if self.compiled is not None:
+            proba = self.compiled.predict_proba(rows)
+        else:
+            proba = self.pipeline.predict_proba(self.encoder.to_frame(rows))
+        best = proba.argmax(axis=1)
+        classes = np.asarray(self.pipeline.classes_).astype(str)
+        # Python's round, as the API uses: np.round gives 0.8 for 0.805, round gives 0.81
+        return classes[best], np.array([round(float(p), 2) for p in proba[np.arange(len(best)), best]])
+
+    def run(self, first_row, frame, keep, fmt):
+        """Score one chunk and render it; returns (text, rows, errors)"""
+        frame, errors, valid = self.validate(frame)
+        ok = np.flatnonzero(valid)
+        agents = np.full(len(frame), None, dtype=object)
+        scores = np.full(len(frame), np.nan)
+        if len(ok):
+            agents[ok], scores[ok] = self.score(frame.iloc[ok])
+
+        kept = {col: frame[col].to_numpy(dtype=object) if col in frame.columns else np.full(len(frame), None)
+                for col in keep}
+        out = io.StringIO()
+        if fmt == "csv":
+            writer = csv.writer(out, lineterminator="\n")
+            for i in range(len(frame)):
+                passed = [_cell(kept[col][i]) for col in keep]
+                if not valid[i]:
+                    writer.writerow([first_row + i, *passed, "", "", errors[i]] + [""] * len(MEDICINE_FIELDS))
+                else:
+                    medicine = AGENT_TO_MEDICINE.get(agents[i], {})
+                    writer.writerow([first_row + i, *passed, agents[i], scores[i], ""]
+                                    + [medicine.get(m, "") for m in MEDICINE_FIELDS])
+        else:
+            for i in range(len(frame)):
+                record = {"row": first_row + i, **{col: _cell(kept[col][i]) for col in keep}}
+                if not valid[i]:
+                    record["error"] = errors[i]
+                else:
+                    record.update(predicted_agent=agents[i], score=float(scores[i]),
+                                  medicine=AGENT_TO_MEDICINE.get(agents[i], {}))
+                out.write(dumps(record).decode())
+                out.write("\n")
+        return out.getvalue(), len(frame), len(frame) - len(ok)
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _init_worker(artifact_path, engine):
+    global _scorer
+    _scorer = Scorer(artifact_path, engine)
+
+
+def _run_chunk(first_row, frame, keep, fmt):
+    return _scorer.run(first_row, frame, keep, fmt)
+
+
+def csv_header(keep):
+    return ",".join(["row", *keep, "predicted_agent", "score", "error", *MEDICINE_FIELDS]) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV/NDJSON file of patient records with the model artifact")
+    parser.add_argument("input", help="CSV, or NDJSON (.ndjson/.jsonl), one PredictInput record per row")
+    parser.add_argument("output", help="results file (.csv or .ndjson), - for stdout")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="output format, by default from the extension")
+    parser.add_argument("--artifact", default=os.environ.get("CWA_ARTIFACT_PATH", "model_artifact.joblib"))
+    parser.add_argument("--engine", choices=["compiled", "sklearn"], default="sklearn",
+                        help="sklearn scores big chunks faster; compiled wins on small ones")
+    parser.add_argument("--chunk-rows", type=int, default=8192)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="scoring processes; 0 scores in this process")
+    parser.add_argument("--keep", nargs="*", default=[], help="input columns copied to each result, e.g. an id")
+    parser.add_argument("--progress", type=float, default=5.0, help="seconds between rows/s reports, 0 for none")
+    args = parser.parse_args()
+
+    fmt = output_format(args.output, args.format)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    if fmt == "csv":
+        out.write(csv_header(args.keep))
+
+    pool = None
+    if args.workers > 0:
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(args.artifact, args.engine))
+    else:
+        _init_worker(args.artifact, args.engine)
+
+    started = last_report = time.perf_counter()
+    rows = errors = 0
+    pending = deque()
+    # enough chunks in flight to keep every worker busy, few enough to bound memory
+    max_pending = 2 * max(1, args.workers)
+
+    def write(result):
+        nonlocal rows, errors, last_report
+        text, n, failed = result
+        out.write(text)
+        rows += n
+        errors += failed
+        now = time.perf_counter()
+        if args.progress and now - last_report >= args.progress:
+            print(f"{rows:,} rows, {rows / (now - started):,.0f} rows/s", file=sys.stderr)
+            last_report = now
+
+    try:
+        first_row = 0
+        for frame in read_chunks(args.input, args.chunk_rows):
+            if pool is None:
+                write(_run_chunk(first_row, frame, args.keep, fmt))
+            else:
+                pending.append(pool.submit(_run_chunk, first_row, frame, args.keep, fmt))
+                while len(pending) >= max_pending:
+                    write(pending.popleft().result())
+            first_row += len(frame)
+        while pending:
+            write(pending.popleft().result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Scored {rows:,} rows ({errors:,} invalid) in {elapsed:.1f}s: {rows / max(elapsed, 1e-9):,.0f} rows/s "
+          f"-> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,278 @@
-# trainer.py
-import pandas as pd
+# train_model.py
+# Trains the agent classifier and saves model_artifact.joblib.
+# Parsed features (symptoms as a sparse matrix) and the preprocessed matrix are
+# cached under .cache/ keyed by the dataset hash, so reruns skip straight to the
+# forest fit, which uses every core.
+# Run from backend/:
+#   python train_model.py                                   # fit + save, as before
+#   python train_model.py --cv 5                            # + parallel stratified CV
+#   python train_model.py --sweep --latency-budget-ms 10 --report sweep.json --no-save
+import argparse
+import json
+import os
+import pickle
+import time
 import joblib
-from sklearn.preprocessing import MultiLabelBinarizer, OneHotEncoder
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy import sparse
+from joblib import Parallel, delayed
+from sklearn.preprocessing import OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.preprocessing import StandardScaler
+from app.dataset_cache import file_hash
+from app.symptom_store import load_symptoms
+
+DATASET = "cwa_dataset_augmented.csv"
+CACHE_VERSION = 2
+
+NUMERIC_COLS = ["exposure_estimate", "time_since_exposure_min", "age", "weight_kg",
+                "heart_rate", "respiratory", "systolic_bp", "oxygen", "gcs"]
+CAT_COLS = ["gender", "comorbidity", "exposure_route", "severity", "human_system"]
+
+SWEEP_ESTIMATORS = [25, 50, 100, 200]
+SWEEP_DEPTHS = [None, 8, 16]
+
+
+# ----------------------------- #
+# Features (cached)
+# ----------------------------- #
+def parse_features(df, dataset):
+    """Plain feature columns, a sparse symptom multi-hot block and labels.
+
+    Symptoms come from the dataset's symptom store (or the same canonical
+    parse when it has none), so columns are sym_<clean name> in vocabulary order.
+    """
+    symptoms = load_symptoms(dataset, df["symptom_list"])
+
+    numeric_cols = [c for c in NUMERIC_COLS if c in df.columns]
+    cat_cols = [c for c in CAT_COLS if c in df.columns]
+    return {
+        "frame": df[numeric_cols + cat_cols].reset_index(drop=True),
+        "numeric_cols": numeric_cols,
+        "cat_cols": cat_cols,
+        "symptoms": symptoms.to_scipy(),
+        "mlb_classes": list(symptoms.vocab),
+        "y": df["agent"].to_numpy(),
+    }
+
+
+def feature_frame(parsed, rows=None):
+    """The artifact's input DataFrame for some rows, symptoms densified only here"""
+    frame = parsed["frame"] if rows is None else parsed["frame"].iloc[rows]
+    sym = parsed["symptoms"] if rows is None else parsed["symptoms"][rows]
+    sym_df = pd.DataFrame(sym.toarray(), columns=[f"sym_{s}" for s in parsed["mlb_classes"]])
+    return pd.concat([frame.reset_index(drop=True), sym_df], axis=1)
+
+
+def build_preprocessor(numeric_cols, cat_cols):
+    num_pipe = Pipeline([("imputer", SimpleImputer(strategy="median")), ("scaler", StandardScaler())])
+    cat_pipe = Pipeline([("imputer", SimpleImputer(strategy="most_frequent")),
+                         ("ohe", OneHotEncoder(handle_unknown="ignore"))])
+    return ColumnTransformer([
+        ("num", num_pipe, numeric_cols),
+        ("cat", cat_pipe, cat_cols)
+    ], remainder='passthrough')  # passthrough symptoms (they are already numeric 0/1)
+
+
+def transform_sparse(pre, parsed, chunk=50_000):
+    """Preprocess every row in chunks into one float32 CSR matrix"""
+    n = len(parsed["y"])
+    blocks = [sparse.csr_matrix(pre.transform(feature_frame(parsed, np.arange(s, min(s + chunk, n)))),
+                                dtype=np.float32)
+              for s in range(0, n, chunk)]
+    return sparse.vstack(blocks, format="csr")
+
+
+def load_features(dataset, cache_dir, test_size=0.15, seed=42):
+    """Parsed features, the train/val split, the fitted preprocessor and the preprocessed matrix.
+
+    Cached as one joblib file per (dataset content, split); the preprocessor
+    is fitted on the training split only, as before.
+    """
+    # the entry pickles a fitted preprocessor, so it is only valid for this sklearn
+    key = f"{file_hash(dataset)[:16]}-{test_size}-{seed}-sk{sklearn.__version__}"
+    path = os.path.join(cache_dir, f"train-{key}.v{CACHE_VERSION}.joblib") if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            return joblib.load(path), True
+        except Exception:
+            pass  # unreadable entry, rebuild below
+
+    parsed = parse_features(pd.read_csv(dataset), dataset)
+    train_idx, val_idx = train_test_split(np.arange(len(parsed["y"])), test_size=test_size,
+                                          stratify=parsed["y"], random_state=seed)
+    pre = build_preprocessor(parsed["numeric_cols"], parsed["cat_cols"])
+    pre.fit(feature_frame(parsed, train_idx))
+    features = {**parsed, "train_idx": train_idx, "val_idx": val_idx, "pre": pre,
+                "Xt": transform_sparse(pre, parsed)}
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(features, tmp)
+        os.replace(tmp, path)
+    return features, False
+
+
+# ----------------------------- #
+# Fitting and evaluation
+# ----------------------------- #
+def make_forest(n_estimators, max_depth, n_jobs=1):
+    return RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                  class_weight="balanced", random_state=42, n_jobs=n_jobs)
+
+
+def _fit_score(n_estimators, max_depth, X, y, train, test):
+    rf = make_forest(n_estimators, max_depth).fit(X[train], y[train])
+    return accuracy_score(y[test], rf.predict(X[test]))
+
+
+def cross_validate(configs, features, folds, n_jobs):
+    """Stratified k-fold accuracy per config; every (config, fold) fit runs as its own job"""
+    X, y = features["Xt"], features["y"]
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(np.zeros(len(y)), y))
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_score)(n, d, X, y, train, test) for n, d in configs for train, test in splits
+    )
+    return {cfg: np.asarray(scores[i * folds:(i + 1) * folds]) for i, cfg in enumerate(configs)}
+
+
+def _fit(n_estimators, max_depth, X, y):
+    return make_forest(n_estimators, max_depth).fit(X, y)
+
+
+def measure_latency(rf, X, rows=200, batch=256):
+    """Single-row predict_proba percentiles and per-row cost of a batch call, one thread"""
+    rf.n_jobs = None
+    single = []
+    for i in range(min(rows, X.shape[0])):
+        row = X[i:i + 1]
+        t = time.perf_counter()
+        rf.predict_proba(row)
+        single.append(time.perf_counter() - t)
+    block = X[:batch]
+    t = time.perf_counter()
+    rf.predict_proba(block)
+    batch_s = time.perf_counter() - t
+    p50, p99 = np.percentile(np.asarray(single) * 1000, [50, 99])
+    return {"p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3),
+            "batch_ms_per_row": round(batch_s * 1000 / block.shape[0], 4)}
+
+
+def model_size(rf):
+    return {"nodes": int(sum(est.tree_.node_count for est in rf.estimators_)),
+            "bytes": len(pickle.dumps(rf, protocol=pickle.HIGHEST_PROTOCOL))}
+
+
+def sweep(features, configs, folds, n_jobs, budget_ms):
+    """Fit each config on the train split (in parallel), then measure accuracy, size and latency"""
+    X, y = features["Xt"], features["y"]
+    train, val = features["train_idx"], features["val_idx"]
+    forests = Parallel(n_jobs=n_jobs)(delayed(_fit)(n, d, X[train], y[train]) for n, d in configs)
+    cv = cross_validate(configs, features, folds, n_jobs) if folds else {}
+
+    rows = []
+    for (n, d), rf in zip(configs, forests):
+        row = {"n_estimators": n, "max_depth": d,
+               "val_accuracy": round(accuracy_score(y[val], rf.predict(X[val])), 4),
+               **model_size(rf), **measure_latency(rf, X[val])}
+        if cv:
+            row["cv_accuracy"] = round(float(cv[(n, d)].mean()), 4)
+            row["cv_std"] = round(float(cv[(n, d)].std()), 4)
+        if budget_ms is not None:
+            row["within_budget"] = row["p99_ms"] <= budget_ms
+        rows.append(row)
+    return rows
+
+
+def print_sweep(rows):
+    acc_key = "cv_accuracy" if "cv_accuracy" in rows[0] else "val_accuracy"
+    print(f"\n{'trees':>5} {'depth':>5} {acc_key:>12} {'nodes':>8} {'size MB':>8} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'ms/row@256':>10}")
+    for r in sorted(rows, key=lambda r: (-r[acc_key], r["p99_ms"])):
+        flag = "" if r.get("within_budget", True) else "  over budget"
+        print(f"{r['n_estimators']:>5} {str(r['max_depth']):>5} {r[acc_key]:>12.4f} {r['nodes']:>8} "
+              f"{r['bytes'] / 1e6:>8.2f} {r['p50_ms']:>7.2f} {r['p99_ms']:>7.2f} "
+              f"{r['batch_ms_per_row']:>10.4f}{flag}")
+
+    fitting = [r for r in rows if r.get("within_budget", True)]
+    if fitting:
+        best = max(fitting, key=lambda r: (r[acc_key], -r["p99_ms"]))
+        print(f"\nbest within budget: n_estimators={best['n_estimators']} max_depth={best['max_depth']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the CWA agent classifier")
+    parser.add_argument("--dataset", default=DATASET)
+    parser.add_argument("--output", default="model_artifact.joblib")
+    parser.add_argument("--cache-dir", default=os.environ.get("CWA_CACHE_DIR", ".cache"),
+                        help="feature cache directory, empty to disable")
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores to use, -1 for all")
+    parser.add_argument("--cv", type=int, default=0, help="stratified k-fold CV with this many folds")
+    parser.add_argument("--sweep", action="store_true", help="grid over n_estimators x max_depth")
+    parser.add_argument("--latency-budget-ms", type=float, help="flag sweep configs whose p99 exceeds this")
+    parser.add_argument("--report", help="write the CV/sweep report as JSON")
+    parser.add_argument("--no-save", action="store_true", help="do not fit/save the final artifact")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    started = time.perf_counter()
+    features, cached = load_features(args.dataset, args.cache_dir)
+    print(f"features: {features['Xt'].shape[0]} rows x {features['Xt'].shape[1]} columns "
+          f"({'cached' if cached else 'built'} in {time.perf_counter() - started:.2f}s)")
+
+    chosen = (args.n_estimators, args.max_depth)
+    report = {"dataset": args.dataset, "rows": int(features["Xt"].shape[0])}
+
+    if args.sweep:
+        configs = [(n, d) for n in SWEEP_ESTIMATORS for d in SWEEP_DEPTHS]
+        report["sweep"] = sweep(features, configs, args.cv, args.n_jobs, args.latency_budget_ms)
+        print_sweep(report["sweep"])
+    elif args.cv:
+        scores = cross_validate([chosen], features, args.cv, args.n_jobs)[chosen]
+        report["cv"] = {"n_estimators": chosen[0], "max_depth": chosen[1], "folds": args.cv,
+                        "accuracy": round(float(scores.mean()), 4), "std": round(float(scores.std()), 4)}
+        print(f"CV accuracy ({args.cv} folds): {scores.mean():.4f} +/- {scores.std():.4f}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.report}")
+
+    if args.no_save:
+        return
+
+    X, y = features["Xt"], features["y"]
+    train, val = features["train_idx"], features["val_idx"]
+    rf = make_forest(*chosen, n_jobs=args.n_jobs).fit(X[train], y[train])
+    rf.n_jobs = None  # serving predicts one small batch at a time, threads only add overhead
+    y_pred = rf.predict(X[val])
+    print("Accuracy:", accuracy_score(y[val], y_pred))
+    print(classification_report(y[val], y_pred))
+
+    # the preprocessor was fitted on the same training split, so the two steps
+    # form the same pipeline a Pipeline.fit would have produced
+    clf = Pipeline([("pre", features["pre"]), ("rf", rf)])
+    artifact = {
+        "pipeline": clf,
+        "mlb_classes": features["mlb_classes"],
+        "feature_columns": features["numeric_cols"] + features["cat_cols"]
+                           + [f"sym_{s}" for s in features["mlb_classes"]],
+    }
+    joblib.dump(artifact, args.output)
+    print(f"Saved {args.output}")
+
 
-df = pd.read_csv("cwa_dataset_augmented.csv")
-# ensure symptom lists are proper lists
-import ast
-def ensure_list(x):
-    if isinstance(x, list): return x
-    try:
-        return ast.literal_eval(x)
-    except:
-        return []
-df['symptom_list'] = df['symptom_list'].apply(ensure_list)
-
-# create symptom multi-hot
-mlb = MultiLabelBinarizer()
-symptom_matrix = mlb.fit_transform(df['symptom_list'])
-symptom_df = pd.DataFrame(symptom_matrix, columns=[f"sym_{s}" for s in mlb.classes_])
-df2 = pd.concat([df.reset_index(drop=True), symptom_df.reset_index(drop=True)], axis=1)
-# drop columns that are not features
-drop_cols = ['symptom_list','symptoms']  # keep agent
-for c in drop_cols:
-    if c in df2.columns: df2 = df2.drop(columns=c)
-
-# Choose features
-numeric_cols = ["exposure_estimate","time_since_exposure_min","age","weight_kg",
-                "heart_rate","respiratory","systolic_bp","oxygen","gcs"]
-cat_cols = ["gender","comorbidity","exposure_route","severity","human_system"]
-# keep symptom columns
-symptom_cols = [c for c in df2.columns if c.startswith("sym_")]
-
-# Ensure columns exist
-numeric_cols = [c for c in numeric_cols if c in df2.columns]
-cat_cols = [c for c in cat_cols if c in df2.columns]
-
-X = df2[numeric_cols + cat_cols + symptom_cols]
-y = df2['agent']
-
-# Preprocessor
-num_pipe = Pipeline([("imputer", SimpleImputer(strategy="median")), ("scaler", StandardScaler())])
-cat_pipe = Pipeline([("imputer", SimpleImputer(strategy="most_frequent")), ("ohe", OneHotEncoder(handle_unknown="ignore"))])
-
-pre = ColumnTransformer([
-    ("num", num_pipe, numeric_cols),
-    ("cat", cat_pipe, cat_cols)
-], remainder='passthrough')  # passthrough symptoms (they are already numeric 0/1)
-
-clf = Pipeline([
-    ("pre", pre),
-    ("rf", RandomForestClassifier(n_estimators=200, class_weight="balanced", random_state=42))
-])
-
-X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.15, stratify=y, random_state=42)
-clf.fit(X_train, y_train)
-y_pred = clf.predict(X_val)
-print("Accuracy:", accuracy_score(y_val, y_pred))
-print(classification_report(y_val, y_pred))
-
-# Save artifacts
-artifact = {
-    "pipeline": clf,
-    "mlb_classes": mlb.classes_.tolist(),
-    "feature_columns": X.columns.tolist()
-}
-joblib.dump(artifact, "model_artifact.joblib")
-print("Saved model_artifact.joblib")
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import { useEffect, useState } from "react";
 import { useLocation, useNavigate } from "react-router-dom";
 import { DashboardLayout } from "../components/dashboard-layout";
 
+const DETAILS_PAGE_SIZE = 50;
+
 export default function TreatmentGuide() {
   const location = useLocation();
   const navigate = useNavigate();
@@ -29,7 +31,7 @@ export default function TreatmentGuide() {
       const res = await fetch(
         `${process.env.REACT_APP_BASE_API_URL}/get_agent_details?agent_name=${encodeURIComponent(
           agent
-        )}`
+        )}&limit=${DETAILS_PAGE_SIZE}`
       );
       if (!res.ok) {
         throw new Error(`Failed to fetch treatment details for ${agent}`);